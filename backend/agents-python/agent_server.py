@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""
+Persistent worker mode shared by the Python agents.
+
+Instead of one interpreter per request, an agent started with --serve keeps its
+imports, models and agents warm and answers newline-delimited JSON requests:
+
+    request:  {"id": "42", "payload": {...same JSON as the single-shot stdin...}}
+    response: {"id": "42", "data": {...same JSON the single-shot mode prints...}}
+              {"id": "42", "error": "..."}            (handler crashed)
+
+A request with "stream": true first receives {"id": "42", "event": ...} progress
+lines (see stream_events.py).
+
+Requests are read from stdin, or from localhost TCP connections with --port.
+At most --concurrency requests (env AGENT_CONCURRENCY, default 4) run at once;
+reading pauses while all slots are busy.
+"""
+import sys, json, os, threading, socketserver
+from concurrent.futures import ThreadPoolExecutor, wait
+
+DEFAULT_CONCURRENCY = int(os.getenv('AGENT_CONCURRENCY') or 4)
+
+
+def add_server_args(parser):
+    """Register the worker-mode flags on an agent's argument parser"""
+    parser.add_argument('--serve', action='store_true', help='run as a persistent NDJSON worker')
+    parser.add_argument('--port', type=int, default=None, help='listen on 127.0.0.1:PORT instead of stdin/stdout')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='max requests processed at once')
+
+
+class LineWriter:
+    """Thread-safe JSON-lines writer"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def write(self, obj):
+        line = json.dumps(obj) + '\n'
+        with self.lock:
+            self.stream.write(line)
+            self.stream.flush()
+
+
+def _run_request(handler, request, writer):
+    req_id = request.get('id')
+    try:
+        if request.get('stream'):
+            # Progress events are tagged with the request id ahead of the final response
+            def on_event(name, data):
+                writer.write({'id': req_id, 'event': name, **data})
+            data = handler(request.get('payload') or {}, on_event=on_event)
+        else:
+            data = handler(request.get('payload') or {})
+        writer.write({'id': req_id, 'data': data})
+    except Exception as e:
+        writer.write({'id': req_id, 'error': f"{type(e).__name__}: {e}"})
+
+
+def _dispatch_lines(lines, handler, writer, executor, slots):
+    """Submit every request line to the pool, blocking while all slots are busy"""
+    futures = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('request must be a JSON object')
+        except Exception as e:
+            writer.write({'id': None, 'error': f"invalid request: {e}"})
+            continue
+
+        slots.acquire()
+
+        def task(req=request):
+            try:
+                _run_request(handler, req, writer)
+            finally:
+                slots.release()
+
+        futures = [f for f in futures if not f.done()]
+        futures.append(executor.submit(task))
+    return futures
+
+
+def serve(handler, args, name='agent'):
+    """Run handler(payload) -> dict for each incoming request until EOF / interrupt"""
+    concurrency = max(1, args.concurrency or 1)
+    slots = threading.BoundedSemaphore(concurrency)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    # Protocol lines own the real stdout; stray prints from libraries go to stderr
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+
+    try:
+        if args.port:
+            _serve_tcp(handler, args.port, executor, slots, name, concurrency)
+        else:
+            writer = LineWriter(protocol_out)
+            writer.write({'event': 'ready', 'agent': name, 'pid': os.getpid(), 'concurrency': concurrency})
+            _dispatch_lines(sys.stdin, handler, writer, executor, slots)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown(wait=True)
+        sys.stdout = protocol_out
+
+
+def _serve_tcp(handler, port, executor, slots, name, concurrency):
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            writer = LineWriter(_SocketStream(self.wfile))
+            lines = (raw.decode('utf-8') for raw in self.rfile)
+            futures = _dispatch_lines(lines, handler, writer, executor, slots)
+            # Keep the connection open until its responses are written
+            wait(futures)
+
+    class Server(socketserver.ThreadingTCPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+
+    with Server(('127.0.0.1', port), RequestHandler) as server:
+        print(json.dumps({'event': 'ready', 'agent': name, 'pid': os.getpid(),
+                          'port': server.server_address[1], 'concurrency': concurrency}), file=sys.stderr)
+        server.serve_forever()
+
+
+class _SocketStream:
+    """Adapts a binary socket file to the text write/flush interface LineWriter expects"""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, text):
+        self.wfile.write(text.encode('utf-8'))
+
+    def flush(self):
+        self.wfile.flush()
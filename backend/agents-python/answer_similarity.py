@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+Embedding-similarity pre-scorer for short answers.
+
+Each student answer and its reference answer are embedded with Gemini in one
+batched call and compared by cosine similarity. Answers clearly above the high
+cutoff score full marks, answers clearly below the low cutoff score zero, and
+only the band in between is escalated to the LLM grader.
+
+The pre-scorer is opt-in: fixed cutoffs award grades without any LLM review, so
+they should be tuned against real submissions before it is switched on.
+
+Environment:
+    GRADING_SIMILARITY_ENABLED   default false (needs numpy, google-generativeai and GEMINI_API_KEY)
+    GRADING_SIMILARITY_HIGH      default 0.92
+    GRADING_SIMILARITY_LOW       default 0.35
+    GRADING_EMBED_MODEL          default models/text-embedding-004
+"""
+import os, threading
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+try:
+    import google.generativeai as genai  # type: ignore
+except Exception:
+    genai = None
+
+EMBED_MODEL = os.getenv('GRADING_EMBED_MODEL') or 'models/text-embedding-004'
+
+_configure_lock = threading.Lock()
+_configured = False
+
+
+def settings():
+    """Current cutoffs and whether the pre-scorer can run at all"""
+    enabled = (
+        os.getenv('GRADING_SIMILARITY_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+        and np is not None and genai is not None and bool(os.getenv('GEMINI_API_KEY'))
+    )
+    return {
+        'enabled': enabled,
+        'high': float(os.getenv('GRADING_SIMILARITY_HIGH') or 0.92),
+        'low': float(os.getenv('GRADING_SIMILARITY_LOW') or 0.35),
+    }
+
+
+def reference_answer(q):
+    """The expected answer text of a short-answer question, if it has one"""
+    for key in ('correctAnswer', 'answer'):
+        value = q.get(key)
+        if isinstance(value, str) and value.strip():
+            return value.strip()
+    return None
+
+
+def embed_texts(texts):
+    """Embed texts in a single Gemini call; returns an (n, d) float32 matrix"""
+    global _configured
+    with _configure_lock:
+        if not _configured:
+            genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+            _configured = True
+    result = genai.embed_content(model=EMBED_MODEL, content=list(texts), task_type='semantic_similarity')
+    return np.asarray(result['embedding'], dtype=np.float32)
+
+
+def cosine_rows(a, b):
+    """Row-wise cosine similarity of two equally shaped matrices"""
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return np.einsum('ij,ij->i', a, b)
+
+
+def prescore(questions, answers_by_qid, reference_vectors, cfg):
+    """Score clear-cut short answers locally.
+
+    questions:          short-answer questions still needing a grade
+    answers_by_qid:     {questionId: answer dict}
+    reference_vectors:  shared {questionId: vector} memo of reference embeddings (filled in place)
+    cfg:                settings() result
+
+    Returns (graded {qid: perQuestion entry}, escalated [questions], stats dict).
+    """
+    graded = {}
+    candidates = []
+    for q in questions:
+        qid = str(q.get('_id') or q.get('id'))
+        text = ((answers_by_qid.get(qid) or {}).get('answerText') or '').strip()
+        if q.get('type') == 'short-answer' and text and reference_answer(q):
+            candidates.append((qid, q, text))
+
+    stats = {'high': cfg['high'], 'low': cfg['low'], 'considered': len(candidates),
+             'scoredHigh': 0, 'scoredLow': 0, 'escalated': 0}
+    if not candidates:
+        stats['escalated'] = len(questions)
+        return graded, list(questions), stats
+
+    # One batched call: answers plus any reference answers not embedded yet
+    missing_refs = [(qid, reference_answer(q)) for qid, q, _ in candidates if qid not in reference_vectors]
+    texts = [text for _, _, text in candidates] + [ref for _, ref in missing_refs]
+    vectors = embed_texts(texts)
+    answer_vectors = vectors[:len(candidates)]
+    for (qid, _), vec in zip(missing_refs, vectors[len(candidates):]):
+        reference_vectors[qid] = vec
+
+    ref_matrix = np.stack([reference_vectors[qid] for qid, _, _ in candidates])
+    sims = cosine_rows(answer_vectors, ref_matrix)
+
+    for (qid, q, _), sim in zip(candidates, sims.tolist()):
+        if sim >= cfg['high']:
+            graded[qid] = {"questionId": qid, "score": 10,
+                           "feedback": f"Answer closely matches the expected answer (similarity {sim:.2f})."}
+            stats['scoredHigh'] += 1
+        elif sim <= cfg['low']:
+            graded[qid] = {"questionId": qid, "score": 0,
+                           "feedback": f"Answer does not match the expected answer (similarity {sim:.2f})."}
+            stats['scoredLow'] += 1
+
+    escalated = [q for q in questions if str(q.get('_id') or q.get('id')) not in graded]
+    stats['escalated'] = len(escalated)
+    return graded, escalated, stats
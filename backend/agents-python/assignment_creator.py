@@ -1,5 +1,10 @@
 #!/usr/bin/env python
-import sys, json, os, time, importlib
+import sys, json, os, time, importlib, argparse, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from agent_server import LineWriter, add_server_args, serve
+from stream_events import JSONArrayStreamParser, emit_phase
+from question_store import COUNT_FIELDS, get_question_store, prefill, spec_counts
 
 # Optional: use google-generativeai if available and CrewAI if enabled
 use_gemini = False
@@ -22,15 +27,191 @@ except Exception:
     try_crew = False
 
 
-def main():
-    start = time.time()
-    try:
-        raw = sys.stdin.read()
-        payload = json.loads(raw or '{}')
-    except Exception as e:
-        print(json.dumps({"error": f"invalid input: {e}"}))
-        return
+# Agents and Gemini models are reused across requests in worker mode
+_agents = threading.local()
+_models = {}
+_gemini_lock = threading.Lock()
+_gemini_configured = False
+
+
+def get_creator_agents():
+    """Return this thread's (creator, validator) CrewAI agents, creating them once"""
+    if getattr(_agents, 'creator', None) is None:
+        _agents.creator = Agent(
+            name='AssignmentCreator',
+            role='Expert Islamic Education Question Writer',
+            goal='Create high-quality, accurate educational questions for Islamic studies',
+            backstory='You are an experienced Islamic educator who creates fair, clear, and educationally valuable questions. You ensure questions are accurate, appropriate, and help students learn.',
+            verbose=False
+        )
+        _agents.validator = Agent(
+            name='QuestionValidator',
+            role='Quality Assurance Reviewer',
+            goal='Ensure all questions meet high educational standards',
+            backstory='You are a meticulous educational quality reviewer who ensures all questions are clear, accurate, and pedagogically sound.',
+            verbose=False
+        )
+    return _agents.creator, _agents.validator
+
+
+def get_gemini_model(model_name):
+    """Configure Gemini once per process and cache a model handle per model name"""
+    global _gemini_configured
+    with _gemini_lock:
+        if not _gemini_configured:
+            genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+            _gemini_configured = True
+        if model_name not in _models:
+            _models[model_name] = genai.GenerativeModel(model_name)
+        return _models[model_name]
+
+
+QUESTION_TYPES = ['mcq', 'short-answer', 'true-false', 'essay']
+
+
+def validate_question(q):
+    """Normalize one generated question to the stored shape; returns None if it has no prompt"""
+    qtype = (q.get('type') or '').lower()
+    if qtype not in QUESTION_TYPES:
+        qtype = 'mcq'  # Default fallback
+
+    question_obj = {
+        'type': qtype,
+        'prompt': (q.get('prompt') or '').strip(),
+        'answer': q.get('answer')
+    }
+
+    # Validate MCQ format
+    if qtype == 'mcq':
+        opts = list(q.get('options') or [])
+        if len(opts) != 4:
+            # Pad or trim to 4 options
+            while len(opts) < 4:
+                opts.append(f"Option {chr(65 + len(opts))}")
+            opts = opts[:4]
+        question_obj['options'] = opts
+        # Ensure answer is valid index
+        if isinstance(question_obj['answer'], int) and 0 <= question_obj['answer'] < 4:
+            pass  # Valid
+        else:
+            question_obj['answer'] = 0  # Default to first option
+
+    # Validate True/False format
+    elif qtype == 'true-false':
+        question_obj['options'] = ['True', 'False']
+        if isinstance(question_obj['answer'], bool):
+            question_obj['answer'] = 0 if question_obj['answer'] else 1
+        elif isinstance(question_obj['answer'], int) and question_obj['answer'] in [0, 1]:
+            pass  # Valid
+        else:
+            question_obj['answer'] = 0  # Default to True
 
+    return question_obj if question_obj['prompt'] else None
+
+
+def basic_question(q):
+    """Light normalization used for the direct Gemini path"""
+    qtype = q.get('type') or 'mcq'
+    return {
+        'type': 'mcq' if qtype not in QUESTION_TYPES else qtype,
+        'prompt': q.get('prompt', ''),
+        'options': q.get('options', [])[:4],
+        'answer': q.get('answer')
+    }
+
+
+TYPE_LABELS = {
+    'mcq': 'multiple-choice questions with exactly 4 options; answer is the index (0-3) of the correct option',
+    'true-false': "true/false statements; options are ['True','False'] and answer is 0 for True or 1 for False",
+    'short-answer': 'short-answer questions needing 2-3 sentences; answer is a model answer',
+    'essay': 'essay questions needing detailed, well-reasoned responses; answer is a brief marking guide',
+}
+
+
+def type_schema(qtype):
+    """JSON schema (Gemini response_schema subset) for an array of questions of one type"""
+    props = {'prompt': {'type': 'STRING'}}
+    required = ['prompt', 'answer']
+    if qtype in ('mcq', 'true-false'):
+        props['options'] = {'type': 'ARRAY', 'items': {'type': 'STRING'}}
+        props['answer'] = {'type': 'INTEGER'}
+        required.append('options')
+    else:
+        props['answer'] = {'type': 'STRING'}
+    return {'type': 'ARRAY', 'items': {'type': 'OBJECT', 'properties': props, 'required': required}}
+
+
+def generate_questions_fast(payload, model_name, on_event=None):
+    """Generate each question type concurrently with schema-constrained Gemini output.
+
+    The structural checks of validate_question() replace the second (validator) LLM pass.
+    Returns (questions, shortfall) where shortfall maps each type that failed or came
+    back short to the number of questions still missing.
+    """
+    ai_spec = payload.get('aiSpec') or {}
+    topic = ai_spec.get('topic') or payload.get('title') or 'General Islamic Studies'
+    difficulty = ai_spec.get('difficulty', 'medium')
+    description = payload.get('description', '')
+    counts = spec_counts(ai_spec)
+    if 'any' in counts:
+        counts = {'mcq': counts['any']}
+    model = get_gemini_model(model_name)
+
+    def generate_type(qtype, count):
+        type_start = time.time()
+        prompt = (
+            f"Create exactly {count} {TYPE_LABELS[qtype]} about '{topic}' for Islamic studies.\n"
+            f"Difficulty level: {difficulty}\n"
+            f"{description and f'Context: {description}' or ''}\n"
+            "Questions must be clear, accurate, culturally appropriate and respectful of religious teachings."
+        )
+        resp = model.generate_content(prompt, generation_config={
+            'response_mime_type': 'application/json',
+            'response_schema': type_schema(qtype),
+        })
+        items = json.loads(resp.text or '[]')
+        typed = [validate_question({**q, 'type': qtype}) for q in items if isinstance(q, dict)]
+        typed = [q for q in typed if q][:count]
+        emit_phase(on_event, 'type', type_start, type=qtype, questions=len(typed))
+        return typed
+
+    questions = []
+    shortfall = {}
+    with ThreadPoolExecutor(max_workers=len(counts)) as executor:
+        futures = {executor.submit(generate_type, qtype, count): qtype for qtype, count in counts.items()}
+        for future in as_completed(futures):
+            qtype = futures[future]
+            try:
+                typed = future.result()
+            except Exception as e:
+                print(f"Fast generation failed for {qtype}: {str(e)}", file=sys.stderr)
+                typed = []
+            if len(typed) < counts[qtype]:
+                shortfall[qtype] = counts[qtype] - len(typed)
+            # Types are appended as they finish so streamed indexes match the final list
+            for q in typed:
+                questions.append(q)
+                if on_event:
+                    on_event('question_generated', {'index': len(questions) - 1, 'question': q})
+    return questions, shortfall
+
+
+def shortfall_payload(payload, shortfall):
+    """Copy of payload asking the regular generators for just the missing questions per type"""
+    ai_spec = {**(payload.get('aiSpec') or {}),
+               **{field: shortfall.get(qtype, 0) for qtype, field in COUNT_FIELDS},
+               'numQuestions': sum(shortfall.values())}
+    return {**payload, 'aiSpec': ai_spec, 'fastMode': False}
+
+
+def generate_questions(payload, on_event=None, stream=False):
+    """Generate a fresh question set (fast mode, CrewAI, Gemini or the mock fallback).
+
+    stream=True reads the Gemini response incrementally, emitting questions as they arrive.
+    Returns (questions, sources, generator) where generator is 'fast', 'crewai', 'gemini' or 'fallback'.
+    Types fast mode could not produce are filled by the other generators ('fast+crewai',
+    'fast+gemini'); a set that needed placeholder questions is reported as 'fallback'.
+    """
     model_name = payload.get('model') or os.getenv('GEMINI_MODEL') or 'gemini-2.5-flash'
     ai_spec = payload.get('aiSpec') or {}
     topic = ai_spec.get('topic') or payload.get('title') or 'General Islamic Studies'
@@ -42,9 +223,45 @@ def main():
 
     questions = []
     sources = []
+    generator = None
+
+    # Fast mode: one structured-output call per question type, run concurrently
+    fast = payload.get('fastMode')
+    if fast is None:
+        fast = os.getenv('ASSIGNMENT_FAST_MODE', '').lower() in ('1', 'true', 'yes')
+    if fast and use_gemini and os.getenv('GEMINI_API_KEY'):
+        phase_start = time.time()
+        shortfall = {}
+        try:
+            questions, shortfall = generate_questions_fast(payload, model_name, on_event)
+        except Exception as e:
+            print(f"Fast generation error: {str(e)}", file=sys.stderr)
+            questions = []
+        emit_phase(on_event, 'fast', phase_start, questions=len(questions))
+        if questions:
+            generator = 'fast'
+            sources = [
+                'Quran and Hadith references',
+                'Authentic Islamic scholarly sources'
+            ]
+        if questions and shortfall:
+            print(f"Fast generation fell short {shortfall}; filling in with the other generators", file=sys.stderr)
+            offset = len(questions)
+
+            def shifted(name, data):
+                # Streamed indexes continue after the questions fast mode already emitted
+                if name == 'question_generated':
+                    data = {**data, 'index': data['index'] + offset}
+                on_event(name, data)
+
+            extra, _, fill_generator = generate_questions(
+                shortfall_payload(payload, shortfall), shifted if on_event else None, stream)
+            questions = questions + extra
+            generator = 'fallback' if fill_generator == 'fallback' else f"fast+{fill_generator}"
 
     # Try CrewAI first if enabled (with validation)
-    if try_crew and Agent and Task and Crew:
+    if not questions and try_crew and Agent and Task and Crew:
+        phase_start = time.time()
         try:
             counts_text = f"Target counts -> mcq: {mcq_count or 0}, true-false: {tf_count or 0}, short-answer: {short_count or 0}, essay: {essay_count or 0}."
             difficulty = ai_spec.get('difficulty', 'medium')
@@ -67,14 +284,8 @@ def main():
                 "[{\"type\": \"mcq|short-answer|true-false|essay\", \"prompt\": \"question text\", \"options\": [\"opt1\",\"opt2\",...], \"answer\": index_or_text}]"
             )
             
-            creator = Agent(
-                name='AssignmentCreator',
-                role='Expert Islamic Education Question Writer',
-                goal='Create high-quality, accurate educational questions for Islamic studies',
-                backstory='You are an experienced Islamic educator who creates fair, clear, and educationally valuable questions. You ensure questions are accurate, appropriate, and help students learn.',
-                verbose=False
-            )
-            
+            creator, validator = get_creator_agents()
+
             create_task = Task(
                 description=creator_instructions,
                 agent=creator,
@@ -92,14 +303,6 @@ def main():
                 "Return the validated questions as a JSON array, fixing any issues found."
             )
             
-            validator = Agent(
-                name='QuestionValidator',
-                role='Quality Assurance Reviewer',
-                goal='Ensure all questions meet high educational standards',
-                backstory='You are a meticulous educational quality reviewer who ensures all questions are clear, accurate, and pedagogically sound.',
-                verbose=False
-            )
-            
             validate_task = Task(
                 description=validator_instructions,
                 agent=validator,
@@ -121,44 +324,12 @@ def main():
                 
                 # Process and validate each question
                 for q in arr:
-                    qtype = q.get('type', '').lower()
-                    if qtype not in ['mcq', 'short-answer', 'true-false', 'essay']:
-                        qtype = 'mcq'  # Default fallback
-                    
-                    question_obj = {
-                        'type': qtype,
-                        'prompt': q.get('prompt', '').strip(),
-                        'answer': q.get('answer')
-                    }
-                    
-                    # Validate MCQ format
-                    if qtype == 'mcq':
-                        opts = q.get('options', [])
-                        if len(opts) != 4:
-                            # Pad or trim to 4 options
-                            while len(opts) < 4:
-                                opts.append(f"Option {chr(65 + len(opts))}")
-                            opts = opts[:4]
-                        question_obj['options'] = opts
-                        # Ensure answer is valid index
-                        if isinstance(question_obj['answer'], int) and 0 <= question_obj['answer'] < 4:
-                            pass  # Valid
-                        else:
-                            question_obj['answer'] = 0  # Default to first option
-                    
-                    # Validate True/False format
-                    elif qtype == 'true-false':
-                        question_obj['options'] = ['True', 'False']
-                        if isinstance(question_obj['answer'], bool):
-                            question_obj['answer'] = 0 if question_obj['answer'] else 1
-                        elif isinstance(question_obj['answer'], int) and question_obj['answer'] in [0, 1]:
-                            pass  # Valid
-                        else:
-                            question_obj['answer'] = 0  # Default to True
-                    
-                    if question_obj['prompt']:  # Only add if prompt is not empty
+                    question_obj = validate_question(q)
+                    if question_obj:
                         questions.append(question_obj)
-                
+                        if on_event:
+                            on_event('question_generated', {'index': len(questions) - 1, 'question': question_obj})
+
                 # Add Islamic sources
                 sources = [
                     'Quran and Hadith references',
@@ -169,11 +340,14 @@ def main():
             import traceback
             print(f"CrewAI error: {str(e)}", file=sys.stderr)
             pass
+        emit_phase(on_event, 'crewai', phase_start, questions=len(questions))
+        if questions:
+            generator = 'crewai'
 
     if not questions and use_gemini and os.getenv('GEMINI_API_KEY'):
+        phase_start = time.time()
         try:
-            genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-            model = genai.GenerativeModel(model_name)
+            model = get_gemini_model(model_name)
             counts = [mcq_count, short_count, tf_count, essay_count]
             counts_text = f" Aim for counts -> mcq: {mcq_count}, true-false: {tf_count}, short-answer: {short_count}, essay: {essay_count}." if any([c for c in counts if isinstance(c, int) and c>=0]) else ""
             prompt = (
@@ -181,27 +355,37 @@ def main():
                 "Use JSON array of objects: type (mcq|short-answer|true-false|essay), prompt, options (for mcq or true-false), answer (index or text).\n"
                 "MCQs must include exactly 4 options and specify the correct answer index. For true-false, options should be ['True','False'] and answer an index (0 or 1).{}"
             ).format(num_questions, topic, counts_text)
-            resp = model.generate_content(prompt)
-            text = resp.text or ''
-            # naive attempt: try to parse JSON array from text
-            start_idx = text.find('[')
-            end_idx = text.rfind(']')
-            if start_idx != -1 and end_idx != -1:
-                arr = json.loads(text[start_idx:end_idx+1])
-                for q in arr:
-                    qtype = q.get('type') or 'mcq'
-                    questions.append({
-                        'type': 'mcq' if qtype not in ['mcq','short-answer','true-false','essay'] else qtype,
-                        'prompt': q.get('prompt', ''),
-                        'options': q.get('options', [])[:4],
-                        'answer': q.get('answer')
-                    })
+            if stream:
+                # Stream the response and hand out each question as soon as its object closes
+                parser = JSONArrayStreamParser()
+                for chunk in model.generate_content(prompt, stream=True):
+                    for q in parser.feed(getattr(chunk, 'text', '') or ''):
+                        if not isinstance(q, dict):
+                            continue
+                        questions.append(basic_question(q))
+                        if len(questions) == 1:
+                            emit_phase(on_event, 'first_question', phase_start)
+                        on_event('question_generated', {'index': len(questions) - 1, 'question': questions[-1]})
+            else:
+                resp = model.generate_content(prompt)
+                text = resp.text or ''
+                # naive attempt: try to parse JSON array from text
+                start_idx = text.find('[')
+                end_idx = text.rfind(']')
+                if start_idx != -1 and end_idx != -1:
+                    arr = json.loads(text[start_idx:end_idx+1])
+                    for q in arr:
+                        questions.append(basic_question(q))
         except Exception as e:
             # fallback to mock below
             pass
+        emit_phase(on_event, 'gemini', phase_start, questions=len(questions))
+        if questions:
+            generator = 'gemini'
 
     if not questions:
         # Fallback mock questions honoring counts if provided
+        phase_start = time.time()
         remaining = num_questions
         m = mcq_count if isinstance(mcq_count, int) else num_questions
         t = tf_count if isinstance(tf_count, int) else 0
@@ -250,15 +434,120 @@ def main():
             'Quran 2:255',
             'Sahih Bukhari',
         ]
+        if on_event:
+            for i, q in enumerate(questions):
+                on_event('question_generated', {'index': i, 'question': q})
+        emit_phase(on_event, 'fallback', phase_start, questions=len(questions))
+        generator = 'fallback'
+
+    return questions, sources, generator
+
+
+def create_assignment(payload, on_event=None):
+    """Generate questions for one request payload and return the output dict.
+
+    Requests are served from the warm question pool when it holds enough unused
+    questions for the spec; otherwise a fresh set is generated and recorded.
+    on_event(name, data) receives question_generated / phase_timing events as work completes.
+    """
+    start = time.time()
+    model_name = payload.get('model') or os.getenv('GEMINI_MODEL') or 'gemini-2.5-flash'
+    ai_spec = payload.get('aiSpec') or {}
+    store = get_question_store() if not payload.get('skipPool') else None
+    stream = on_event is not None
+    timings = {'phases': {}, 'types': {}}
+
+    def record(name, data):
+        # Collect phase timings for the output while forwarding events to the caller
+        if name == 'phase_timing':
+            if data.get('type'):
+                timings['types'][data['type']] = data['ms']
+            else:
+                timings['phases'][data['phase']] = data['ms']
+        if stream:
+            on_event(name, data)
+
+    pool_status = 'disabled'
+
+    questions = sources = None
+    if store:
+        phase_start = time.time()
+        try:
+            questions, sources = store.take(ai_spec, payload.get('title'), model_name)
+        except Exception as e:
+            print(f"Question pool lookup failed: {e}", file=sys.stderr)
+        pool_status = 'hit' if questions else 'miss'
+        emit_phase(record, 'pool', phase_start, status=pool_status)
+        if questions and stream:
+            for i, q in enumerate(questions):
+                on_event('question_generated', {'index': i, 'question': q})
+
+    if not questions:
+        questions, sources, generator = generate_questions(payload, record, stream)
+        # Placeholder questions never go into the pool
+        if store and generator != 'fallback':
+            try:
+                store.record(ai_spec, payload.get('title'), model_name, questions, sources)
+            except Exception as e:
+                print(f"Question pool write failed: {e}", file=sys.stderr)
 
     out = {
         'questions': questions,
         'sources': sources,
         'model': model_name,
         'version': 'v0.1',
+        'pool': pool_status,
+        'timings': timings,
         'latencyMs': int((time.time() - start) * 1000)
     }
-    print(json.dumps(out))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate assignment questions (JSON on stdin)')
+    add_server_args(parser)
+    parser.add_argument('--stream', action='store_true',
+                        help='write progress events as JSON lines, ending with {"event": "final", "data": ...}')
+    parser.add_argument('--prefill', action='store_true',
+                        help='pre-generate question pools for the most requested specs (or those in --prefill-specs)')
+    parser.add_argument('--prefill-specs', default=None,
+                        help='JSON file with a list of request payloads to pre-generate instead of the popular ones')
+    parser.add_argument('--prefill-top', type=int, default=10, help='number of popular specs to fill')
+    parser.add_argument('--prefill-requests', type=int, default=2,
+                        help='fill each pool until it can serve this many more requests')
+    args = parser.parse_args()
+    if args.serve:
+        serve(create_assignment, args, name='assignment_creator')
+        return
+    if args.prefill:
+        store = get_question_store()
+        if not store:
+            print(json.dumps({"error": "question pool is disabled"}))
+            return
+        if args.prefill_specs:
+            with open(args.prefill_specs, 'r', encoding='utf-8') as f:
+                specs = json.load(f)
+            for spec in specs:
+                spec.setdefault('model', os.getenv('GEMINI_MODEL') or 'gemini-2.5-flash')
+        else:
+            specs = store.popular_specs(args.prefill_top)
+        print(json.dumps({'prefilled': prefill(store, generate_questions, specs, args.prefill_requests)}))
+        return
+
+    try:
+        raw = sys.stdin.read()
+        payload = json.loads(raw or '{}')
+    except Exception as e:
+        print(json.dumps({"error": f"invalid input: {e}"}))
+        return
+
+    if not args.stream:
+        print(json.dumps(create_assignment(payload)))
+        return
+
+    writer = LineWriter(sys.stdout)
+    out = create_assignment(payload, on_event=lambda name, data: writer.write({'event': name, **data}))
+    writer.write({'event': 'final', 'data': out})
 
 if __name__ == '__main__':
     main()
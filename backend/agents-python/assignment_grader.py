@@ -1,67 +1,88 @@
 #!/usr/bin/env python
-import sys, json, os, time
+import sys, json, os, time, argparse, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Import CrewAI components
+from agent_server import LineWriter, add_server_args, serve
+from grading_cache import get_default_cache, make_key, question_hash
+from stream_events import emit_phase
+from context_cache import get_context_cache
+import answer_similarity
+
+GRADER_VERSION = 'v0.1'
+
+# Import CrewAI components (only needed for short-answer grading)
 try:
     from crewai import Agent, Task, Crew
     CREWAI_AVAILABLE = True
+    CREWAI_IMPORT_ERROR = None
 except ImportError as e:
     CREWAI_AVAILABLE = False
-    print(json.dumps({"error": f"CrewAI not installed: {e}"}))
-    sys.exit(1)
+    CREWAI_IMPORT_ERROR = str(e)
 
+# Question types graded locally by comparing the selected option to the key
+OBJECTIVE_TYPES = ('mcq', 'true-false')
 
-def main():
-    start = time.time()
-    try:
-        payload = json.loads(sys.stdin.read() or '{}')
-    except Exception as e:
-        print(json.dumps({"error": f"invalid input: {e}"}))
-        return
 
-    model_name = payload.get('model') or os.getenv('GEMINI_MODEL') or 'gemini-2.5-flash'
-    assignment = payload.get('assignment') or {}
-    submission = payload.get('submission') or {}
-    questions = assignment.get('questions') or []
-    answers = submission.get('answers') or []
+def question_id(q):
+    return q.get('_id') or q.get('id')
 
-    per_question = []
-    total = 0
-    feedback = ''
 
-    # Use CrewAI for grading
-    if not CREWAI_AVAILABLE:
-        print(json.dumps({"error": "CrewAI is required but not available"}))
-        return
+def _correct_value(q):
+    """Return the answer key of an objective question, whichever field holds it"""
+    for key in ('correctOption', 'correctAnswer', 'answer'):
+        if q.get(key) is not None:
+            return q.get(key)
+    return None
 
-    try:
-        # Filter out essay questions - they should be graded manually
-        gradable_questions = [q for q in questions if q.get('type') != 'essay']
-        essay_questions = [q for q in questions if q.get('type') == 'essay']
-        essay_q_ids = [q.get('_id') or q.get('id') for q in essay_questions]
-        
-        # Match answers to gradable questions only
-        gradable_answers = [a for a in answers if a.get('questionId') not in essay_q_ids]
-        
-        if not gradable_questions:
-            # Only essay questions - return empty grading, mark essays for manual grading
-            per_question = [{"questionId": q.get('_id') or q.get('id'), "score": None, "feedback": "Essay question - requires manual grading"} for q in essay_questions]
-            out = {
-                'perQuestion': per_question,
-                'totalScore': None,
-                'feedback': 'This submission contains only essay questions. Please grade manually.',
-                'model': model_name,
-                'version': 'v0.1',
-                'hasEssays': True,
-                'latencyMs': int((time.time() - start) * 1000)
-            }
-            print(json.dumps(out))
-            return
-        
-        # Detailed grading instruction
-        instruction = f"""You are an expert academic grader. Grade this student's submission carefully and fairly.
-
-CRITICAL GRADING RULES:
+
+def _option_index(value, q):
+    """Resolve an option reference (index, option text or boolean) to an option index"""
+    options = [str(o).strip().lower() for o in (q.get('options') or [])]
+    if q.get('type') == 'true-false' and not options:
+        options = ['true', 'false']
+
+    if isinstance(value, bool):
+        label = 'true' if value else 'false'
+        return options.index(label) if label in options else (0 if value else 1)
+    if isinstance(value, (int, float)):
+        idx = int(value)
+        return idx if idx == value and (not options or 0 <= idx < len(options)) else None
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if not text:
+            return None
+        if text in options:
+            return options.index(text)
+        if text.isdigit():
+            idx = int(text)
+            return idx if not options or idx < len(options) else None
+        if q.get('type') == 'true-false' and text in ('true', 'false'):
+            return 0 if text == 'true' else 1
+    return None
+
+
+def can_grade_locally(q):
+    """Objective questions with a resolvable answer key need no LLM"""
+    return q.get('type') in OBJECTIVE_TYPES and _option_index(_correct_value(q), q) is not None
+
+
+def grade_objective(q, answer):
+    """Deterministically score an MCQ or true/false answer (10 for correct, 0 otherwise)"""
+    qid = question_id(q)
+    correct_idx = _option_index(_correct_value(q), q)
+    options = q.get('options') or (['True', 'False'] if q.get('type') == 'true-false' else [])
+    correct_label = options[correct_idx] if correct_idx < len(options) else str(correct_idx)
+
+    selected = (answer or {}).get('selectedOption')
+    if selected is None or selected == '':
+        return {"questionId": qid, "score": 0, "feedback": "No answer submitted."}
+
+    if _option_index(selected, q) == correct_idx:
+        return {"questionId": qid, "score": 10, "feedback": "Correct."}
+    return {"questionId": qid, "score": 0, "feedback": f"Incorrect. The correct answer is: {correct_label}"}
+
+
+GRADING_RULES = """CRITICAL GRADING RULES:
 1. For MCQ (Multiple Choice) questions: 
    - Award 10 points ONLY if the selectedOption matches the correctOption exactly (case-sensitive string comparison)
    - Award 0 points for any incorrect answer
@@ -79,33 +100,28 @@ CRITICAL GRADING RULES:
 
 4. IMPORTANT: Match each answer to its question using questionId. Make sure you grade ALL gradable questions.
 
-5. DO NOT give points just because an answer exists - it MUST be CORRECT to earn points
-
-Questions with Correct Answers (GRADABLE ONLY - essays excluded):
-{json.dumps(gradable_questions, indent=2)}
-
-Student's Submitted Answers (MATCHED TO QUESTIONS):
-{json.dumps(gradable_answers, indent=2)}
-
-IMPORTANT: 
-- For each question in gradable_questions, find the matching answer by questionId
-- If no answer found for a question, award 0 points
-- Return scores for ALL gradable questions
+5. DO NOT give points just because an answer exists - it MUST be CORRECT to earn points"""
 
-IMPORTANT: Return ONLY a valid JSON object with this EXACT structure (no markdown, no code blocks, no additional text):
-{{
+RESPONSE_FORMAT = """IMPORTANT: Return ONLY a valid JSON object with this EXACT structure (no markdown, no code blocks, no additional text):
+{
   "perQuestion": [
-    {{"questionId": "the_question_id", "score": 0-10, "feedback": "Explanation of why this score was given"}},
+    {"questionId": "the_question_id", "score": 0-10, "feedback": "Explanation of why this score was given"},
     ...for each GRADABLE question (not essays)...
   ],
   "totalScore": 0-100,
   "feedback": "Overall assessment of the submission"
-}}
+}
 
 Be accurate and strict. Wrong answers must receive 0 points. Score must be between 0-10 for each question."""
 
-        # Create the grading agent
-        grader = Agent(
+
+# Agents are reused across requests in worker mode (one per thread; Crew mutates them)
+_agents = threading.local()
+
+
+def get_grader_agent():
+    if getattr(_agents, 'grader', None) is None:
+        _agents.grader = Agent(
             name='AssignmentGrader',
             role='Expert Academic Grader',
             goal='Accurately grade student submissions and provide detailed feedback',
@@ -113,70 +129,122 @@ Be accurate and strict. Wrong answers must receive 0 points. Score must be betwe
             verbose=False,
             allow_delegation=False
         )
-        
-        # Create the grading task
-        task = Task(
-            description=instruction,
-            agent=grader,
-            expected_output='A JSON object with perQuestion array, totalScore, and feedback'
-        )
-        
-        # Execute the crew
-        crew = Crew(
-            agents=[grader],
-            tasks=[task],
-            verbose=False
-        )
-        
-        result = crew.kickoff()
-        text = str(result)
-        
-        # Extract JSON from result
-        s = text.find('{')
-        e = text.rfind('}')
-        if s != -1 and e != -1:
-            json_str = text[s:e+1]
-            data = json.loads(json_str)
-            per_question = data.get('perQuestion') or []
-            total = data.get('totalScore') or 0
-            feedback = data.get('feedback') or 'AI grading completed.'
-        else:
-            raise ValueError("CrewAI did not return valid JSON format")
-            
-    except Exception as e:
-        print(json.dumps({"error": f"CrewAI grading failed: {str(e)}"}))
-        return
+    return _agents.grader
 
-    # Validate results
-    if not per_question:
-        print(json.dumps({"error": "No grading results produced by CrewAI"}))
-        return
+
+def grade_with_crewai(questions_block, gradable_answers):
+    """Grade answers against a pre-rendered questions block with a CrewAI agent.
+
+    Returns (perQuestion, totalScore, feedback).
+    """
+    instruction = f"""You are an expert academic grader. Grade this student's submission carefully and fairly.
+
+{GRADING_RULES}
+
+Questions with Correct Answers (GRADABLE ONLY - essays excluded):
+{questions_block}
+
+Student's Submitted Answers (MATCHED TO QUESTIONS):
+{json.dumps(gradable_answers, indent=2)}
+
+IMPORTANT: 
+- For each question in gradable_questions, find the matching answer by questionId
+- If no answer found for a question, award 0 points
+- Return scores for ALL gradable questions
+
+{RESPONSE_FORMAT}"""
+
+    grader = get_grader_agent()
+
+    # Create the grading task
+    task = Task(
+        description=instruction,
+        agent=grader,
+        expected_output='A JSON object with perQuestion array, totalScore, and feedback'
+    )
     
-    # 🚀 FIX: Validate and normalize per-question scores
-    validated_per_question = []
-    for pq in per_question:
-        qid = pq.get('questionId')
-        score = pq.get('score')
-        
-        # Handle None/null scores (for essays)
-        if score is None:
-            validated_per_question.append(pq)
-            continue
-            
-        # Convert to number if string
-        try:
-            if isinstance(score, str):
-                score = float(score)
-            score = float(score)
-            # Ensure score is 0-10
-            score = max(0, min(10, score))
-            pq['score'] = score
-        except (ValueError, TypeError):
-            pq['score'] = 0  # Default to 0 if invalid
-        
-        validated_per_question.append(pq)
+    # Execute the crew
+    crew = Crew(
+        agents=[grader],
+        tasks=[task],
+        verbose=False
+    )
     
-    per_question = validated_per_question
+    result = crew.kickoff()
+    text = str(result)
+    
+    return parse_grading_json(text)
+
+
+def parse_grading_json(text, source='CrewAI'):
+    """Extract (perQuestion, totalScore, feedback) from an LLM grading response"""
+    s = text.find('{')
+    e = text.rfind('}')
+    if s != -1 and e != -1:
+        json_str = text[s:e+1]
+        data = json.loads(json_str)
+        return (data.get('perQuestion') or [],
+                data.get('totalScore') or 0,
+                data.get('feedback') or 'AI grading completed.')
+    else:
+        raise ValueError(f"{source} did not return valid JSON format")
+
+
+def cached_context_instruction(questions_block):
+    """Static, per-assignment part of the prompt used with context caching"""
+    return f"""You are an expert academic grader. Grade student submissions carefully and fairly.
+
+{GRADING_RULES}
+
+Questions with Correct Answers (GRADABLE ONLY - essays excluded):
+{questions_block}
+
+Each request is a JSON object {{"questionIds": [...], "answers": [...]}} for one student:
+- Grade exactly the questions listed in questionIds, matching answers by questionId
+- If no answer found for a question, award 0 points
+
+{RESPONSE_FORMAT}"""
+
+
+def grade_with_context_cache(prepared, model_name, group, gradable_answers):
+    """Grade with Gemini, serving the assignment's static block from the context cache.
+
+    Returns (perQuestion, totalScore, feedback).
+    """
+    request = json.dumps({
+        'questionIds': [str(question_id(q)) for q in group],
+        'answers': gradable_answers,
+    })
+    text, _ = get_context_cache().generate(
+        prepared.get('assignment_id'), model_name, prepared['cached_instruction'], request)
+    return parse_grading_json(text, source='Gemini')
+
+
+def normalize_entry(pq):
+    """Clamp one perQuestion score to 0-10 in place (None is kept for essays)"""
+    score = pq.get('score')
+
+    # Handle None/null scores (for essays)
+    if score is None:
+        return pq
+
+    # Convert to number if string
+    try:
+        if isinstance(score, str):
+            score = float(score)
+        score = float(score)
+        # Ensure score is 0-10
+        score = max(0, min(10, score))
+        pq['score'] = score
+    except (ValueError, TypeError):
+        pq['score'] = 0  # Default to 0 if invalid
+    return pq
+
+
+def normalize_results(per_question, total):
+    """Clamp per-question scores to 0-10 and derive a 0-100 totalScore"""
+    # 🚀 FIX: Validate and normalize per-question scores
+    per_question = [normalize_entry(pq) for pq in per_question]
 
     # 🚀 FIX: Calculate totalScore from per-question scores if not provided or invalid
     try:
@@ -202,16 +270,372 @@ Be accurate and strict. Wrong answers must receive 0 points. Score must be betwe
     
     # Ensure totalScore is between 0-100
     total = max(0, min(100, int(total)))
+    return per_question, total
+
+
+GROUP_SIZE = int(os.getenv('GRADING_GROUP_SIZE') or 0)
+GROUP_CONCURRENCY = int(os.getenv('GRADING_GROUP_CONCURRENCY') or 4)
+GROUP_RETRIES = int(os.getenv('GRADING_GROUP_RETRIES') or 1)
+NOT_GRADED_FEEDBACK = 'Not graded: the AI grader returned no result for this question. Please review it manually.'
+
+# Shared across submissions so the total number of in-flight LLM groups stays capped
+_group_executor = None
+_group_executor_lock = threading.Lock()
+
+
+def _get_group_executor():
+    global _group_executor
+    with _group_executor_lock:
+        if _group_executor is None:
+            _group_executor = ThreadPoolExecutor(max_workers=max(1, GROUP_CONCURRENCY))
+        return _group_executor
+
+
+def _not_graded(group, graded=None):
+    """Entries for the group's questions missing from graded, as explicit zeros flagged notGraded"""
+    graded = graded or {}
+    return {str(question_id(q)): {"questionId": str(question_id(q)), "score": 0, "feedback": NOT_GRADED_FEEDBACK,
+                                  "notGraded": True}
+            for q in group if str(question_id(q)) not in graded}
+
+
+def _grade_group(grade_fn, questions_block, group, answers):
+    """Grade one group of questions, retrying it on its own when the LLM output is unusable.
+
+    grade_fn(questions_block, group, group_answers) -> (perQuestion, totalScore, feedback)
+    """
+    qids = {str(question_id(q)) for q in group}
+    group_answers = [a for a in answers if str(a.get('questionId')) in qids]
+    last_error = None
+    for attempt in range(GROUP_RETRIES + 1):
+        try:
+            per_question, total, feedback = grade_fn(questions_block, group, group_answers)
+            graded = {str(pq.get('questionId')): pq for pq in per_question if str(pq.get('questionId')) in qids}
+            if len(graded) == len(qids):
+                return graded, total, feedback
+            if graded and attempt == GROUP_RETRIES:
+                # Keep the missing questions in the totals as explicit zeros instead of dropping them
+                graded.update(_not_graded(group, graded))
+                return graded, None, feedback
+            last_error = ValueError(f"grades missing for {len(qids) - len(graded)} question(s)")
+        except Exception as e:
+            last_error = e
+        if attempt < GROUP_RETRIES:
+            time.sleep(0.5 * (attempt + 1))
+    raise last_error
+
+
+def _emit_graded(on_event, entries, source, **extra):
+    if on_event:
+        for pq in entries:
+            on_event('question_graded', {**normalize_entry(dict(pq)), 'source': source, **extra})
+
+
+def grade_pending_with_llm(prepared, pending, answers, model_name, group_size=0, on_event=None):
+    """Grade the questions still pending with CrewAI (or Gemini with a cached context).
+
+    Without a group size this is one monolithic prompt. Otherwise the questions are
+    split into groups that run concurrently on the shared pool; each group is
+    retried independently and its questions are reported through on_event as soon
+    as it finishes.
+    Returns ({questionId: perQuestion entry}, totalScore, feedback).
+    """
+    if get_context_cache():
+        # The questions block lives in the cached context; calls only carry answers
+        def grade_fn(block, group, group_answers):
+            return grade_with_context_cache(prepared, model_name, group, group_answers)
+    else:
+        def grade_fn(block, group, group_answers):
+            return grade_with_crewai(block, group_answers)
+
+    if not group_size or group_size >= len(pending):
+        questions_block = prepared['llm_questions_block'] if len(pending) == len(prepared['llm_questions']) else json.dumps(pending, indent=2)
+        graded, total, feedback = _grade_group(grade_fn, questions_block, pending, answers)
+        _emit_graded(on_event, graded.values(), 'llm')
+        return graded, total, feedback
+
+    groups = [pending[i:i + group_size] for i in range(0, len(pending), group_size)]
+    executor = _get_group_executor()
+    futures = {executor.submit(_grade_group, grade_fn, json.dumps(g, indent=2), g, answers): i for i, g in enumerate(groups)}
+    graded, feedbacks = {}, {}
+    failures = []
+    for future in as_completed(futures):
+        i = futures[future]
+        try:
+            group_graded, _, group_feedback = future.result()
+        except Exception as e:
+            # Out of retries: this group's questions are flagged, the other groups' grades are kept
+            print(f"Grading group {i + 1}/{len(groups)} failed: {e}", file=sys.stderr)
+            failures.append(e)
+            group_graded, group_feedback = _not_graded(groups[i]), ''
+        graded.update(group_graded)
+        if group_feedback:
+            feedbacks[i] = group_feedback
+        _emit_graded(on_event, group_graded.values(), 'llm', group=i, groups=len(groups))
+    if len(failures) == len(groups):
+        raise failures[-1]
+    # Per-group totals only cover part of the submission; the caller derives the total
+    return graded, None, ' '.join(feedbacks[i] for i in sorted(feedbacks))
+
+
+def prepare_assignment(assignment):
+    """Split an assignment's questions once so many submissions can share the work"""
+    questions = assignment.get('questions') or []
+    # Filter out essay questions - they should be graded manually
+    gradable_questions = [q for q in questions if q.get('type') != 'essay']
+    # MCQ and true/false are scored in-process; only the rest goes to the LLM
+    local_questions = [q for q in gradable_questions if can_grade_locally(q)]
+    llm_questions = [q for q in gradable_questions if not can_grade_locally(q)]
+    llm_block = json.dumps(llm_questions, indent=2) if llm_questions else ''
+    return {
+        'assignment_id': assignment.get('id') or assignment.get('_id'),
+        'gradable_questions': gradable_questions,
+        'essay_questions': [q for q in questions if q.get('type') == 'essay'],
+        'local_questions': local_questions,
+        'llm_questions': llm_questions,
+        'llm_qids': {str(question_id(q)) for q in llm_questions},
+        'question_hashes': {str(question_id(q)): question_hash(q) for q in llm_questions},
+        'reference_vectors': {},  # filled lazily by the similarity pre-scorer
+        'cached_instruction': cached_context_instruction(llm_block) if llm_questions and get_context_cache() else None,
+        'llm_questions_block': llm_block,
+    }
+
+
+def grade_prepared(prepared, submission, model_name, group_size=0, on_event=None):
+    """Grade one submission against a prepared assignment; returns the output dict (or an error dict).
+
+    group_size > 0 grades LLM questions in concurrent groups of that size;
+    on_event(name, data) is called as partial results become available.
+    """
+    start = time.time()
+    answers = submission.get('answers') or []
+    gradable_questions = prepared['gradable_questions']
+    local_questions = prepared['local_questions']
+    llm_questions = prepared['llm_questions']
+
+    if not gradable_questions:
+        # Only essay questions - return empty grading, mark essays for manual grading
+        per_question = [{"questionId": question_id(q), "score": None, "feedback": "Essay question - requires manual grading"} for q in prepared['essay_questions']]
+        return {
+            'perQuestion': per_question,
+            'totalScore': None,
+            'feedback': 'This submission contains only essay questions. Please grade manually.',
+            'model': model_name,
+            'version': GRADER_VERSION,
+            'hasEssays': True,
+            'latencyMs': int((time.time() - start) * 1000)
+        }
+
+    answers_by_qid = {str(a.get('questionId')): a for a in answers}
+    phase_start = time.time()
+    graded = {str(question_id(q)): grade_objective(q, answers_by_qid.get(str(question_id(q)))) for q in local_questions}
+    _emit_graded(on_event, graded.values(), 'local')
+    emit_phase(on_event, 'objective', phase_start, questions=len(local_questions))
+
+    feedback = ''
+    total = None
+    cache_stats = {'hits': 0, 'misses': 0}
+    similarity_stats = None
+    llm_sent = 0
+    if llm_questions:
+        # Reuse earlier LLM judgements of the same answer to the same question
+        phase_start = time.time()
+        cache = get_default_cache()
+        context = get_context_cache()
+        if context is not None and getattr(context.backend, 'simulated', False):
+            # Simulated grades are placeholders: keep them out of (and don't mix them with) real cached grades
+            cache = None
+        cache_keys = {}
+        if cache:
+            for q in llm_questions:
+                qid = str(question_id(q))
+                cache_keys[qid] = make_key(prepared['question_hashes'][qid], answers_by_qid.get(qid), model_name, GRADER_VERSION)
+            try:
+                cached = cache.get_many(list(cache_keys.values()))
+            except Exception as e:
+                print(f"Grading cache read failed: {e}", file=sys.stderr)
+                cached = {}
+            for qid, key in cache_keys.items():
+                if key in cached:
+                    graded[qid] = {"questionId": qid, **cached[key]}
+                    cache_stats['hits'] += 1
+                    _emit_graded(on_event, [graded[qid]], 'cache')
+            emit_phase(on_event, 'cache', phase_start, hits=cache_stats['hits'])
 
-    out = {
+        pending = [q for q in llm_questions if str(question_id(q)) not in graded]
+        cache_stats['misses'] = len(pending)
+
+        # Clear-cut short answers are scored by embedding similarity; only the middle band goes on
+        sim_cfg = answer_similarity.settings()
+        if sim_cfg['enabled'] and pending:
+            phase_start = time.time()
+            try:
+                sim_graded, pending, sim_stats = answer_similarity.prescore(
+                    pending, answers_by_qid, prepared['reference_vectors'], sim_cfg)
+                graded.update(sim_graded)
+                _emit_graded(on_event, sim_graded.values(), 'similarity')
+                emit_phase(on_event, 'similarity', phase_start, escalated=sim_stats['escalated'])
+                sim_stats['escalationRate'] = round(sim_stats['escalated'] / max(1, cache_stats['misses']), 3)
+                similarity_stats = sim_stats
+            except Exception as e:
+                print(f"Similarity pre-scoring failed: {e}", file=sys.stderr)
+
+    if llm_questions and pending:
+        if not CREWAI_AVAILABLE and not get_context_cache():
+            return {"error": f"CrewAI not installed: {CREWAI_IMPORT_ERROR}"}
+        llm_sent = len(pending)
+        grader = 'Gemini' if get_context_cache() else 'CrewAI'
+        phase_start = time.time()
+        try:
+            llm_graded, llm_total, feedback = grade_pending_with_llm(
+                prepared, pending, answers, model_name, group_size, on_event)
+        except Exception as e:
+            return {"error": f"{grader} grading failed: {str(e)}"}
+        emit_phase(on_event, 'llm', phase_start, questions=llm_sent)
+
+        # Validate results
+        if not llm_graded:
+            return {"error": f"No grading results produced by {grader}"}
+        graded.update(llm_graded)
+        fresh = {cache_keys[qid]: {'score': pq.get('score'), 'feedback': pq.get('feedback')}
+                 for qid, pq in llm_graded.items() if qid in cache_keys and not pq.get('notGraded')}
+        if cache and fresh:
+            try:
+                cache.put_many(fresh)
+            except Exception as e:
+                print(f"Grading cache write failed: {e}", file=sys.stderr)
+        if len(pending) == len(gradable_questions):
+            total = llm_total
+
+    # Keep the assignment's question order
+    per_question = [graded[str(question_id(q))] for q in gradable_questions if str(question_id(q)) in graded]
+    if not feedback:
+        notes = []
+        if local_questions:
+            correct = sum(1 for q in local_questions if graded[str(question_id(q))]['score'] == 10)
+            notes.append(f"Objective questions graded automatically: {correct}/{len(local_questions)} correct.")
+        if cache_stats['hits']:
+            notes.append(f"{cache_stats['hits']} answer(s) matched earlier AI assessments.")
+        if similarity_stats and similarity_stats['scoredHigh'] + similarity_stats['scoredLow']:
+            notes.append("Short answers scored by similarity to the expected answers.")
+        feedback = ' '.join(notes)
+
+    per_question, total = normalize_results(per_question, total)
+
+    return {
         'perQuestion': per_question,
         'totalScore': total,  # Always a valid 0-100 score
         'feedback': feedback,
         'model': model_name,
-        'version': 'v0.1',
+        'version': GRADER_VERSION,
+        'localGraded': len(local_questions),
+        'llmGraded': llm_sent,
+        'cache': cache_stats,
+        'similarity': similarity_stats,
         'latencyMs': int((time.time() - start) * 1000)
     }
-    print(json.dumps(out))
+
+
+def grade_submission(payload, on_event=None):
+    """Grade one submission payload and return the output dict (or an error dict)"""
+    model_name = payload.get('model') or os.getenv('GEMINI_MODEL') or 'gemini-2.5-flash'
+    group_size = int(payload.get('groupSize') or GROUP_SIZE)
+    prepared = prepare_assignment(payload.get('assignment') or {})
+    return grade_prepared(prepared, payload.get('submission') or {}, model_name, group_size, on_event)
+
+
+def grade_batch(lines, out, concurrency):
+    """Grade every submission of one assignment from a JSONL stream.
+
+    The first line is {"assignment": {...}, "model": "..."}; every following line is
+    a submission ({"id": ..., "answers": [...]}, optionally wrapped as {"submission": ...}).
+    One {"submissionId", "data" | "error"} line is written per submission as it finishes,
+    followed by a final {"event": "done"} summary line.
+    """
+    start = time.time()
+    writer = LineWriter(out)
+    lines = (l for l in lines if l.strip())
+    try:
+        header = json.loads(next(lines))
+        if not isinstance(header, dict):
+            raise ValueError(f"expected a JSON object, got {type(header).__name__}")
+    except StopIteration:
+        writer.write({"error": "batch input is empty"})
+        return
+    except Exception as e:
+        writer.write({"error": f"invalid batch header: {e}"})
+        return
+
+    model_name = header.get('model') or os.getenv('GEMINI_MODEL') or 'gemini-2.5-flash'
+    group_size = int(header.get('groupSize') or GROUP_SIZE)
+    prepared = prepare_assignment(header.get('assignment') or {})
+    counts = {'graded': 0, 'failed': 0}
+    counts_lock = threading.Lock()
+
+    def grade_one(submission):
+        sub_id = submission.get('id') if submission.get('id') is not None else submission.get('_id')
+        try:
+            data = grade_prepared(prepared, submission, model_name, group_size)
+            error = data.get('error')
+        except Exception as e:
+            data, error = None, f"{type(e).__name__}: {e}"
+        with counts_lock:
+            counts['failed' if error else 'graded'] += 1
+        writer.write({"submissionId": sub_id, "error": error} if error else {"submissionId": sub_id, "data": data})
+
+    # Read lazily and keep at most `concurrency` submissions in flight
+    slots = threading.BoundedSemaphore(concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for line in lines:
+            try:
+                item = json.loads(line)
+                submission = item.get('submission') or item
+            except Exception as e:
+                with counts_lock:
+                    counts['failed'] += 1
+                writer.write({"submissionId": None, "error": f"invalid submission line: {e}"})
+                continue
+            slots.acquire()
+
+            def task(sub=submission):
+                try:
+                    grade_one(sub)
+                finally:
+                    slots.release()
+
+            executor.submit(task)
+
+    writer.write({"event": "done", **counts, "latencyMs": int((time.time() - start) * 1000)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grade assignment submissions (JSON on stdin)')
+    add_server_args(parser)
+    parser.add_argument('--batch', action='store_true',
+                        help='grade many submissions of one assignment (JSONL in, JSONL out)')
+    parser.add_argument('--stream', action='store_true',
+                        help='write progress events as JSON lines, ending with {"event": "final", "data": ...}')
+    args = parser.parse_args()
+    if args.serve:
+        serve(grade_submission, args, name='assignment_grader')
+        return
+    if args.batch:
+        grade_batch(sys.stdin, sys.stdout, max(1, args.concurrency))
+        return
+
+    try:
+        payload = json.loads(sys.stdin.read() or '{}')
+    except Exception as e:
+        print(json.dumps({"error": f"invalid input: {e}"}))
+        return
+
+    if not args.stream:
+        print(json.dumps(grade_submission(payload)))
+        return
+
+    writer = LineWriter(sys.stdout)
+    out = grade_submission(payload, on_event=lambda name, data: writer.write({'event': name, **data}))
+    writer.write({'event': 'final', 'data': out})
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+"""
+Context caching for the static part of grading prompts.
+
+Every grading call for an assignment repeats the same instructions, questions and
+correct answers; only the student answers change. With GRADING_CONTEXT_CACHE set,
+the grader sends the static block once as a cached context (keyed by assignment id,
+model and a hash of the block) and each call carries only the per-submission part.
+
+Entries expire after GRADING_CONTEXT_TTL_SECONDS (default 600) or as soon as the
+assignment's static block changes. Cache names are remembered in
+agents-python/.cache/context_cache.json so one-shot processes can reuse them too.
+
+Backends:
+    gemini      google.generativeai CachedContent (real context caching)
+    simulated   in-memory stand-in for local testing; no network calls
+"""
+import os, sys, json, time, hashlib, datetime, threading
+
+try:
+    import google.generativeai as genai  # type: ignore
+    from google.generativeai import caching as genai_caching  # type: ignore
+except Exception:
+    genai = genai_caching = None
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'context_cache.json')
+
+
+def _model_path(model):
+    return model if model.startswith('models/') else f"models/{model}"
+
+
+class GeminiContextBackend:
+    simulated = False
+
+    def __init__(self):
+        if genai is None or genai_caching is None:
+            raise RuntimeError('google-generativeai with caching support is not installed')
+        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+
+    def create(self, model, static_text, ttl_seconds, display_name):
+        cached = genai_caching.CachedContent.create(
+            model=_model_path(model),
+            display_name=display_name[:128],
+            system_instruction=static_text,
+            ttl=datetime.timedelta(seconds=ttl_seconds),
+        )
+        return cached.name
+
+    def generate(self, name, model, dynamic_text):
+        cached = genai_caching.CachedContent.get(name)
+        resp = genai.GenerativeModel.from_cached_content(cached_content=cached).generate_content(dynamic_text)
+        return resp.text or ''
+
+    def generate_uncached(self, model, static_text, dynamic_text):
+        resp = genai.GenerativeModel(model, system_instruction=static_text).generate_content(dynamic_text)
+        return resp.text or ''
+
+    def delete(self, name):
+        genai_caching.CachedContent.get(name).delete()
+
+
+class SimulatedContextBackend:
+    """Stand-in that keeps cached contexts in memory and counts calls.
+
+    responder(static_text, dynamic_text) -> str produces the model output; the
+    default returns a zero score for every requested questionId.
+    """
+
+    simulated = True  # its grades must never reach the persistent grading cache
+
+    def __init__(self, responder=None):
+        self.responder = responder or self._default_responder
+        self.contexts = {}
+        self.calls = {'create': 0, 'generate': 0, 'uncached': 0, 'delete': 0}
+        self._counter = 0
+
+    @staticmethod
+    def _default_responder(static_text, dynamic_text):
+        request = json.loads(dynamic_text)
+        return json.dumps({
+            'perQuestion': [{'questionId': qid, 'score': 0, 'feedback': 'Simulated grade.'} for qid in request.get('questionIds', [])],
+            'totalScore': 0,
+            'feedback': 'Simulated grading.',
+        })
+
+    def create(self, model, static_text, ttl_seconds, display_name):
+        self._counter += 1
+        self.calls['create'] += 1
+        name = f"cachedContents/simulated-{self._counter}"
+        self.contexts[name] = static_text
+        return name
+
+    def generate(self, name, model, dynamic_text):
+        if name not in self.contexts:
+            raise KeyError(f"cached content {name} not found")
+        self.calls['generate'] += 1
+        return self.responder(self.contexts[name], dynamic_text)
+
+    def generate_uncached(self, model, static_text, dynamic_text):
+        self.calls['uncached'] += 1
+        return self.responder(static_text, dynamic_text)
+
+    def delete(self, name):
+        self.calls['delete'] += 1
+        self.contexts.pop(name, None)
+
+
+class ContextCache:
+    def __init__(self, backend, ttl_seconds=600, index_path=None):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.index_path = index_path
+        self.lock = threading.Lock()
+        self.pending = {}  # slot -> Event set once the context being created for it is recorded
+        self.entries = self._load_index()
+
+    def _load_index(self):
+        if not self.index_path or not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _save_index(self):
+        if not self.index_path:
+            return
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.index_path)
+
+    def _acquire(self, assignment_id, model, static_text):
+        """Return (cache name or None, status) for the assignment's current static block"""
+        content_hash = hashlib.sha256(f"{model}\x1f{static_text}".encode('utf-8')).hexdigest()
+        slot = f"{assignment_id or content_hash}:{model}"
+        while True:
+            with self.lock:
+                now = time.time()
+                entry = self.entries.get(slot)
+                if not entry or entry['hash'] != content_hash:
+                    # Another process may already have cached this block
+                    self.entries.update(self._load_index())
+                    entry = self.entries.get(slot)
+                # Leave a little headroom so an entry does not expire mid-request
+                if entry and entry['hash'] == content_hash and entry['expiresAt'] > now + 15:
+                    return entry['name'], 'hit' if entry['name'] else 'uncached'
+                creating = self.pending.get(slot)
+                if creating is None:
+                    # Assignment changed or entry (nearly) expired: this thread replaces it
+                    stale = entry['name'] if entry else None
+                    self.entries.pop(slot, None)
+                    creating = self.pending[slot] = threading.Event()
+                    break
+            # Another thread is creating this slot's context; use its result
+            creating.wait()
+
+        # Provider calls run outside the lock so other assignments aren't held up
+        name = None
+        try:
+            if stale:
+                try:
+                    self.backend.delete(stale)
+                except Exception:
+                    pass
+            try:
+                name = self.backend.create(model, static_text, self.ttl_seconds, f"grading:{slot}:{content_hash[:12]}")
+            except Exception:
+                # e.g. block below the provider's minimum cacheable size; don't retry until the TTL
+                name = None
+        finally:
+            with self.lock:
+                self.entries[slot] = {'name': name, 'hash': content_hash, 'expiresAt': now + self.ttl_seconds}
+                self._save_index()
+                self.pending.pop(slot).set()
+        return name, 'created' if name else 'uncached'
+
+    def _invalidate(self, name):
+        with self.lock:
+            for slot, entry in list(self.entries.items()):
+                if entry.get('name') == name:
+                    self.entries.pop(slot)
+            self._save_index()
+
+    def generate(self, assignment_id, model, static_text, dynamic_text):
+        """Run one call with the static block served from cache when possible; returns (text, status)"""
+        name, status = self._acquire(assignment_id, model, static_text)
+        if name:
+            try:
+                return self.backend.generate(name, model, dynamic_text), status
+            except Exception:
+                # Expired or deleted on the provider side; drop it and go uncached this time
+                self._invalidate(name)
+        return self.backend.generate_uncached(model, static_text, dynamic_text), 'uncached'
+
+
+_default_cache = None
+_default_unavailable = False  # GRADING_CONTEXT_CACHE=gemini without a usable SDK
+_default_lock = threading.Lock()
+
+
+def get_context_cache():
+    """Process-wide context cache selected by GRADING_CONTEXT_CACHE (gemini|simulated), else None.
+
+    None also when the gemini backend can't be set up, so callers fall back to uncached prompts.
+    """
+    global _default_cache, _default_unavailable
+    kind = (os.getenv('GRADING_CONTEXT_CACHE') or '').lower()
+    if kind not in ('gemini', 'simulated'):
+        return None
+    with _default_lock:
+        if _default_cache is None and not _default_unavailable:
+            ttl = int(os.getenv('GRADING_CONTEXT_TTL_SECONDS') or 600)
+            if kind == 'gemini':
+                try:
+                    _default_cache = ContextCache(GeminiContextBackend(), ttl, DEFAULT_INDEX_PATH)
+                except Exception as e:
+                    print(f"Context caching disabled, using uncached prompts: {e}", file=sys.stderr)
+                    _default_unavailable = True
+            else:
+                _default_cache = ContextCache(SimulatedContextBackend(), ttl)
+        return _default_cache
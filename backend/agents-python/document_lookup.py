@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Document lookup for the Node RAG retriever.
+
+Vectors ingested with --lean-metadata carry only filterable fields; their full
+hadith and ayah texts live in the ingestion scripts' document store
+(scripts/document_store.py). utils/ragSystemPinecone.js sends the parent ids of
+such matches here and merges the returned documents into their metadata.
+
+    stdin:  {"ids": ["hadith_sahih-muslim_12", "quran_2_255"]}
+    stdout: {"documents": {"hadith_sahih-muslim_12": {...}, ...}}
+
+The store is read from DOCUMENT_STORE_PATH (default scripts/.cache/documents.sqlite3),
+so the server must run where the lean ingestion wrote it, or point the variable
+at a copy.
+"""
+import sys, json, os, argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from agent_server import add_server_args, serve
+from document_store import DEFAULT_PATH, DocumentStore
+
+_store = None
+
+
+def get_store():
+    """The shared document store, or None if it hasn't been written"""
+    global _store
+    if _store is None:
+        path = os.getenv('DOCUMENT_STORE_PATH') or str(DEFAULT_PATH)
+        # Don't create an empty store for a server that never ran a lean ingestion
+        if not os.path.exists(path):
+            return None
+        _store = DocumentStore(path)
+    return _store
+
+
+def lookup_documents(payload):
+    ids = [i for i in (payload.get('ids') or []) if isinstance(i, str)]
+    store = get_store()
+    if store is None:
+        return {"documents": {}, "error": "document store not found (set DOCUMENT_STORE_PATH)"}
+    return {"documents": store.get_many(ids)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Look up full texts of lean-metadata vectors (JSON on stdin)')
+    add_server_args(parser)
+    args = parser.parse_args()
+    if args.serve:
+        serve(lookup_documents, args, name='document_lookup')
+        return
+
+    try:
+        payload = json.loads(sys.stdin.read() or '{}')
+    except Exception as e:
+        print(json.dumps({"error": f"invalid input: {e}"}))
+        return
+    print(json.dumps(lookup_documents(payload)))
+
+if __name__ == '__main__':
+    main()
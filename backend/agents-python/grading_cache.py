@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+"""
+Persistent answer-level cache for LLM grading results.
+
+Entries are keyed by (question content hash, normalized answer text, model, grader
+version) and hold the score and feedback the LLM gave. Storage is a local SQLite
+file in WAL mode, so several worker threads and processes can share it. Eviction
+is least-recently-used once the table exceeds max_entries, plus a TTL.
+
+Environment:
+    GRADING_CACHE_ENABLED       default true
+    GRADING_CACHE_PATH          default agents-python/.cache/grading_cache.sqlite3
+    GRADING_CACHE_MAX_ENTRIES   default 50000
+    GRADING_CACHE_TTL_SECONDS   default 30 days
+"""
+import os, re, sys, json, time, sqlite3, hashlib, threading
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'grading_cache.sqlite3')
+
+
+def question_hash(q):
+    """Hash the parts of a question that affect how an answer is judged"""
+    content = {k: q.get(k) for k in ('type', 'prompt', 'options', 'answer', 'correctAnswer', 'correctOption', 'rubric')}
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def normalize_answer(answer):
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a student answer"""
+    answer = answer or {}
+    text = answer.get('answerText')
+    if text is None:
+        text = answer.get('selectedOption')
+    text = '' if text is None else str(text)
+    text = re.sub(r'\s+', ' ', text).strip().lower()
+    return text.strip(' .,;:!?')
+
+
+def make_key(q_hash, answer, model, version):
+    raw = '\x1f'.join([q_hash, normalize_answer(answer), model or '', version or ''])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class GradingCache:
+    def __init__(self, path=DEFAULT_PATH, max_entries=50000, ttl_seconds=30 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS grades ('
+            ' key TEXT PRIMARY KEY, score REAL, feedback TEXT,'
+            ' created_at REAL NOT NULL, last_used REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS grades_last_used ON grades(last_used)')
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 connections are not shareable across threads; keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys):
+        """Return {key: {"score", "feedback"}} for every fresh entry among keys"""
+        if not keys:
+            return {}
+        now = time.time()
+        conn = self._conn()
+        placeholders = ','.join('?' * len(keys))
+        rows = conn.execute(
+            f'SELECT key, score, feedback FROM grades WHERE key IN ({placeholders}) AND created_at >= ?',
+            [*keys, now - self.ttl_seconds]
+        ).fetchall()
+        if rows:
+            conn.execute(
+                f'UPDATE grades SET last_used = ? WHERE key IN ({",".join("?" * len(rows))})',
+                [now, *[r[0] for r in rows]]
+            )
+            conn.commit()
+        return {key: {'score': score, 'feedback': feedback} for key, score, feedback in rows}
+
+    def put_many(self, entries):
+        """Store {key: {"score", "feedback"}} and evict old entries when over capacity"""
+        if not entries:
+            return
+        now = time.time()
+        conn = self._conn()
+        conn.executemany(
+            'INSERT OR REPLACE INTO grades (key, score, feedback, created_at, last_used) VALUES (?, ?, ?, ?, ?)',
+            [(k, v.get('score'), v.get('feedback'), now, now) for k, v in entries.items()]
+        )
+        conn.commit()
+        with self._writes_lock:
+            self._writes += len(entries)
+            due = self._writes >= 100
+            if due:
+                self._writes = 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        conn = self._conn()
+        conn.execute('DELETE FROM grades WHERE created_at < ?', (time.time() - self.ttl_seconds,))
+        count = conn.execute('SELECT COUNT(*) FROM grades').fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                'DELETE FROM grades WHERE key IN (SELECT key FROM grades ORDER BY last_used ASC LIMIT ?)',
+                (count - self.max_entries,)
+            )
+        conn.commit()
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Process-wide cache configured from the environment, or None when disabled/unavailable"""
+    global _default_cache
+    if os.getenv('GRADING_CACHE_ENABLED', 'true').lower() in ('0', 'false', 'no'):
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = GradingCache(
+                    path=os.getenv('GRADING_CACHE_PATH') or DEFAULT_PATH,
+                    max_entries=int(os.getenv('GRADING_CACHE_MAX_ENTRIES') or 50000),
+                    ttl_seconds=int(os.getenv('GRADING_CACHE_TTL_SECONDS') or 30 * 24 * 3600),
+                )
+            except Exception as e:
+                print(f"Grading cache disabled: {e}", file=sys.stderr)
+                return None
+        return _default_cache
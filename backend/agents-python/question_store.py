@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+"""
+On-disk store of generated questions and warm question pools.
+
+Every generated question is recorded under its pool (topic, difficulty, model)
+and type. Questions are marked as served once handed to a class, so a request is
+answered straight from the pool only when enough *unused* questions exist for
+each requested type, and two classes never receive the same question. Prompts
+are de-duplicated per pool.
+
+Pools are filled ahead of time by `assignment_creator.py --prefill`, which
+regenerates the most requested specs (topic, difficulty, counts per type, model)
+until each has enough unused questions for a few more requests.
+
+Environment:
+    QUESTION_POOL_ENABLED       default true
+    QUESTION_POOL_PATH          default agents-python/.cache/question_pool.sqlite3
+    QUESTION_POOL_MAX_ENTRIES   default 20000
+    QUESTION_POOL_TTL_SECONDS   default 14 days
+"""
+import os, re, sys, json, time, sqlite3, hashlib, threading
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'question_pool.sqlite3')
+
+COUNT_FIELDS = (('mcq', 'mcqCount'), ('true-false', 'trueFalseCount'),
+                ('short-answer', 'shortAnswerCount'), ('essay', 'essayCount'))
+
+
+def _normalize_text(text):
+    return re.sub(r'\s+', ' ', str(text or '')).strip().lower()
+
+
+def spec_counts(ai_spec):
+    """Requested questions per type; {'any': n} when no per-type counts are given"""
+    counts = {qtype: ai_spec.get(field) for qtype, field in COUNT_FIELDS}
+    if not any(isinstance(c, int) and c > 0 for c in counts.values()):
+        return {'any': int(ai_spec.get('numQuestions') or 5)}
+    return {qtype: c for qtype, c in counts.items() if isinstance(c, int) and c > 0}
+
+
+def pool_key(ai_spec, title, model):
+    topic = ai_spec.get('topic') or title or 'General Islamic Studies'
+    parts = [_normalize_text(topic), (ai_spec.get('difficulty') or 'medium').lower(), model]
+    return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+
+
+def spec_key(ai_spec, title, model):
+    return hashlib.sha256(json.dumps([pool_key(ai_spec, title, model), spec_counts(ai_spec)],
+                                     sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class QuestionStore:
+    def __init__(self, path=DEFAULT_PATH, max_entries=20000, ttl_seconds=14 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS questions ('
+            ' id INTEGER PRIMARY KEY, pool_key TEXT NOT NULL, qtype TEXT NOT NULL,'
+            ' prompt_hash TEXT NOT NULL, question TEXT NOT NULL, sources TEXT,'
+            ' created_at REAL NOT NULL, last_used REAL, served INTEGER NOT NULL DEFAULT 0,'
+            ' UNIQUE (pool_key, prompt_hash))'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS questions_unused ON questions(pool_key, qtype, served)')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS specs ('
+            ' spec_key TEXT PRIMARY KEY, payload TEXT NOT NULL,'
+            ' requests INTEGER NOT NULL DEFAULT 0, last_requested REAL NOT NULL)'
+        )
+
+    def _conn(self):
+        # One connection per thread; transactions are managed explicitly
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def note_request(self, ai_spec, title, model):
+        """Count a request for this spec so --prefill knows which pools are popular"""
+        payload = json.dumps({'aiSpec': ai_spec, 'title': title, 'model': model})
+        self._conn().execute(
+            'INSERT INTO specs (spec_key, payload, requests, last_requested) VALUES (?, ?, 1, ?)'
+            ' ON CONFLICT(spec_key) DO UPDATE SET requests = requests + 1, last_requested = excluded.last_requested',
+            (spec_key(ai_spec, title, model), payload, time.time())
+        )
+
+    def unused_counts(self, ai_spec, title, model):
+        key = pool_key(ai_spec, title, model)
+        rows = self._conn().execute(
+            'SELECT qtype, COUNT(*) FROM questions WHERE pool_key = ? AND served = 0 AND created_at >= ? GROUP BY qtype',
+            (key, time.time() - self.ttl_seconds)
+        ).fetchall()
+        return dict(rows)
+
+    def take(self, ai_spec, title, model):
+        """Atomically claim unused questions for the spec; returns (questions, sources) or (None, None)"""
+        self.note_request(ai_spec, title, model)
+        key = pool_key(ai_spec, title, model)
+        min_created = time.time() - self.ttl_seconds
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            picked = []
+            for qtype, count in spec_counts(ai_spec).items():
+                sql = 'SELECT id, question, sources FROM questions WHERE pool_key = ? AND served = 0 AND created_at >= ?'
+                params = [key, min_created]
+                if qtype != 'any':
+                    sql += ' AND qtype = ?'
+                    params.append(qtype)
+                if picked:
+                    sql += f' AND id NOT IN ({",".join("?" * len(picked))})'
+                    params.extend(r[0] for r in picked)
+                rows = conn.execute(sql + ' ORDER BY created_at LIMIT ?', params + [count]).fetchall()
+                if len(rows) < count:
+                    conn.execute('ROLLBACK')
+                    return None, None
+                picked.extend(rows)
+            conn.executemany('UPDATE questions SET served = 1, last_used = ? WHERE id = ?',
+                             [(time.time(), r[0]) for r in picked])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        sources = []
+        for _, _, src in picked:
+            for s in json.loads(src or '[]'):
+                if s not in sources:
+                    sources.append(s)
+        return [json.loads(q) for _, q, _ in picked], sources
+
+    def record(self, ai_spec, title, model, questions, sources, served=True):
+        """Add questions to the pool; served=True marks them as already handed out.
+
+        Returns the number of rows inserted (or, for served=True, inserted or updated).
+        """
+        key = pool_key(ai_spec, title, model)
+        now = time.time()
+        conn = self._conn()
+        before = conn.total_changes
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for q in questions:
+                prompt_hash = hashlib.sha256(_normalize_text(q.get('prompt')).encode('utf-8')).hexdigest()
+                if served:
+                    # A prompt handed to a class must not be served again from the pool
+                    conn.execute(
+                        'INSERT INTO questions (pool_key, qtype, prompt_hash, question, sources, created_at, last_used, served)'
+                        ' VALUES (?, ?, ?, ?, ?, ?, ?, 1)'
+                        ' ON CONFLICT(pool_key, prompt_hash) DO UPDATE SET served = 1, last_used = excluded.last_used',
+                        (key, q.get('type') or 'mcq', prompt_hash, json.dumps(q), json.dumps(sources or []), now, now)
+                    )
+                else:
+                    conn.execute(
+                        'INSERT OR IGNORE INTO questions (pool_key, qtype, prompt_hash, question, sources, created_at, served)'
+                        ' VALUES (?, ?, ?, ?, ?, ?, 0)',
+                        (key, q.get('type') or 'mcq', prompt_hash, json.dumps(q), json.dumps(sources or []), now)
+                    )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        added = conn.total_changes - before
+        self.evict()
+        return added
+
+    def popular_specs(self, limit=10):
+        rows = self._conn().execute(
+            'SELECT payload FROM specs WHERE last_requested >= ? ORDER BY requests DESC LIMIT ?',
+            (time.time() - self.ttl_seconds, limit)
+        ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def evict(self):
+        conn = self._conn()
+        conn.execute('DELETE FROM questions WHERE created_at < ?', (time.time() - self.ttl_seconds,))
+        count = conn.execute('SELECT COUNT(*) FROM questions').fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                'DELETE FROM questions WHERE id IN (SELECT id FROM questions'
+                ' ORDER BY COALESCE(last_used, created_at) ASC LIMIT ?)',
+                (count - self.max_entries,)
+            )
+
+
+def prefill(store, generate_fn, specs, target_requests=2, max_rounds=5):
+    """Generate questions for each spec until the pool could serve target_requests more requests.
+
+    generate_fn(payload) -> (questions, sources, generator). Returns a per-spec summary list.
+    """
+    summary = []
+    for payload in specs:
+        ai_spec = payload.get('aiSpec') or {}
+        title, model = payload.get('title'), payload.get('model')
+        counts = spec_counts(ai_spec)
+        added = 0
+        for _ in range(max_rounds):
+            unused = store.unused_counts(ai_spec, title, model)
+            if 'any' in counts:
+                short = sum(unused.values()) < counts['any'] * target_requests
+            else:
+                short = any(unused.get(t, 0) < c * target_requests for t, c in counts.items())
+            if not short:
+                break
+            questions, sources, generator = generate_fn({**payload, 'skipPool': True})
+            if generator == 'fallback' or not questions:
+                break
+            new = store.record(ai_spec, title, model, questions, sources, served=False)
+            added += new
+            if not new:
+                break  # generator keeps repeating itself
+        summary.append({'topic': ai_spec.get('topic') or title, 'counts': counts, 'added': added,
+                        'unused': store.unused_counts(ai_spec, title, model)})
+    return summary
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_question_store():
+    """Process-wide store configured from the environment, or None when disabled/unavailable"""
+    global _default_store
+    if os.getenv('QUESTION_POOL_ENABLED', 'true').lower() in ('0', 'false', 'no'):
+        return None
+    with _default_lock:
+        if _default_store is None:
+            try:
+                _default_store = QuestionStore(
+                    path=os.getenv('QUESTION_POOL_PATH') or DEFAULT_PATH,
+                    max_entries=int(os.getenv('QUESTION_POOL_MAX_ENTRIES') or 20000),
+                    ttl_seconds=int(os.getenv('QUESTION_POOL_TTL_SECONDS') or 14 * 24 * 3600),
+                )
+            except Exception as e:
+                print(f"Question pool disabled: {e}", file=sys.stderr)
+                return None
+        return _default_store
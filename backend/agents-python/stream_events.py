@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Helpers for the agents' opt-in streaming protocol.
+
+With --stream (or "stream": true on a worker request) the agents write one JSON
+line per event as soon as it is ready instead of a single blob at exit:
+
+    {"event": "question_generated", "index": 0, "question": {...}}
+    {"event": "question_graded", "questionId": "...", "score": 10, "feedback": "...", "source": "local"}
+    {"event": "phase_timing", "phase": "llm", "ms": 5230}
+    {"event": "final", "data": {...same JSON as the non-streaming output...}}
+
+In worker mode every event also carries the request "id", and the final result
+is the usual {"id", "data"} response.
+"""
+import json, time
+
+
+class JSONArrayStreamParser:
+    """Incrementally parses a streamed JSON array, yielding each top-level object once complete.
+
+    Text before the opening '[' (e.g. a markdown fence) is ignored, as is anything
+    after the closing ']'. Objects that fail to decode are skipped.
+    """
+
+    def __init__(self):
+        self.buf = ''
+        self.pos = 0
+        self.started = False
+        self.done = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.obj_start = None
+
+    def feed(self, chunk):
+        """Consume more text and return the list of objects completed by it"""
+        self.buf += chunk or ''
+        completed = []
+        while self.pos < len(self.buf) and not self.done:
+            c = self.buf[self.pos]
+            if not self.started:
+                self.started = c == '['
+            elif self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == '\\':
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+            elif c == '"':
+                self.in_string = True
+            elif c == '{':
+                if self.depth == 0:
+                    self.obj_start = self.pos
+                self.depth += 1
+            elif c == '}' and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    try:
+                        completed.append(json.loads(self.buf[self.obj_start:self.pos + 1]))
+                    except ValueError:
+                        pass
+                    self.obj_start = None
+            elif c == ']' and self.depth == 0:
+                self.done = True
+            self.pos += 1
+
+        # Drop consumed text, keeping any partially received object
+        keep = self.obj_start if self.obj_start is not None else self.pos
+        self.buf = self.buf[keep:]
+        self.pos -= keep
+        if self.obj_start is not None:
+            self.obj_start = 0
+        return completed
+
+
+def emit_phase(on_event, phase, started, **extra):
+    """Report how long a phase took (no-op when not streaming)"""
+    if on_event:
+        on_event('phase_timing', {'phase': phase, 'ms': int((time.time() - started) * 1000), **extra})
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Chunking of long hadith and ayah texts for the ingestion scripts.
+
+A record whose embedded text is longer than max_tokens is split on sentence
+(and verse-marker) boundaries into chunks of at most max_tokens, each starting
+with up to overlap_tokens of the previous chunk's closing sentences. Every chunk
+becomes its own vector, <id>#<n>, whose metadata carries parent_id, chunk and
+chunks so query results can be collapsed back to one hit per record. Records
+that fit keep their plain <id> and get no chunk fields.
+
+Chunking is opt-in: the ingestion scripts only split records when run with
+--chunk-tokens (CHUNK_TOKENS is the suggested size). In full-metadata mode a
+chunk vector stores its own passage in `text` instead of the record's texts.
+
+Token counts are estimates (about four characters per token); they only have
+to be good enough to keep chunks well inside the embedding model's window.
+"""
+
+import re
+import math
+import threading
+
+CHUNK_TOKENS = 400
+CHUNK_OVERLAP = 60
+
+# Sentence ends in English and Arabic text (؟ Arabic question mark, ۔ full stop,
+# ۝ end-of-ayah mark), plus line breaks
+_BOUNDARY = re.compile(r'(?<=[.!?؟۔۝])\s+|\s*\n+\s*')
+
+
+def estimate_tokens(text):
+    return max(1, math.ceil(len(text) / 4))
+
+
+def split_sentences(text):
+    return [s for s in (part.strip() for part in _BOUNDARY.split(text)) if s]
+
+
+def _split_long(sentence, max_tokens):
+    """Break a sentence longer than max_tokens at word (or, failing that, character) boundaries"""
+    max_chars = max_tokens * 4
+    pieces, current = [], ''
+    for word in sentence.split():
+        while len(word) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ''
+            pieces.append(word[:max_chars])
+            word = word[max_chars:]
+        if current and len(current) + 1 + len(word) > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_text(text, max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP):
+    """Split text into overlapping chunks of at most max_tokens; short texts come back whole"""
+    if not max_tokens or estimate_tokens(text) <= max_tokens:
+        return [text]
+    pieces = []
+    for sentence in split_sentences(text):
+        if estimate_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+        else:
+            pieces.extend(_split_long(sentence, max_tokens))
+
+    chunks, current, size = [], [], 0
+    for piece in pieces:
+        tokens = estimate_tokens(piece)
+        if current and size + tokens > max_tokens:
+            chunks.append(' '.join(current))
+            # Carry the closing sentences (up to overlap_tokens) into the next chunk
+            tail, tail_size = [], 0
+            for prev in reversed(current):
+                prev_tokens = estimate_tokens(prev)
+                if tail_size + prev_tokens > overlap_tokens:
+                    break
+                tail.insert(0, prev)
+                tail_size += prev_tokens
+            if tail_size + tokens > max_tokens:
+                tail, tail_size = [], 0
+            current, size = tail, tail_size
+        current.append(piece)
+        size += tokens
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+
+class ChunkStats:
+    """Chunk counts and the token-length distribution of everything embedded"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = 0
+        self.chunked = 0
+        self.chunks = 0
+        self.tokens = []
+
+    def add(self, texts):
+        with self.lock:
+            self.records += 1
+            self.chunks += len(texts)
+            self.chunked += len(texts) > 1
+            self.tokens.extend(estimate_tokens(t) for t in texts)
+
+    def summary(self):
+        with self.lock:
+            tokens = sorted(self.tokens)
+        if not tokens:
+            return {'records': 0, 'chunkedRecords': 0, 'chunks': 0, 'tokens': {}}
+
+        def pct(p):
+            return tokens[min(len(tokens) - 1, int(p / 100 * len(tokens)))]
+
+        return {
+            'records': self.records,
+            'chunkedRecords': self.chunked,
+            'chunks': self.chunks,
+            'tokens': {'p50': pct(50), 'p90': pct(90), 'p99': pct(99), 'max': tokens[-1],
+                       'mean': round(sum(tokens) / len(tokens), 1)},
+        }
+
+
+def chunk_record(record, vector_id, text, max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP, stats=None):
+    """Yield the record once per chunk, with vector_id and embed_text set (and parent fields when split)"""
+    texts = chunk_text(text, max_tokens, overlap_tokens)
+    if stats is not None:
+        stats.add(texts)
+    if len(texts) == 1:
+        yield {**record, 'vector_id': vector_id, 'embed_text': text}
+        return
+    for n, chunk in enumerate(texts):
+        yield {**record, 'vector_id': f"{vector_id}#{n}", 'embed_text': chunk,
+               'parent_id': vector_id, 'chunk': n, 'chunks': len(texts)}
+
+
+def chunk_metadata(record):
+    """parent_id/chunk/chunks metadata fields for a chunk record ({} for a whole record)"""
+    if 'parent_id' not in record:
+        return {}
+    return {'parent_id': record['parent_id'], 'chunk': record['chunk'], 'chunks': record['chunks']}
+
+
+def parent_id(vector):
+    return (vector.get('metadata') or {}).get('parent_id') or vector['id']
+
+
+class ChunkTracker:
+    """Reports a record as upserted only once all of its chunk vectors are"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}  # parent id -> chunks still to land
+        self.failed = set()
+
+    def done(self, vectors):
+        """Parent ids completed by these upserted vectors"""
+        completed = []
+        with self.lock:
+            for v in vectors:
+                parent = parent_id(v)
+                if parent == v['id']:
+                    completed.append(parent)
+                    continue
+                if parent in self.failed:
+                    continue
+                left = self.pending.get(parent, v['metadata']['chunks']) - 1
+                if left:
+                    self.pending[parent] = left
+                else:
+                    self.pending.pop(parent, None)
+                    completed.append(parent)
+        return completed
+
+    def fail(self, vectors):
+        """Parent ids newly lost with these vectors (each reported once)"""
+        lost = []
+        with self.lock:
+            for v in vectors:
+                parent = parent_id(v)
+                if parent in self.failed:
+                    continue
+                if parent != v['id']:
+                    self.failed.add(parent)
+                    self.pending.pop(parent, None)
+                lost.append(parent)
+        return lost
+
+
+def collapse_chunks(matches):
+    """Keep the best-scoring match per parent record, in score order"""
+    best = {}
+    for match in matches:
+        parent = parent_id(match)
+        if parent not in best or match['score'] > best[parent]['score']:
+            best[parent] = match
+    return sorted(best.values(), key=lambda m: m['score'], reverse=True)
@@ -1,12 +1,39 @@
 #!/usr/bin/env python3
 """
-Clear all vectors from Pinecone index
+Clear vectors from Pinecone index
+(or from a local vector store with --store local)
+
+Without a selector every vector is deleted. Selectors delete only part of it:
+
+    python clear_pinecone.py --namespace hadith-sahih-muslim     # a single namespace
+    python clear_pinecone.py --prefix 'hadith_sahih-muslim_*'    # ids by prefix
+    python clear_pinecone.py --filter '{"book_slug": "sahih-muslim"}'
+    python clear_pinecone.py --ids-from-checkpoint .cache/ingest_quran.sqlite3 --prefix quran_2_
+    python clear_pinecone.py --ids-from-snapshot .cache/snapshots/hadiths
+    python clear_pinecone.py --prefix quran_2_ --dry-run         # counts and estimated time only
+
+Ids are listed page by page and deleted in batches of up to 1,000 by parallel
+workers, through the 'pinecone-delete' rate limiter. Ids taken from a checkpoint
+or snapshot are first checked against each namespace, so only ids stored there
+are counted and deleted.
 """
 
 import os
+import sys
+import json
+import math
+import time
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
-from pinecone import Pinecone
+
+from vector_store import VectorStoreError, add_store_args, open_vector_store
+from rate_limiter import call_with_retry, get_limiter
+from ingest_checkpoint import Checkpoint
+from chunker import CHUNK_OVERLAP, CHUNK_TOKENS, chunk_record
 
 # Load environment
 script_dir = Path(__file__).resolve().parent
@@ -14,63 +41,281 @@ backend_dir = script_dir.parent
 env_path = backend_dir / '.env'
 load_dotenv(dotenv_path=env_path, override=True)
 
-PINECONE_API_KEY = os.getenv('PINECONE_API_KEY')
-INDEX_NAME = "hikma-fatwas"
-
-print("=" * 70)
-print("🗑️  CLEAR PINECONE INDEX")
-print("=" * 70)
-print()
-
-if not PINECONE_API_KEY:
-    print("❌ Error: PINECONE_API_KEY not found")
-    exit(1)
-
-# Connect to Pinecone
-print("📡 Connecting to Pinecone...")
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(INDEX_NAME)
-
-# Get current stats
-stats = index.describe_index_stats()
-current_count = stats.get('total_vector_count', 0)
-
-print(f"📊 Current vectors in index '{INDEX_NAME}': {current_count:,}")
-print()
-
-if current_count == 0:
-    print("✅ Index is already empty!")
-    exit(0)
-
-# Confirm deletion
-print("⚠️  WARNING: This will DELETE ALL vectors from the index!")
-print("   This action cannot be undone.")
-print()
-confirm = input("   Type 'DELETE' to confirm: ").strip()
-
-if confirm != 'DELETE':
-    print("❌ Deletion cancelled")
-    exit(0)
-
-# Delete all vectors
-print()
-print("🗑️  Deleting all vectors...")
-try:
-    index.delete(delete_all=True)
+DELETE_BATCH = 1000  # Pinecone's limit of ids per delete request
+DELETE_WORKERS = 8  # Delete requests in flight
+DELETE_LATENCY = 0.3  # Typical seconds per delete request, for --dry-run estimates
+FETCH_BATCH = 100  # Ids checked per fetch request when resolving an id list against a namespace
+
+
+def snapshot_ids(directory, chunk_tokens):
+    """Vector ids of every record in a snapshot, including the chunk ids long records were split into"""
+    from corpus_snapshot import iter_records, read_manifest
+
+    corpus = read_manifest(directory)['corpus']
+    if corpus == 'hadiths':
+        import ingest_hadiths_to_pinecone as ingest
+        vector_id, text = ingest.hadith_vector_id, ingest.hadith_text
+    else:
+        import ingest_quran_simple as ingest
+        vector_id, text = ingest.ayah_vector_id, ingest.ayah_text
+    for record in iter_records(directory, corpus=corpus):
+        parent = vector_id(record)
+        yield parent
+        for chunk in chunk_record(record, parent, text(record), chunk_tokens, CHUNK_OVERLAP):
+            if chunk['vector_id'] != parent:
+                yield chunk['vector_id']
+
+
+def existing_ids(index, ids, namespace):
+    """The ids that are actually stored in namespace"""
+    limiter = get_limiter('pinecone-fetch')
+    result = call_with_retry(limiter, lambda: index.fetch(ids=ids, namespace=namespace))
+    return [vid for vid in ids if vid in result['vectors']]
+
+
+def id_pages(index, args, namespace):
+    """Pages of ids to delete from one namespace"""
+    if args.ids_from_checkpoint or args.ids_from_snapshot:
+        if args.ids_from_checkpoint:
+            ids = Checkpoint(args.ids_from_checkpoint).vector_ids()
+        else:
+            ids = snapshot_ids(args.ids_from_snapshot, args.chunk_tokens)
+        # A derived id list doesn't say which namespace holds each id: keep the ones stored in this one
+        page = []
+        for vid in ids:
+            if args.prefix and not any(vid.startswith(p) for p in args.prefix):
+                continue
+            page.append(vid)
+            if len(page) >= FETCH_BATCH:
+                yield existing_ids(index, page, namespace)
+                page = []
+        if page:
+            yield existing_ids(index, page, namespace)
+        return
+    for prefix in args.prefix or [None]:
+        yield from index.list_ids(prefix=prefix, namespace=namespace, filter=args.filter, page_size=100)
+
+
+def batched(pages, size):
+    batch = []
+    for page in pages:
+        batch.extend(page)
+        while len(batch) >= size:
+            yield batch[:size]
+            batch = batch[size:]
+    if batch:
+        yield batch
+
+
+class Progress:
+    def __init__(self, report_every):
+        self.lock = threading.Lock()
+        self.deleted = 0
+        self.started = time.time()
+        self.stop = threading.Event()
+        if report_every:
+            threading.Thread(target=self._report, args=(report_every,), daemon=True).start()
+
+    def add(self, n):
+        with self.lock:
+            self.deleted += n
+
+    def rate(self):
+        return self.deleted / max(time.time() - self.started, 1e-6)
+
+    def _report(self, every):
+        while not self.stop.wait(every):
+            print(f"   🗑️  {self.deleted:,} deleted ({self.rate():,.0f}/s)", flush=True)
+
+
+def delete_ids(index, batches, namespace, workers, progress):
+    """Delete id batches with a bounded window of requests in flight"""
+    limiter = get_limiter('pinecone-delete')
+
+    def delete(batch):
+        call_with_retry(limiter, lambda: index.delete(ids=batch, namespace=namespace))
+        progress.add(len(batch))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for batch in batches:
+            pending.append(executor.submit(delete, batch))
+            if len(pending) >= 2 * workers:
+                pending.popleft().result()
+        while pending:
+            pending.popleft().result()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Delete every vector from the index, or a selected part of it')
+    parser.add_argument('--namespace', help="only this namespace ('' for the default one)")
+    parser.add_argument('--prefix', action='append',
+                        help="delete ids starting with this prefix, e.g. 'hadith_sahih-muslim_*' (repeatable)")
+    parser.add_argument('--filter', type=json.loads,
+                        help='delete vectors whose metadata matches this JSON filter (cannot be combined with '
+                             '--prefix or --ids-from-*)')
+    parser.add_argument('--ids-from-checkpoint', metavar='FILE', help='delete the ids recorded in an ingestion checkpoint')
+    parser.add_argument('--ids-from-snapshot', metavar='DIR', help='delete the ids of the records in a corpus snapshot')
+    parser.add_argument('--chunk-tokens', type=int, default=0,
+                        help=f'chunk size the snapshot was ingested with, e.g. {CHUNK_TOKENS}, to derive chunk ids '
+                             '(default: 0, not chunked)')
+    parser.add_argument('--workers', type=int, default=DELETE_WORKERS, help='delete requests in flight')
+    parser.add_argument('--dry-run', action='store_true', help='only count what would be deleted')
+    parser.add_argument('--report-every', type=float, default=2.0, help='seconds between progress lines (0 = off)')
+    parser.add_argument('--yes', action='store_true', help='skip the confirmation prompt')
+    add_store_args(parser)
+    args = parser.parse_args()
+    if args.prefix:
+        args.prefix = [p.rstrip('*') for p in args.prefix]
+    if args.ids_from_checkpoint and not os.path.exists(args.ids_from_checkpoint):
+        parser.error(f"checkpoint {args.ids_from_checkpoint} does not exist")
+    if args.ids_from_checkpoint and args.ids_from_snapshot:
+        parser.error("--ids-from-checkpoint and --ids-from-snapshot exclude each other")
+    # A filter can't be intersected with listed ids exactly (Pinecone can't list by metadata)
+    if args.filter and (args.prefix or args.ids_from_checkpoint or args.ids_from_snapshot):
+        parser.error("--filter cannot be combined with --prefix or --ids-from-*")
+    return args
+
+
+def confirm(message, args):
+    print(f"⚠️  WARNING: This will DELETE {message}!")
+    print("   This action cannot be undone.")
+    print()
+    if args.yes:
+        return True
+    if input("   Type 'DELETE' to confirm: ").strip() != 'DELETE':
+        print("❌ Deletion cancelled")
+        return False
+    return True
+
+
+def clear_all(index, stats, args):
+    """Drop every namespace (or just --namespace) in one call each; returns True once deleted"""
+    namespaces = stats.get('namespaces') or {}
+    if args.namespace is not None:
+        current_count = namespaces.get(args.namespace, {}).get('vector_count', 0)
+        namespaces = {args.namespace: namespaces.get(args.namespace)}
+        target = f"namespace '{args.namespace}'"
+    else:
+        current_count = stats.get('total_vector_count', 0)
+        target = "the index"
+
+    if current_count == 0:
+        print(f"✅ {target[0].upper() + target[1:]} is already empty!")
+        return False
+    if args.dry_run:
+        print(f"🔎 Dry run: would delete all {current_count:,} vectors from {target}")
+        return False
+    if not confirm(f"ALL {current_count:,} vectors from {target}", args):
+        return False
+
+    print()
+    print(f"🗑️  Deleting all vectors from {target}...")
+    for namespace in namespaces or {'': None}:
+        index.delete(delete_all=True, namespace=namespace)
     print("✅ All vectors deleted!")
-    
+    return True
+
+
+def clear_selected(index, stats, args):
+    """List matching ids page by page and delete them in parallel batches; returns True once deleted"""
+    if args.namespace is not None:
+        namespaces = [args.namespace]
+    else:
+        namespaces = sorted(stats.get('namespaces') or {}) or ['']
+    selectors = [f"prefix {p}*" for p in args.prefix or []]
+    if args.filter:
+        selectors.append(f"filter {json.dumps(args.filter)}")
+    if args.ids_from_checkpoint:
+        selectors.append(f"ids from checkpoint {args.ids_from_checkpoint}")
+    if args.ids_from_snapshot:
+        selectors.append(f"ids from snapshot {args.ids_from_snapshot}")
+    selection = ' and '.join(selectors)
+    print(f"🎯 Selecting {selection} in {', '.join(repr(n) for n in namespaces)}")
+
+    if args.dry_run:
+        total, requests, start = 0, 0, time.time()
+        for namespace in namespaces:
+            try:
+                count = sum(len(page) for page in id_pages(index, args, namespace))
+            except VectorStoreError as e:
+                print(f"   {namespace or '(default)'}: count unknown ({e}); the filter would be applied server-side")
+                continue
+            print(f"   {namespace or '(default)'}: {count:,} vectors")
+            total += count
+            requests += math.ceil(count / DELETE_BATCH)
+        rate = get_limiter('pinecone-delete').rate
+        estimate = max(requests / rate, requests * DELETE_LATENCY / args.workers)
+        print(f"🔎 Dry run: {total:,} vectors in {requests:,} delete requests, "
+              f"about {estimate:,.1f}s with {args.workers} workers (listing took {time.time() - start:.1f}s)")
+        return False
+    if not confirm(f"the vectors matching {selection}", args):
+        return False
+
+    print()
+    progress = Progress(args.report_every)
+    try:
+        for namespace in namespaces:
+            try:
+                pages = id_pages(index, args, namespace)
+                delete_ids(index, batched(pages, DELETE_BATCH), namespace, args.workers, progress)
+            except VectorStoreError:
+                if not args.filter or args.prefix:
+                    raise
+                # Pinecone can't list by metadata: the filter is the only selector, so let it apply it itself
+                call_with_retry(get_limiter('pinecone-delete'),
+                                lambda: index.delete(filter=args.filter, namespace=namespace))
+                print(f"   🗑️  {namespace or '(default)'}: filter delete sent")
+    finally:
+        progress.stop.set()
+    print(f"✅ Deleted {progress.deleted:,} vectors in {time.time() - progress.started:.1f}s "
+          f"({progress.rate():,.0f}/s)")
+    return True
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 70)
+    print("🗑️  CLEAR PINECONE INDEX")
+    print("=" * 70)
+    print()
+
+    # Connect to the vector store
+    print("📡 Connecting to vector store...")
+    try:
+        index = open_vector_store(args.store, args.index, args.store_dir)
+    except VectorStoreError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    # Get current stats
+    stats = index.describe_index_stats()
+    print(f"📊 Current vectors in {index.label}: {stats.get('total_vector_count', 0):,}")
+    for name, ns in sorted((stats.get('namespaces') or {}).items()):
+        print(f"   🗂️  {name or '(default)'}: {ns['vector_count']:,}")
+    print()
+
+    selective = args.prefix or args.filter or args.ids_from_checkpoint or args.ids_from_snapshot
+    try:
+        deleted = clear_selected(index, stats, args) if selective else clear_all(index, stats, args)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    if not deleted:
+        return
+
     # Verify
-    import time
     time.sleep(2)  # Wait for deletion to propagate
     stats = index.describe_index_stats()
     remaining = stats.get('total_vector_count', 0)
-    
+
     print()
     print("=" * 70)
     print(f"✅ DELETION COMPLETE")
     print(f"   Remaining vectors: {remaining:,}")
     print("=" * 70)
-    
-except Exception as e:
-    print(f"❌ Error: {e}")
-    exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Offline corpus snapshots for the ingestion scripts.
+
+A snapshot is a directory of gzip-compressed JSONL chunks holding the normalized
+records the ingesters build (hadith dicts, per-ayah dicts), plus a manifest.json
+listing every chunk with its record count and sha256. The manifest is written
+last, so a directory without one is an incomplete snapshot.
+
+    python corpus_snapshot.py snapshot hadiths --out .cache/snapshots/hadiths
+    python corpus_snapshot.py snapshot quran --out .cache/snapshots/quran
+    python corpus_snapshot.py verify .cache/snapshots/hadiths
+
+Both ingestion scripts accept --snapshot DIR to read records from a snapshot
+instead of the upstream APIs, so re-embedding, re-indexing and benchmarks need
+no network calls to hadithapi.com or api.alquran.cloud.
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+DEFAULT_DIR = Path(__file__).resolve().parent / '.cache' / 'snapshots'
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SnapshotWriter:
+    """Append records to rotating .jsonl.gz chunks; close() writes the manifest"""
+
+    def __init__(self, directory, corpus, chunk_records=5000, force=False):
+        self.directory = Path(directory)
+        self.corpus = corpus
+        self.chunk_records = chunk_records
+        self.directory.mkdir(parents=True, exist_ok=True)
+        existing = list(self.directory.glob('*.jsonl.gz')) + list(self.directory.glob(MANIFEST))
+        if existing and not force:
+            raise SnapshotError(f"{self.directory} already holds a snapshot (use --force to replace it)")
+        for path in existing:
+            path.unlink()
+        self.lock = threading.Lock()
+        self.chunks = []
+        self.total = 0
+        self._file = None
+        self._count = 0
+
+    def _rotate(self):
+        self._finish_chunk()
+        name = f"{self.corpus}-{len(self.chunks):05d}.jsonl.gz"
+        self._file = gzip.open(self.directory / name, 'wt', encoding='utf-8')
+        self._name = name
+        self._count = 0
+
+    def _finish_chunk(self):
+        if self._file is None:
+            return
+        self._file.close()
+        path = self.directory / self._name
+        self.chunks.append({'file': self._name, 'records': self._count,
+                            'bytes': path.stat().st_size, 'sha256': _sha256(path)})
+        self._file = None
+
+    def write(self, record):
+        with self.lock:
+            if self._file is None or self._count >= self.chunk_records:
+                self._rotate()
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._count += 1
+            self.total += 1
+
+    def close(self, **extra):
+        with self.lock:
+            self._finish_chunk()
+            manifest = {
+                'version': FORMAT_VERSION,
+                'corpus': self.corpus,
+                'format': 'jsonl.gz',
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'total_records': self.total,
+                'chunks': self.chunks,
+                **extra,
+            }
+            tmp = self.directory / f"{MANIFEST}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp, self.directory / MANIFEST)
+            return manifest
+
+
+def read_manifest(directory):
+    path = Path(directory) / MANIFEST
+    if not path.exists():
+        raise SnapshotError(f"no {MANIFEST} in {directory} (missing or incomplete snapshot)")
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != FORMAT_VERSION:
+        raise SnapshotError(f"unsupported snapshot version {manifest.get('version')}")
+    return manifest
+
+
+def iter_records(directory, corpus=None, verify=True):
+    """Yield every record of a snapshot in write order, checking chunk checksums first"""
+    manifest = read_manifest(directory)
+    if corpus and manifest['corpus'] != corpus:
+        raise SnapshotError(f"{directory} is a '{manifest['corpus']}' snapshot, expected '{corpus}'")
+    for chunk in manifest['chunks']:
+        path = Path(directory) / chunk['file']
+        if verify and _sha256(path) != chunk['sha256']:
+            raise SnapshotError(f"checksum mismatch for {chunk['file']}")
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def iter_units(records, key_fn):
+    """Group consecutive records sharing key_fn(record) into (key, [records]) units"""
+    key, unit = None, []
+    for record in records:
+        k = key_fn(record)
+        if unit and k != key:
+            yield key, unit
+            unit = []
+        key = k
+        unit.append(record)
+    if unit:
+        yield key, unit
+
+
+def verify(directory):
+    """Re-check every chunk against the manifest; returns the manifest"""
+    manifest = read_manifest(directory)
+    for chunk in manifest['chunks']:
+        path = Path(directory) / chunk['file']
+        if not path.exists():
+            raise SnapshotError(f"missing chunk {chunk['file']}")
+        if _sha256(path) != chunk['sha256']:
+            raise SnapshotError(f"checksum mismatch for {chunk['file']}")
+    return manifest
+
+
+def snapshot_hadiths(out, books=None, force=False, workers=10):
+    """Download every chapter of the selected books into a snapshot"""
+    from concurrent.futures import ThreadPoolExecutor
+    import ingest_hadiths_to_pinecone as hadiths
+    from hadith_client import HadithClient
+
+    books = books or list(hadiths.BOOKS)
+    hadiths.client = HadithClient(hadiths.HADITH_API_KEY, page_workers=workers,
+                                  pool_size=2 * workers + len(books))
+    writer = SnapshotWriter(out, 'hadiths', force=force)
+
+    def fetch_chapter(task):
+        book_slug, book_name, chapter = task
+        return [h for page in hadiths.iter_chapter_hadiths(book_slug, book_name, chapter) for h in page]
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for book_slug in books:
+                tasks = [(book_slug, hadiths.BOOKS[book_slug], ch)
+                         for ch in hadiths.fetch_book_chapters(book_slug, hadiths.BOOKS[book_slug])]
+                # Chapters are fetched in parallel but written in order, one contiguous run each
+                for records in executor.map(fetch_chapter, tasks):
+                    for record in records:
+                        writer.write(record)
+    finally:
+        hadiths.client.close()
+    return writer.close(source=hadiths.client.base_url, books=books)
+
+
+def snapshot_quran(out, force=False, workers=8):
+    """Download all 114 surahs (Arabic + English) into a snapshot"""
+    from concurrent.futures import ThreadPoolExecutor
+    import ingest_quran_simple as quran
+
+    writer = SnapshotWriter(out, 'quran', force=force)
+    missing = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for surah_num, ayahs in zip(range(1, 115), executor.map(quran.fetch_surah, range(1, 115))):
+            if ayahs is None:
+                missing.append(surah_num)
+                continue
+            for ayah in ayahs:
+                writer.write(ayah)
+    if missing:
+        raise SnapshotError(f"surahs {missing} could not be fetched; snapshot left without a manifest")
+    return writer.close(source=quran.BASE_URL, editions=list(quran.EDITIONS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write or verify offline corpus snapshots')
+    sub = parser.add_subparsers(dest='command', required=True)
+    snap = sub.add_parser('snapshot', help='download a corpus into a snapshot directory')
+    snap.add_argument('corpus', choices=['hadiths', 'quran'])
+    snap.add_argument('--out', help='snapshot directory (default: scripts/.cache/snapshots/<corpus>)')
+    snap.add_argument('--books', nargs='+', help='hadith book slugs (default: all)')
+    snap.add_argument('--workers', type=int, default=8)
+    snap.add_argument('--force', action='store_true', help='replace an existing snapshot')
+    check = sub.add_parser('verify', help='check a snapshot against its manifest')
+    check.add_argument('directory')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'verify':
+            manifest = verify(args.directory)
+            print(f"✅ {args.directory}: {manifest['total_records']:,} {manifest['corpus']} records "
+                  f"in {len(manifest['chunks'])} chunks, checksums OK")
+            return
+        out = args.out or DEFAULT_DIR / args.corpus
+        start = time.time()
+        if args.corpus == 'hadiths':
+            manifest = snapshot_hadiths(out, args.books, args.force, args.workers)
+        else:
+            manifest = snapshot_quran(out, args.force, args.workers)
+        size = sum(c['bytes'] for c in manifest['chunks'])
+        print(f"✅ Snapshot written to {out}: {manifest['total_records']:,} records, "
+              f"{len(manifest['chunks'])} chunks, {size / 1e6:.1f} MB in {time.time() - start:.0f}s")
+    except SnapshotError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Local document store for full hadith and ayah texts, keyed by vector id.
+
+With --lean-metadata the ingestion scripts keep only small filterable fields
+(type, book_slug, hadith_number, surah/ayah numbers, ...) in the vector
+metadata and write each record's complete, untruncated texts here instead.
+Upserts and query responses shrink to ids, scores and a few short fields;
+hydrate() then loads the texts for a page of top-k matches in one batched
+lookup. The Node RAG retriever does the same through
+agents-python/document_lookup.py, so the server has to be able to read this
+file (same path, or DOCUMENT_STORE_PATH pointing at a copy).
+
+Storage is a single SQLite file (WAL mode, one connection per thread) holding
+zlib-compressed JSON documents.
+
+Environment:
+    DOCUMENT_STORE_PATH   default scripts/.cache/documents.sqlite3
+"""
+
+import os
+import json
+import zlib
+import sqlite3
+import threading
+from pathlib import Path
+
+DEFAULT_PATH = Path(__file__).resolve().parent / '.cache' / 'documents.sqlite3'
+
+
+class DocumentStore:
+    def __init__(self, path=None):
+        self.path = str(path or os.getenv('DOCUMENT_STORE_PATH') or DEFAULT_PATH)
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = self._conn()
+        conn.execute('CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, body BLOB NOT NULL)')
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 connections are not shareable across threads; keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def put_many(self, documents):
+        """Store {id: document dict}, replacing earlier versions"""
+        if not documents:
+            return
+        conn = self._conn()
+        conn.executemany('INSERT OR REPLACE INTO documents (id, body) VALUES (?, ?)',
+                         [(vid, zlib.compress(json.dumps(doc, ensure_ascii=False).encode('utf-8')))
+                          for vid, doc in documents.items()])
+        conn.commit()
+
+    def get_many(self, ids):
+        """{id: document dict} for the ids that are stored"""
+        result = {}
+        ids = list(ids)
+        conn = self._conn()
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            for vid, body in conn.execute(
+                    f'SELECT id, body FROM documents WHERE id IN ({",".join("?" * len(chunk))})', chunk):
+                result[vid] = json.loads(zlib.decompress(body).decode('utf-8'))
+        return result
+
+    def delete_many(self, ids):
+        ids = list(ids)
+        conn = self._conn()
+        conn.executemany('DELETE FROM documents WHERE id = ?', [(vid,) for vid in ids])
+        conn.commit()
+
+    def count(self):
+        return self._conn().execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+
+
+def _document_id(match):
+    # Chunk vectors (<id>#<n>) share their parent record's document
+    return (match.get('metadata') or {}).get('parent_id') or match['id']
+
+
+def hydrate(matches, documents):
+    """Merge each match's stored document into its metadata (one batched lookup); returns matches"""
+    docs = documents.get_many({_document_id(m) for m in matches})
+    for match in matches:
+        doc = docs.get(_document_id(match))
+        if doc:
+            match['metadata'] = {**(match.get('metadata') or {}), **doc}
+    return matches
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Content-addressed on-disk embedding cache shared by the ingestion scripts.
+
+Vectors are keyed by (model, task_type, sha256 of the text), so re-ingesting
+after a metadata change or an index rebuild costs no embedding calls, and texts
+that appear in several collections are embedded once. Vectors live in one
+memory-mapped float32 file per dimension (vectors_<dim>.f32); a small SQLite
+index beside it maps each key to its row. Rows freed by eviction are reused, so
+the vector files stop growing once the cache is full.
+
+Eviction is least-recently-used once the vectors exceed EMBEDDING_CACHE_MAX_MB.
+Several processes may share the cache: row allocation happens inside a SQLite
+write transaction and a vector is written before its key becomes visible. A
+reader copies a row and then re-checks that its key still maps to that row, so a
+row evicted and reused by another writer in between is treated as a miss rather
+than returned as some other text's vector.
+
+Environment:
+    EMBEDDING_CACHE_ENABLED   default true
+    EMBEDDING_CACHE_DIR       default scripts/.cache/embeddings
+    EMBEDDING_CACHE_MAX_MB    default 2048
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_DIR = Path(__file__).resolve().parent / '.cache' / 'embeddings'
+
+
+def cache_key(model, task_type, text):
+    text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    return hashlib.sha256(f"{model}\x1f{task_type or ''}\x1f{text_hash}".encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=2048 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._maps = {}  # dim -> np.memmap
+        self.hits = 0
+        self.misses = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' key TEXT PRIMARY KEY, dim INTEGER NOT NULL, row INTEGER NOT NULL, last_used REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)')
+        conn.execute('CREATE TABLE IF NOT EXISTS free_rows (dim INTEGER NOT NULL, row INTEGER NOT NULL, PRIMARY KEY (dim, row))')
+        conn.execute('CREATE TABLE IF NOT EXISTS sizes (dim INTEGER PRIMARY KEY, rows INTEGER NOT NULL)')
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 connections are not shareable across threads; keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.directory / 'index.sqlite3'), timeout=60)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _matrix(self, dim, min_rows):
+        """Memory map of the dim-sized vector file holding at least min_rows rows"""
+        with self._lock:
+            mm = self._maps.get(dim)
+            if mm is not None and mm.shape[0] >= min_rows:
+                return mm
+            path = self.directory / f"vectors_{dim}.f32"
+            row_bytes = dim * 4
+            size = path.stat().st_size if path.exists() else 0
+            if size < min_rows * row_bytes:
+                # Grow geometrically so appends don't remap on every batch
+                rows = max(min_rows, 2 * (size // row_bytes), 1024)
+                with open(path, 'ab') as f:
+                    f.truncate(rows * row_bytes)
+                size = rows * row_bytes
+            mm = np.memmap(path, dtype=np.float32, mode='r+', shape=(size // row_bytes, dim))
+            self._maps[dim] = mm
+            return mm
+
+    def _rows(self, conn, keys):
+        """{key: (dim, row)} for the keys that are cached"""
+        found = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            for key, dim, row in conn.execute(
+                    f'SELECT key, dim, row FROM entries WHERE key IN ({",".join("?" * len(chunk))})', chunk):
+                found[key] = (dim, row)
+        return found
+
+    def get_many(self, model, task_type, texts):
+        """List of cached vectors (or None) aligned with texts"""
+        keys = [cache_key(model, task_type, t) for t in texts]
+        conn = self._conn()
+        found = self._rows(conn, keys)
+        if found:
+            conn.executemany('UPDATE entries SET last_used = ? WHERE key = ?',
+                             [(time.time(), k) for k in found])
+            conn.commit()
+
+        vectors = {key: self._matrix(dim, row + 1)[row].tolist() for key, (dim, row) in found.items()}
+        if vectors:
+            # A row evicted and reused by another writer since the lookup now holds a different text's vector
+            current = self._rows(conn, list(vectors))
+            vectors = {key: v for key, v in vectors.items() if current.get(key) == found[key]}
+        result = [vectors.get(key) for key in keys]
+        hit_count = sum(1 for v in result if v is not None)
+        with self._lock:
+            self.hits += hit_count
+            self.misses += len(result) - hit_count
+        return result
+
+    def put_many(self, model, task_type, texts, vectors):
+        """Store vectors for texts, then evict least-recently-used rows if over the size cap"""
+        entries = {cache_key(model, task_type, t): v for t, v in zip(texts, vectors) if v is not None}
+        if not entries:
+            return
+        dim = len(next(iter(entries.values())))
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            keys = list(entries)
+            existing = set()
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                existing.update(r[0] for r in conn.execute(
+                    f'SELECT key FROM entries WHERE key IN ({",".join("?" * len(chunk))})', chunk))
+            new_keys = [k for k in keys if k not in existing]
+
+            # Reuse rows freed by eviction before appending new ones
+            free = [r[0] for r in conn.execute(
+                'SELECT row FROM free_rows WHERE dim = ? LIMIT ?', (dim, len(new_keys)))]
+            conn.executemany('DELETE FROM free_rows WHERE dim = ? AND row = ?', [(dim, r) for r in free])
+            size_row = conn.execute('SELECT rows FROM sizes WHERE dim = ?', (dim,)).fetchone()
+            next_row = size_row[0] if size_row else 0
+            rows = free + list(range(next_row, next_row + len(new_keys) - len(free)))
+            next_row = max([next_row] + [r + 1 for r in rows])
+            conn.execute('INSERT OR REPLACE INTO sizes (dim, rows) VALUES (?, ?)', (dim, next_row))
+
+            if new_keys:
+                mm = self._matrix(dim, next_row)
+                for key, row in zip(new_keys, rows):
+                    mm[row] = np.asarray(entries[key], dtype=np.float32)
+                mm.flush()
+            now = time.time()
+            conn.executemany('INSERT INTO entries (key, dim, row, last_used) VALUES (?, ?, ?, ?)',
+                             [(k, dim, r, now) for k, r in zip(new_keys, rows)])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self.evict()
+
+    def evict(self):
+        conn = self._conn()
+        for dim, count in conn.execute('SELECT dim, COUNT(*) FROM entries GROUP BY dim').fetchall():
+            max_rows = max(1, self.max_bytes // (dim * 4))
+            if count <= max_rows:
+                continue
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                victims = conn.execute(
+                    'SELECT key, row FROM entries WHERE dim = ? ORDER BY last_used ASC LIMIT ?',
+                    (dim, count - max_rows)
+                ).fetchall()
+                conn.executemany('DELETE FROM entries WHERE key = ?', [(k,) for k, _ in victims])
+                conn.executemany('INSERT OR IGNORE INTO free_rows (dim, row) VALUES (?, ?)',
+                                 [(dim, r) for _, r in victims])
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+
+def cached_embed(cache, embed_fn, model, task_type, texts):
+    """Embed texts through the cache: only distinct uncached texts reach embed_fn(list) -> list of vectors"""
+    if cache is None:
+        return embed_fn(list(texts))
+    texts = list(texts)
+    # The cache only saves work: if it fails, the texts are embedded (and returned) without it
+    try:
+        vectors = cache.get_many(model, task_type, texts)
+    except Exception as e:
+        print(f"⚠️  Embedding cache lookup failed: {e}")
+        vectors = [None] * len(texts)
+    missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    if missing:
+        fresh = embed_fn(missing)
+        if fresh is None:
+            return None
+        try:
+            cache.put_many(model, task_type, missing, fresh)
+        except Exception as e:
+            print(f"⚠️  Embedding cache write failed: {e}")
+        by_text = dict(zip(missing, fresh))
+        vectors = [v if v is not None else by_text[t] for t, v in zip(texts, vectors)]
+    return vectors
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """Process-wide cache configured from the environment, or None when disabled/unavailable"""
+    global _default_cache
+    if os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() in ('0', 'false', 'no'):
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = EmbeddingCache(
+                    directory=os.getenv('EMBEDDING_CACHE_DIR') or DEFAULT_DIR,
+                    max_bytes=int(float(os.getenv('EMBEDDING_CACHE_MAX_MB') or 2048) * 1024 * 1024),
+                )
+            except Exception as e:
+                print(f"⚠️  Embedding cache disabled: {e}")
+                return None
+        return _default_cache
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+hadithapi.com client for the ingestion scripts.
+
+One pooled requests.Session (keep-alive, pool sized to the worker count) serves
+every call, so chapters no longer pay a TCP/TLS handshake each. Chapter listings
+follow the API's pagination: the first page reports last_page, and the remaining
+pages are fetched concurrently on a bounded thread pool shared by all chapters.
+Pages are yielded in order, with at most page_workers fetched ahead, so a large
+chapter is never held in memory whole.
+All calls go through the 'hadithapi' rate limiter and its retries.
+The API answers 404 for a chapter page with no hadiths; that page is treated as
+empty, while any other unexpected status raises HadithAPIError.
+
+The base URL can be pointed at a local stand-in server with HADITH_API_BASE_URL
+(or the base_url argument), e.g. for tests and benchmarks.
+"""
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import request
+
+DEFAULT_BASE_URL = "https://hadithapi.com/api"
+
+
+class HadithAPIError(Exception):
+    pass
+
+
+class HadithClient:
+    def __init__(self, api_key, base_url=None, page_size=500, page_workers=8, pool_size=32, timeout=30):
+        self.api_key = api_key
+        self.base_url = (base_url or os.getenv('HADITH_API_BASE_URL') or DEFAULT_BASE_URL).rstrip('/')
+        self.page_size = page_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.page_workers = page_workers
+        self.pages = ThreadPoolExecutor(max_workers=page_workers, thread_name_prefix='hadith-page')
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def _get(self, path, not_found=None, **params):
+        """JSON body of a GET; not_found (if given) is returned for a 404 instead of raising"""
+        with self.lock:
+            self.requests += 1
+        response = request(self.session, 'hadithapi', 'GET', f"{self.base_url}/{path}",
+                           params={'apiKey': self.api_key, **params}, timeout=self.timeout)
+        if response.status_code == 404 and not_found is not None:
+            return not_found
+        if response.status_code != 200:
+            raise HadithAPIError(f"GET /{path} -> HTTP {response.status_code}")
+        return response.json()
+
+    def chapters(self, book_slug):
+        return self._get(f"{book_slug}/chapters").get('chapters', [])
+
+    def _page(self, book_slug, chapter_key, page):
+        # An empty or missing chapter is a 404, not a failure
+        return self._get('hadiths', not_found={}, book=book_slug, chapter=str(chapter_key),
+                         paginate=self.page_size, page=page).get('hadiths') or {}
+
+    def iter_chapter_pages(self, book_slug, chapter_key):
+        """Yield each page's list of hadiths for a chapter, in page order"""
+        first = self._page(book_slug, chapter_key, 1)
+        yield first.get('data') or []
+        last_page = int(first.get('last_page') or 1)
+        if last_page > 1:
+            # Keep a bounded window of pages in flight
+            pending = deque()
+            next_page = 2
+            while pending or next_page <= last_page:
+                while next_page <= last_page and len(pending) < self.page_workers:
+                    pending.append(self.pages.submit(self._page, book_slug, chapter_key, next_page))
+                    next_page += 1
+                yield pending.popleft().result().get('data') or []
+        elif first.get('next_page_url'):
+            # No page count reported: follow the links one by one
+            page = 2
+            while True:
+                data = self._page(book_slug, chapter_key, page)
+                yield data.get('data') or []
+                if not data.get('next_page_url'):
+                    break
+                page += 1
+
+    def close(self):
+        self.pages.shutdown(wait=False)
+        self.session.close()
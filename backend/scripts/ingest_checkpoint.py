@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Local checkpoint store for the ingestion scripts.
+
+Records which units of work (hadith chapters, surahs) were fetched and the vector
+ids each produced, plus every vector id that was upserted together with the
+sha256 of the text it was embedded from. With --resume a script skips units
+whose vectors were all upserted and only re-embeds records whose text changed.
+
+Storage is one SQLite file per script (WAL mode, one connection per thread),
+written after every fetched unit and every successful upsert, so a crash loses
+at most the batches that were in flight.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+
+CACHE_DIR = Path(__file__).resolve().parent / '.cache'
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class Checkpoint:
+    def __init__(self, path, reset=False):
+        self.path = str(path)
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = self._conn()
+        if reset:
+            conn.execute('DROP TABLE IF EXISTS units')
+            conn.execute('DROP TABLE IF EXISTS unit_ids')
+            conn.execute('DROP TABLE IF EXISTS vectors')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS units ('
+            ' kind TEXT NOT NULL, key TEXT NOT NULL, fetched_at REAL NOT NULL,'
+            ' PRIMARY KEY (kind, key))'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS unit_ids ('
+            ' kind TEXT NOT NULL, key TEXT NOT NULL, vector_id TEXT NOT NULL,'
+            ' PRIMARY KEY (kind, key, vector_id))'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS vectors ('
+            ' id TEXT PRIMARY KEY, hash TEXT NOT NULL, upserted_at REAL NOT NULL)'
+        )
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 connections are not shareable across threads; keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def mark_fetched(self, kind, key, vector_ids):
+        """Remember that a unit was fetched and which vectors it produces"""
+        conn = self._conn()
+        conn.execute('DELETE FROM unit_ids WHERE kind = ? AND key = ?', (kind, key))
+        conn.executemany('INSERT OR IGNORE INTO unit_ids (kind, key, vector_id) VALUES (?, ?, ?)',
+                         [(kind, key, vid) for vid in vector_ids])
+        conn.execute('INSERT OR REPLACE INTO units (kind, key, fetched_at) VALUES (?, ?, ?)',
+                     (kind, key, time.time()))
+        conn.commit()
+
+    def mark_upserted(self, pairs):
+        """Record (vector_id, content_hash) pairs that are now in the index"""
+        if not pairs:
+            return
+        conn = self._conn()
+        now = time.time()
+        conn.executemany('INSERT OR REPLACE INTO vectors (id, hash, upserted_at) VALUES (?, ?, ?)',
+                         [(vid, h, now) for vid, h in pairs])
+        conn.commit()
+
+    def completed_units(self, kind):
+        """{key: vector count} for fetched units whose vectors were all upserted"""
+        rows = self._conn().execute(
+            'SELECT u.key, COUNT(i.vector_id) FROM units u'
+            ' LEFT JOIN unit_ids i ON i.kind = u.kind AND i.key = u.key'
+            ' WHERE u.kind = ? AND NOT EXISTS ('
+            '  SELECT 1 FROM unit_ids m LEFT JOIN vectors v ON v.id = m.vector_id'
+            '  WHERE m.kind = u.kind AND m.key = u.key AND v.id IS NULL)'
+            ' GROUP BY u.key',
+            (kind,)
+        ).fetchall()
+        return dict(rows)
+
+    def upserted_hashes(self, vector_ids):
+        """{vector_id: content hash} for the ids that were already upserted"""
+        result = {}
+        ids = list(vector_ids)
+        conn = self._conn()
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            rows = conn.execute(
+                f'SELECT id, hash FROM vectors WHERE id IN ({",".join("?" * len(chunk))})', chunk
+            ).fetchall()
+            result.update(rows)
+        return result
+
+    def vector_ids(self, prefix=None):
+        """Every upserted vector id (optionally only those starting with prefix), in id order"""
+        sql, params = 'SELECT id FROM vectors', []
+        if prefix:
+            sql += ' WHERE id >= ? AND id < ?'
+            params = [prefix, prefix + '\U0010ffff']
+        for row in self._conn().execute(sql + ' ORDER BY id', params):
+            yield row[0]
+
+    def summary(self):
+        conn = self._conn()
+        return {
+            'units': conn.execute('SELECT COUNT(*) FROM units').fetchone()[0],
+            'vectors': conn.execute('SELECT COUNT(*) FROM vectors').fetchone()[0],
+        }
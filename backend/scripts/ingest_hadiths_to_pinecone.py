@@ -1,21 +1,34 @@
 #!/usr/bin/env python3
 """
 Fast Hadith Ingestion to Pinecone
-Optimized for parallel processing and batch operations
+Pipelined: chapter fetchers feed an embedding stage, which feeds an upsert stage.
+Vectors are packed into upsert requests by serialized size and sent by parallel upsert workers.
+With --namespace-layout book every collection is ingested, in parallel, into its own namespace.
+With --incremental only new or changed hadiths are embedded, and vanished ones are deleted.
+All books flow through at once, each stage with its own worker count.
 """
 
-import requests
 import os
+import sys
 import time
+import argparse
 from pathlib import Path
 from dotenv import load_dotenv
-from pinecone import Pinecone
 import google.generativeai as genai
-from tqdm import tqdm
-import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 
+from ingest_pipeline import Pipeline, Stage, peak_rss_mb
+from ingest_checkpoint import CACHE_DIR, Checkpoint, content_hash
+from embedding_cache import cached_embed, get_embedding_cache
+from rate_limiter import call_with_retry, get_limiter, limiter_summary
+from hadith_client import HadithClient
+from corpus_snapshot import SnapshotError, iter_records, iter_units, read_manifest
+from vector_store import NAMESPACE_LAYOUTS, VectorStoreError, add_store_args, namespace_for, open_vector_store
+from vector_upsert import DEFAULT_BATCH_BYTES, MAX_REQUEST_VECTORS, Upserter, vector_bytes
+from document_store import DocumentStore
+from chunker import CHUNK_OVERLAP, CHUNK_TOKENS, ChunkStats, ChunkTracker, chunk_metadata, chunk_record
+from vector_delta import Delta, delete_obsolete, hash_metadata
+
 # Load environment
 script_dir = Path(__file__).resolve().parent
 backend_dir = script_dir.parent
@@ -23,9 +36,8 @@ env_path = backend_dir / '.env'
 load_dotenv(dotenv_path=env_path, override=True)
 
 HADITH_API_KEY = os.getenv('HADITH_API_KEY')
-PINECONE_API_KEY = os.getenv('PINECONE_API_KEY')
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-BASE_URL = "https://hadithapi.com/api"
+EMBED_MODEL = "models/text-embedding-004"
 
 # Books to ingest
 BOOKS = {
@@ -38,34 +50,23 @@ BOOKS = {
 }
 
 # Performance settings
-MAX_WORKERS = 10  # Parallel API requests
+MAX_WORKERS = 10  # Parallel chapter fetches
+EMBED_WORKERS = 4  # Concurrent embedding batches
+UPSERT_WORKERS = 4  # Concurrent Pinecone uploads
+PAGE_WORKERS = 8  # Parallel page fetches for multi-page chapters
 BATCH_SIZE = 100  # Embeddings per batch
-PINECONE_BATCH = 100  # Vectors per Pinecone upload
-
-print("=" * 70)
-print("🚀 FAST HADITH INGESTION TO PINECONE")
-print("=" * 70)
-print()
-
-# Validate API keys
-if not all([HADITH_API_KEY, PINECONE_API_KEY, GEMINI_API_KEY]):
-    print("❌ Error: Missing API keys!")
-    print(f"   HADITH_API_KEY: {'✓' if HADITH_API_KEY else '✗'}")
-    print(f"   PINECONE_API_KEY: {'✓' if PINECONE_API_KEY else '✗'}")
-    print(f"   GEMINI_API_KEY: {'✓' if GEMINI_API_KEY else '✗'}")
-    exit(1)
-
-# Initialize Pinecone
-print("📡 Connecting to Pinecone...")
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index("hikma-fatwas")
-print("✅ Connected to index: hikma-fatwas")
-
-# Initialize Gemini
-print("🤖 Initializing Gemini API...")
-genai.configure(api_key=GEMINI_API_KEY)
-print("✅ Gemini ready")
-print()
+QUEUE_SIZE = 16  # Items buffered between stages
+
+index = None
+upserter = None
+documents = None  # DocumentStore in --lean-metadata mode
+checkpoint = None
+delta = None  # Delta in --incremental mode
+client = None
+chunking = (0, CHUNK_OVERLAP)  # (max tokens, overlap) per chunk; 0 max tokens = no chunking
+namespace_layout = 'default'
+chunk_stats = ChunkStats()
+chunk_tracker = ChunkTracker()
 
 # Thread-safe counters
 lock = threading.Lock()
@@ -73,52 +74,41 @@ stats = {
     'fetched': 0,
     'uploaded': 0,
     'failed': 0,
-    'skipped': 0
+    'skipped': 0,
+    'failed_chapters': 0,
+    'failed_books': 0
 }
 
+def embed_uncached(texts):
+    result = call_with_retry(get_limiter('gemini-embed'), lambda: genai.embed_content(
+        model=EMBED_MODEL,
+        content=texts,
+        task_type="retrieval_document"
+    ))
+    return result['embedding']
+
 def generate_embeddings_batch(texts):
-    """Generate embeddings for multiple texts at once"""
+    """Generate embeddings for multiple texts at once, reusing cached vectors"""
     try:
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=texts,
-            task_type="retrieval_document"
-        )
-        return result['embedding']
+        return cached_embed(get_embedding_cache(), embed_uncached, EMBED_MODEL, "retrieval_document", texts)
     except Exception as e:
         print(f"⚠️  Batch embedding error: {str(e)}")
         return None
 
-def fetch_chapter_hadiths(book_slug, book_name, chapter):
-    """Fetch hadiths from a single chapter using the correct API format"""
+def iter_chapter_hadiths(book_slug, book_name, chapter):
+    """Yield a chapter's hadiths one API page at a time, normalized for ingestion"""
     chapter_key = chapter.get('chapterKey') or chapter.get('key') or chapter.get('chapterNumber')
     chapter_name = chapter.get('chapterEnglish') or chapter.get('chapterName', 'Unknown')
     
     if not chapter_key:
-        return []
+        return
     
-    try:
-        # Use the correct hadithapi.com endpoint format
-        url = f"{BASE_URL}/hadiths"
-        params = {
-            "apiKey": HADITH_API_KEY,
-            "book": book_slug,
-            "chapter": str(chapter_key),
-            "paginate": 500  # Get max hadiths per chapter
-        }
-        
-        response = requests.get(url, params=params, timeout=30)
-        
-        if response.status_code != 200:
-            return []
-        
-        data = response.json()
-        hadiths = data.get('hadiths', {}).get('data', [])
-        
+    # Every page of the chapter, fetched over the pooled session
+    for page in client.iter_chapter_pages(book_slug, chapter_key):
         results = []
-        for hadith in hadiths:
-            english = hadith.get('hadithEnglish', '').strip()
-            arabic = hadith.get('hadithArabic', '').strip()
+        for hadith in page:
+            english = (hadith.get('hadithEnglish') or '').strip()
+            arabic = (hadith.get('hadithArabic') or '').strip()
             
             if not english:
                 continue
@@ -138,80 +128,128 @@ def fetch_chapter_hadiths(book_slug, book_name, chapter):
         with lock:
             stats['fetched'] += len(results)
         
-        return results
-        
-    except Exception as e:
-        return []
+        yield results
 
-def fetch_all_hadiths_from_book(book_slug, book_name):
-    """Fetch all hadiths from a book using parallel requests"""
-    print(f"\n📖 Processing: {book_name}")
-    print("-" * 70)
-    
+def fetch_book_chapters(book_slug, book_name):
+    """Fetch the chapter list of a book"""
     try:
-        # Get chapters
-        url = f"{BASE_URL}/{book_slug}/chapters"
-        params = {"apiKey": HADITH_API_KEY}
-        
-        response = requests.get(url, params=params, timeout=30)
-        
-        if response.status_code != 200:
-            print(f"   ❌ Failed to fetch chapters")
-            return []
-        
-        data = response.json()
-        chapters = data.get('chapters', [])
-        
-        print(f"   📚 Found {len(chapters)} chapters")
-        print(f"   🚀 Fetching with {MAX_WORKERS} parallel workers...")
-        
-        all_hadiths = []
-        
-        # Parallel fetch chapters
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = {
-                executor.submit(fetch_chapter_hadiths, book_slug, book_name, chapter): chapter
-                for chapter in chapters
-            }
-            
-            with tqdm(total=len(chapters), desc=f"   Chapters", unit="ch") as pbar:
-                for future in as_completed(futures):
-                    hadiths = future.result()
-                    all_hadiths.extend(hadiths)
-                    pbar.update(1)
-        
-        print(f"   ✅ Fetched {len(all_hadiths)} hadiths")
-        return all_hadiths
+        chapters = client.chapters(book_slug)
+        print(f"   📚 {book_name}: {len(chapters)} chapters")
+        return chapters
         
     except Exception as e:
-        print(f"   ❌ Error: {str(e)}")
+        print(f"   ❌ Error fetching chapters for {book_name}: {str(e)}")
+        with lock:
+            stats['failed_books'] += 1
         return []
 
-def upload_hadiths_batch(hadiths_batch):
-    """Upload a batch of hadiths with embeddings"""
+def hadith_vector_id(hadith):
+    return f"hadith_{hadith['book_slug']}_{hadith['hadith_number']}_{hadith['chapter_key']}"
+
+def hadith_text(hadith):
+    """The exact text that is embedded for a hadith"""
+    english = hadith['english_text']
+    arabic = hadith['arabic_text']
+    return f"{english}\n{arabic}" if arabic else english
+
+def chapter_unit(book_slug, chapter):
+    chapter_key = chapter.get('chapterKey') or chapter.get('key') or chapter.get('chapterNumber')
+    return f"{book_slug}:{chapter_key}"
+
+def list_chapter_tasks(book, resume_done):
+    """Chapters stage: chapter tasks for a book, minus chapters finished in an earlier run"""
+    book_slug, book_name = book
+    for chapter in fetch_book_chapters(book_slug, book_name):
+        unit = chapter_unit(book_slug, chapter)
+        if unit in resume_done:
+            with lock:
+                stats['skipped'] += resume_done[unit]
+            continue
+        yield (book_slug, book_name, chapter)
+
+def checkpointed_hadiths(unit, pages):
+    """Yield the hadiths of a chapter's pages that are not already upserted with the same text.
+
+    Long hadiths are yielded once per chunk; with --incremental, hadiths stored unchanged are dropped.
+    The chapter is checkpointed once every page has been read.
+    """
+    vector_ids = []
+    for hadiths in pages:
+        for hadith in hadiths:
+            hadith['content_hash'] = content_hash(hadith_text(hadith))
+        ids = [hadith_vector_id(h) for h in hadiths]
+        vector_ids.extend(ids)
+        if delta is not None:
+            delta.see(ids)
+        done = checkpoint.upserted_hashes(ids) if checkpoint is not None else {}
+        fresh = [h for h in hadiths if done.get(hadith_vector_id(h)) != h['content_hash']]
+        with lock:
+            stats['skipped'] += len(hadiths) - len(fresh)
+        for hadith in fresh:
+            chunks = list(chunk_record(hadith, hadith_vector_id(hadith), hadith_text(hadith), *chunking))
+            if delta is not None and not delta.needs_embedding(chunks, EMBED_MODEL):
+                continue
+            chunk_stats.add([c['embed_text'] for c in chunks])
+            yield from chunks
+    if checkpoint is not None:
+        checkpoint.mark_fetched('chapter', unit, vector_ids)
+
+def fetch_chapter_task(task):
+    """Fetch stage: stream a chapter's hadiths page by page, minus those already upserted with the same text"""
+    book_slug, book_name, chapter = task
+    unit = chapter_unit(book_slug, chapter)
     try:
-        # Prepare texts for batch embedding
-        texts = []
-        for hadith in hadiths_batch:
-            english = hadith['english_text']
-            arabic = hadith['arabic_text']
-            combined = f"{english}\n{arabic}" if arabic else english
-            texts.append(combined)
-        
-        # Generate embeddings in batch
-        embeddings = generate_embeddings_batch(texts)
-        
-        if embeddings is None:
+        yield from checkpointed_hadiths(unit, iter_chapter_hadiths(book_slug, book_name, chapter))
+    except Exception as e:
+        # Not checkpointed, so --resume fetches this chapter again
+        print(f"   ⚠️  {book_name} chapter {unit} failed: {str(e)}")
+        with lock:
+            stats['failed_chapters'] += 1
+
+def iter_snapshot_chapters(directory, books, resume_done):
+    """Source for snapshot mode: (unit, hadiths) per chapter of the selected books"""
+    records = iter_records(directory, corpus='hadiths')
+    for unit, hadiths in iter_units(records, lambda h: f"{h['book_slug']}:{h['chapter_key']}"):
+        if hadiths[0]['book_slug'] not in books:
+            continue
+        if unit in resume_done:
             with lock:
-                stats['failed'] += len(hadiths_batch)
-            return
-        
-        # Prepare vectors for Pinecone
-        vectors = []
-        for i, hadith in enumerate(hadiths_batch):
-            try:
-                vector_id = f"hadith_{hadith['book_slug']}_{hadith['hadith_number']}_{hadith['chapter_key']}"
-                
+                stats['skipped'] += resume_done[unit]
+            continue
+        yield unit, hadiths
+
+def snapshot_chapter_task(item):
+    """Snapshot stage: one chapter's records as read from the snapshot"""
+    unit, hadiths = item
+    with lock:
+        stats['fetched'] += len(hadiths)
+    return checkpointed_hadiths(unit, [hadiths])
+
+def build_vectors(hadiths_batch, embeddings):
+    """Pair a batch of hadiths with their embeddings as Pinecone vectors"""
+    vectors = []
+    docs = {}
+    for i, hadith in enumerate(hadiths_batch):
+        try:
+            vector_id = hadith['vector_id']
+            
+            if documents is not None:
+                # Lean mode: full texts go to the document store, metadata keeps filterable fields
+                docs[hadith_vector_id(hadith)] = {
+                    'book_name': hadith['book_name'],
+                    'chapter': hadith['chapter_name'],
+                    'english_text': hadith['english_text'],
+                    'arabic_text': hadith['arabic_text'],
+                    'narrator': hadith['narrator'],
+                    'source': 'Hadith API'
+                }
+                metadata = {
+                    'type': 'hadith',
+                    'book_slug': hadith['book_slug'],
+                    'hadith_number': hadith['hadith_number'],
+                    'grade': hadith['grade']
+                }
+            else:
                 metadata = {
                     'type': 'hadith',
                     'book_name': hadith['book_name'],
@@ -224,81 +262,307 @@ def upload_hadiths_batch(hadiths_batch):
                     'grade': hadith['grade'],
                     'source': 'Hadith API'
                 }
-                
-                vectors.append({
-                    'id': vector_id,
-                    'values': embeddings[i],
-                    'metadata': metadata
-                })
-                
-            except Exception as e:
-                with lock:
-                    stats['failed'] += 1
-                continue
-        
-        # Upload to Pinecone
-        if vectors:
-            index.upsert(vectors=vectors)
+                if 'parent_id' in hadith:
+                    # A chunk carries its own passage, not the start of the whole hadith
+                    del metadata['english_text'], metadata['arabic_text']
+                    metadata['text'] = hadith['embed_text'][:2000]
+            metadata.update(chunk_metadata(hadith))
+            metadata.update(hash_metadata(hadith['embed_text'], EMBED_MODEL))
+            
+            vectors.append({
+                'id': vector_id,
+                'values': embeddings[i],
+                'metadata': metadata
+            })
+            
+        except Exception as e:
             with lock:
-                stats['uploaded'] += len(vectors)
-        
-    except Exception as e:
-        print(f"   ⚠️  Batch upload error: {str(e)}")
-        with lock:
-            stats['failed'] += len(hadiths_batch)
+                stats['failed'] += 1
+            continue
+    if docs:
+        # Written before the vectors are upserted, so every indexed id can be hydrated
+        documents.put_many(docs)
+    return vectors
 
-def process_book_fast(book_slug, book_name):
-    """Fetch and upload hadiths from a book with batch processing"""
-    hadiths = fetch_all_hadiths_from_book(book_slug, book_name)
-    
-    if not hadiths:
-        return
+def embed_hadiths_batch(hadiths_batch):
+    """Embedding stage: one batched embedding call per list of hadiths"""
+    texts = [hadith['embed_text'] for hadith in hadiths_batch]
     
-    print(f"   📤 Uploading {len(hadiths)} hadiths in batches of {BATCH_SIZE}...")
+    embeddings = generate_embeddings_batch(texts)
     
-    # Process in batches
-    with tqdm(total=len(hadiths), desc=f"   Uploading", unit="hadith") as pbar:
-        for i in range(0, len(hadiths), BATCH_SIZE):
-            batch = hadiths[i:i+BATCH_SIZE]
-            upload_hadiths_batch(batch)
-            pbar.update(len(batch))
-            time.sleep(0.5)  # Rate limiting
+    if embeddings is None:
+        with lock:
+            stats['failed'] += len(hadiths_batch)
+        return []
     
-    print(f"   ✅ Completed {book_name}")
+    vectors = build_vectors(hadiths_batch, embeddings)
+    hashes = {h['vector_id']: h['content_hash'] for h in hadiths_batch}
+    # One item per vector, so the pack stage can fill requests by size (and namespace)
+    return [(v, hashes[v['id']], vector_bytes(v), namespace_for(namespace_layout, 'hadith', v['metadata']['book_slug']))
+            for v in vectors]
+
+def delete_superseded(parents, namespace):
+    """Drop the whole-record vectors of hadiths that are now fully stored as chunks"""
+    if not parents:
+        return
+    try:
+        call_with_retry(get_limiter('pinecone-delete'), lambda: index.delete(ids=sorted(parents), namespace=namespace))
+    except Exception as e:
+        print(f"   ⚠️  Could not delete {len(parents)} superseded hadith vector(s): {e}")
+
+def upload_vectors(batch):
+    """Upsert stage: send one size-packed batch of (vector, hash, size, namespace) items"""
+    vectors = [v for v, _, _, _ in batch]
+    hashes = {v['id']: h for v, h, _, _ in batch}
+    done, failed = upserter.upsert(vectors, [size for _, _, size, _ in batch], namespace=batch[0][3])
+    # A chunked hadith counts (and is checkpointed) once all of its chunks have landed
+    completed = set(chunk_tracker.done(done))
+    lost = chunk_tracker.fail(failed)
+    delete_superseded(completed - {v['id'] for v in done}, batch[0][3])
+    if checkpoint is not None and done:
+        pairs = {v['id']: hashes[v['id']] for v in done}
+        for v in done:
+            parent = v['metadata'].get('parent_id')
+            if parent in completed:
+                pairs[parent] = hashes[v['id']]
+        checkpoint.mark_upserted(list(pairs.items()))
+    with lock:
+        stats['uploaded'] += len(completed)
+        stats['failed'] += len(lost)
+
+def build_pipeline(args, resume_done=None):
+    """Chapters -> hadith fetch -> embed -> pack -> upsert, each stage with its own workers.
 
-# Main execution
-print("🎯 Starting fast hadith ingestion...")
-print("=" * 70)
+    With --snapshot the first two stages are replaced by reading chapters from the snapshot.
+    """
+    resume_done = resume_done or {}
+    if args.snapshot:
+        sources = [Stage('snapshot', snapshot_chapter_task, workers=2)]
+    else:
+        sources = [
+            Stage('chapters', lambda book: list_chapter_tasks(book, resume_done), workers=len(args.books)),
+            Stage('fetch', fetch_chapter_task, workers=args.fetch_workers),
+        ]
+    return Pipeline(sources + [
+        Stage('embed', embed_hadiths_batch, workers=args.embed_workers, batch_size=args.batch_size),
+        # A single packer fills requests up to --upsert-bytes; the upsert workers keep several in flight
+        Stage('pack', lambda batch: [batch], batch_size=args.upsert_max_vectors,
+              max_batch_bytes=args.upsert_bytes, item_size=lambda item: item[2], batch_key=lambda item: item[3]),
+        Stage('upsert', upload_vectors, workers=args.upsert_workers),
+    ], queue_size=args.queue_size, report_every=args.report_every, status=upserter.status)
 
-start_time = time.time()
+def parse_args():
+    parser = argparse.ArgumentParser(description='Ingest hadith collections into Pinecone')
+    parser.add_argument('--books', nargs='+', default=list(BOOKS), choices=list(BOOKS),
+                        help='book slugs to ingest (default: all)')
+    parser.add_argument('--fetch-workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--embed-workers', type=int, default=EMBED_WORKERS)
+    parser.add_argument('--upsert-workers', type=int, default=UPSERT_WORKERS, help='upsert requests in flight')
+    parser.add_argument('--upsert-bytes', type=int, default=DEFAULT_BATCH_BYTES,
+                        help='serialized bytes per upsert request (default: 90%% of the 2 MB limit)')
+    parser.add_argument('--upsert-max-vectors', type=int, default=MAX_REQUEST_VECTORS, help='vectors per upsert request')
+    parser.add_argument('--page-workers', type=int, default=PAGE_WORKERS,
+                        help='parallel page fetches shared by all chapters')
+    parser.add_argument('--base-url', default=None,
+                        help='hadith API base URL (default: HADITH_API_BASE_URL or https://hadithapi.com/api)')
+    parser.add_argument('--snapshot', metavar='DIR',
+                        help='read hadiths from a corpus_snapshot.py snapshot instead of the API')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='texts per embedding call')
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE, help='items buffered between stages')
+    parser.add_argument('--report-every', type=float, default=5.0, help='seconds between progress lines (0 = off)')
+    parser.add_argument('--resume', action='store_true',
+                        help='skip chapters and hadiths already upserted by an earlier (interrupted) run')
+    parser.add_argument('--checkpoint', default=str(CACHE_DIR / 'ingest_hadiths.sqlite3'),
+                        help='checkpoint file (default: scripts/.cache/ingest_hadiths.sqlite3)')
+    parser.add_argument('--lean-metadata', action='store_true',
+                        help='keep only filterable fields in vector metadata; full texts go to the document store')
+    parser.add_argument('--documents', default=None,
+                        help='document store for --lean-metadata (default: DOCUMENT_STORE_PATH or scripts/.cache/documents.sqlite3)')
+    parser.add_argument('--chunk-tokens', type=int, default=0,
+                        help=f'split hadiths longer than this many (estimated) tokens, e.g. {CHUNK_TOKENS} '
+                             '(default: 0, no chunking)')
+    parser.add_argument('--chunk-overlap', type=int, default=CHUNK_OVERLAP, help='tokens repeated between chunks')
+    parser.add_argument('--namespace-layout', choices=NAMESPACE_LAYOUTS, default='default',
+                        help="default: one shared namespace; corpus: namespace 'hadith'; book: one per collection "
+                             "(use a separate --checkpoint per layout)")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="drop the selected books' namespaces before ingesting (needs --namespace-layout book, "
+                             "or corpus with every book)")
+    parser.add_argument('--incremental', action='store_true',
+                        help='embed only hadiths whose text or embedding model changed since they were stored, '
+                             'and delete hadiths that vanished upstream')
+    add_store_args(parser)
+    return parser.parse_args()
 
-# Process each book sequentially (but with parallel chapter fetching)
-for book_slug, book_name in BOOKS.items():
-    process_book_fast(book_slug, book_name)
+def main():
+    global index, upserter, documents, checkpoint, delta, client, chunking, namespace_layout
+    args = parse_args()
+    chunking = (args.chunk_tokens, args.chunk_overlap)
+    namespace_layout = args.namespace_layout
+    namespaces = sorted({namespace_for(namespace_layout, 'hadith', slug) for slug in args.books})
+    if args.rebuild and (namespace_layout == 'default' or (namespace_layout == 'corpus' and set(args.books) != set(BOOKS))):
+        print("❌ Error: --rebuild would drop vectors of other books; use --namespace-layout book")
+        sys.exit(1)
+    if args.rebuild and args.incremental:
+        print("❌ Error: --rebuild and --incremental exclude each other")
+        sys.exit(1)
+
+    print("=" * 70)
+    print("🚀 FAST HADITH INGESTION TO PINECONE")
+    print("=" * 70)
+    print()
+
+    # Validate API keys
+    if not all([HADITH_API_KEY or args.snapshot, GEMINI_API_KEY]):
+        print("❌ Error: Missing API keys!")
+        print(f"   HADITH_API_KEY: {'✓' if HADITH_API_KEY else '✗'}")
+        print(f"   GEMINI_API_KEY: {'✓' if GEMINI_API_KEY else '✗'}")
+        sys.exit(1)
+
+    # Initialize the vector store (Pinecone unless --store local)
+    print("📡 Connecting to vector store...")
+    try:
+        index = open_vector_store(args.store, args.index, args.store_dir)
+    except VectorStoreError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    print(f"✅ Connected to {index.label}")
+    if args.rebuild:
+        for namespace in namespaces:
+            index.delete(delete_all=True, namespace=namespace)
+            print(f"🗑️  Dropped namespace '{namespace}' for rebuild")
+    upserter = Upserter(index)
+    if args.lean_metadata:
+        documents = DocumentStore(args.documents)
+        print(f"📚 Lean metadata: full texts go to {documents.path}")
+        print("   The RAG server reads them through agents-python/document_lookup.py: it must see this file "
+              "(DOCUMENT_STORE_PATH)")
+
+    # Initialize Gemini
+    print("🤖 Initializing Gemini API...")
+    genai.configure(api_key=GEMINI_API_KEY)
+    print("✅ Gemini ready")
     print()
 
-elapsed = time.time() - start_time
-
-# Final summary
-print("=" * 70)
-print("✅ HADITH INGESTION COMPLETE!")
-print("=" * 70)
-print(f"⏱️  Total time: {elapsed/60:.1f} minutes")
-print(f"📊 Hadiths fetched: {stats['fetched']:,}")
-print(f"✅ Successfully uploaded: {stats['uploaded']:,}")
-print(f"❌ Failed: {stats['failed']:,}")
-print(f"⏭️  Skipped: {stats['skipped']:,}")
-if stats['fetched'] > 0:
-    print(f"📈 Success rate: {(stats['uploaded']/stats['fetched']*100):.1f}%")
-print("=" * 70)
-
-# Verify in Pinecone
-print("\n🔍 Verifying in Pinecone...")
-try:
-    index_stats = index.describe_index_stats()
-    total = index_stats.get('total_vector_count', 0)
-    print(f"✅ Total vectors in Pinecone: {total:,}")
-    print(f"   📖 Hadiths uploaded this session: {stats['uploaded']:,}")
+    # One pooled HTTP session for every chapter and page request
+    if not args.snapshot:
+        client = HadithClient(HADITH_API_KEY, base_url=args.base_url, page_workers=args.page_workers,
+                              pool_size=args.fetch_workers + args.page_workers + len(args.books))
+
+    # Checkpoint: start over unless resuming
+    checkpoint = Checkpoint(args.checkpoint, reset=not args.resume)
+    resume_done = checkpoint.completed_units('chapter') if args.resume else {}
+    if args.resume:
+        progress = checkpoint.summary()
+        print(f"♻️  Resuming: {len(resume_done):,} chapters complete, {progress['vectors']:,} vectors already upserted")
+        print()
+
+    # Incremental: what the index already holds for the selected books
+    if args.incremental:
+        delta = Delta()
+        print("🔎 Incremental: fetching stored content hashes...")
+        try:
+            stored = delta.load(index, [(namespace_for(namespace_layout, 'hadith', slug), f"hadith_{slug}_")
+                                        for slug in args.books])
+        except Exception as e:
+            print(f"❌ Error: could not list stored vectors: {e}")
+            sys.exit(1)
+        if args.resume:
+            # Chapters finished before the interruption are not read again
+            delta.see(checkpoint.vector_ids())
+        print(f"   {stored:,} vectors stored for the selected books")
+        print()
+
+    print("🎯 Starting fast hadith ingestion...")
+    print(f"   📖 Books: {', '.join(BOOKS[b] for b in args.books)}")
+    if namespace_layout != 'default':
+        print(f"   🗂️  Namespaces: {', '.join(namespaces)}")
+    if args.snapshot:
+        try:
+            manifest = read_manifest(args.snapshot)
+        except SnapshotError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"   📦 Reading from snapshot: {args.snapshot} ({manifest['total_records']:,} records, {manifest['created_at']})")
+    print(f"   🚀 Workers: fetch={args.fetch_workers} embed={args.embed_workers} upsert={args.upsert_workers}")
     print("=" * 70)
-except Exception as e:
-    print(f"⚠️  Could not verify: {str(e)}")
+
+    start_time = time.time()
+
+    pipeline = build_pipeline(args, resume_done)
+    if args.snapshot:
+        source = iter_snapshot_chapters(args.snapshot, set(args.books), resume_done)
+    else:
+        source = ((slug, BOOKS[slug]) for slug in args.books)
+    stage_stats = pipeline.run(source)
+
+    # Incremental: drop vanished hadiths, but only when every book and chapter was read
+    deleted = 0
+    if delta is not None:
+        if stats['failed_books'] or stats['failed_chapters'] or any(s['errors'] for s in stage_stats.values()):
+            print("⚠️  Not deleting vanished hadiths: part of the source could not be read")
+        else:
+            deleted = delete_obsolete(index, delta.obsolete())
+            if documents is not None:
+                documents.delete_many(delta.vanished())
+
+    elapsed = time.time() - start_time
+    if client:
+        client.close()
+
+    # Final summary
+    print("=" * 70)
+    print("✅ HADITH INGESTION COMPLETE!")
+    print("=" * 70)
+    print(f"⏱️  Total time: {elapsed/60:.1f} minutes")
+    print(f"📊 Hadiths fetched: {stats['fetched']:,}")
+    print(f"✅ Successfully uploaded: {stats['uploaded']:,}")
+    print(f"❌ Failed: {stats['failed']:,}")
+    print(f"⏭️  Skipped: {stats['skipped']:,}")
+    if client:
+        print(f"🌐 Hadith API requests: {client.requests:,}")
+    print(f"🧠 Peak memory (RSS): {peak_rss_mb():,.0f} MB")
+    if stats['failed_books']:
+        print(f"⚠️  Books whose chapter list could not be fetched: {stats['failed_books']:,}")
+    if stats['failed_chapters']:
+        print(f"⚠️  Chapters that could not be fetched: {stats['failed_chapters']:,} (re-run with --resume to retry failures)")
+    if stats['fetched'] > 0:
+        print(f"📈 Success rate: {(stats['uploaded']/stats['fetched']*100):.1f}%")
+    if delta is not None:
+        d = delta.summary()
+        print(f"🔁 Incremental: {d['unchanged']:,} unchanged, {d['changed']:,} changed, {d['new']:,} new; "
+              f"{deleted:,} obsolete vectors deleted")
+    cache = get_embedding_cache()
+    if cache:
+        print(f"💾 Embedding cache: {cache.hits:,} hits, {cache.misses:,} misses")
+    c = chunk_stats.summary()
+    if c['chunks']:
+        t = c['tokens']
+        print(f"✂️  Chunks: {c['records']:,} hadiths -> {c['chunks']:,} vectors ({c['chunkedRecords']:,} split); "
+              f"tokens p50={t['p50']} p90={t['p90']} p99={t['p99']} max={t['max']}")
+    u = upserter.summary()
+    print(f"📤 Upserts: {u['vectors']:,} vectors in {u['requests']:,} requests "
+          f"({u['bytes'] / 1e6:,.1f} MB, {u['splits']} splits) at {u['vectorsPerSecond']:,.1f} vectors/s, "
+          f"{u['bytesPerSecond'] / 1e6:.2f} MB/s")
+    for name, s in limiter_summary().items():
+        print(f"🚦 {name}: settled at {s['rate']}/s, throttled {s['throttled']}x")
+    for name, s in stage_stats.items():
+        print(f"   {name:<9} in={s['in']:,} out={s['out']:,} {s['perSecond']:,.1f}/s busy={s['busySeconds']}s errors={s['errors']}")
+    print("=" * 70)
+
+    # Verify in the vector store
+    print(f"\n🔍 Verifying in {index.label}...")
+    try:
+        index_stats = index.describe_index_stats()
+        total = index_stats.get('total_vector_count', 0)
+        print(f"✅ Total vectors in store: {total:,}")
+        for namespace, ns_stats in sorted((index_stats.get('namespaces') or {}).items()):
+            if namespace in namespaces:
+                print(f"   🗂️  {namespace or '(default)'}: {ns_stats['vector_count']:,}")
+        print(f"   📖 Hadiths uploaded this session: {stats['uploaded']:,}")
+        print("=" * 70)
+    except Exception as e:
+        print(f"⚠️  Could not verify: {str(e)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Staged producer/consumer pipeline for the ingestion scripts.
+
+Each stage has its own worker threads and reads from a bounded queue fed by the
+previous stage, so fetching, embedding and upserting overlap and the whole run
+is limited by the slowest stage rather than the sum of them. A stage function
+takes one item (or a list of items when batch_size is set) and returns an
+iterable of items for the next stage, or None. A batching stage can also cap
+the summed item_size(item) of a batch with max_batch_bytes, e.g. to keep upsert
+requests under a payload limit, and keep separate batches per batch_key(item)
+so that every batch is homogeneous (e.g. one namespace). Generators are consumed lazily,
+so with bounded queues peak memory depends on batch size and queue depth, not on
+how much a source yields.
+
+    pipeline = Pipeline([
+        Stage('fetch', fetch_chapter, workers=10),
+        Stage('embed', embed_batch, workers=4, batch_size=100),
+        Stage('upsert', upsert_vectors, workers=4),
+    ], queue_size=8)
+    pipeline.run(chapters)
+"""
+
+import sys
+import time
+import queue
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_DONE = object()
+_FLUSH = object()
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (0 where unsupported)"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class Stage:
+    def __init__(self, name, fn, workers=1, batch_size=0, flush_after=2.0, max_batch_bytes=0, item_size=None,
+                 batch_key=None):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, int(workers))
+        self.batch_size = batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.item_size = item_size
+        self.batch_key = batch_key
+        self.flush_after = flush_after  # seconds a partial batch may wait for more items
+        self.lock = threading.Lock()
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.queue = None
+
+    def record(self, items_in, items_out, busy, error=False):
+        with self.lock:
+            self.items_in += items_in
+            self.items_out += items_out
+            self.busy += busy
+            if error:
+                self.errors += 1
+
+
+class Pipeline:
+    def __init__(self, stages, queue_size=8, report_every=5.0, out=sys.stdout, status=None):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.report_every = report_every
+        self.out = out
+        self.status = status  # optional callable adding to the progress line
+        self.started = None
+
+    def _worker(self, stage, inbox, outbox):
+        batches = {}  # batch key -> [items, bytes]
+        deadline = None
+        while True:
+            try:
+                timeout = max(0.0, deadline - time.time()) if deadline else None
+                item = inbox.get(timeout=timeout)
+            except queue.Empty:
+                item = _FLUSH  # partial batches waited long enough
+            if item is _DONE:
+                inbox.put(_DONE)  # let the stage's other workers see it too
+                for batch, _ in batches.values():
+                    self._call(stage, batch, outbox)
+                return
+            if item is _FLUSH:
+                for batch, _ in batches.values():
+                    self._call(stage, batch, outbox)
+                batches, deadline = {}, None
+                continue
+            if not stage.batch_size:
+                self._call(stage, item, outbox)
+                continue
+            key = stage.batch_key(item) if stage.batch_key else None
+            size = stage.item_size(item) if stage.max_batch_bytes else 0
+            pending = batches.get(key)
+            if pending and pending[1] + size > stage.max_batch_bytes > 0:
+                # This item would overflow the byte cap: send what we have first
+                self._call(stage, pending[0], outbox)
+                pending = None
+            if pending is None:
+                pending = batches[key] = [[], 0]
+            pending[0].append(item)
+            pending[1] += size
+            deadline = deadline or time.time() + stage.flush_after
+            if len(pending[0]) >= stage.batch_size or pending[1] >= stage.max_batch_bytes > 0:
+                self._call(stage, pending[0], outbox)
+                del batches[key]
+            if not batches:
+                deadline = None
+
+    def _call(self, stage, item, outbox):
+        t0 = time.time()
+        produced = 0
+        count = len(item) if stage.batch_size else 1
+        try:
+            for result in stage.fn(item) or ():
+                if outbox is not None:
+                    outbox.put(result)
+                produced += 1
+        except Exception as e:
+            print(f"   ⚠️  {stage.name} error: {e}", file=self.out)
+            stage.record(count, produced, time.time() - t0, error=True)
+            return
+        stage.record(count, produced, time.time() - t0)
+
+    def status_line(self):
+        elapsed = max(time.time() - self.started, 1e-6)
+        parts = []
+        for stage in self.stages:
+            depth = stage.queue.qsize() if stage.queue is not None else 0
+            parts.append(f"{stage.name} {stage.items_in / elapsed:,.1f}/s q={depth}"
+                         + (f" err={stage.errors}" if stage.errors else ''))
+        if self.status:
+            parts.append(self.status())
+        return ' | '.join(parts)
+
+    def _reporter(self, stop):
+        while not stop.wait(self.report_every):
+            print(f"   ⏱️  {self.status_line()}", file=self.out, flush=True)
+
+    def run(self, source):
+        """Feed source items through every stage; returns per-stage stats once all work is done"""
+        self.started = time.time()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        for stage, q in zip(self.stages, queues):
+            stage.queue = q
+
+        stage_threads = []
+        for i, stage in enumerate(self.stages):
+            outbox = queues[i + 1] if i + 1 < len(queues) else None
+            threads = [threading.Thread(target=self._worker, args=(stage, queues[i], outbox), daemon=True)
+                       for _ in range(stage.workers)]
+            for t in threads:
+                t.start()
+            stage_threads.append(threads)
+
+        stop = threading.Event()
+        reporter = threading.Thread(target=self._reporter, args=(stop,), daemon=True)
+        if self.report_every:
+            reporter.start()
+
+        try:
+            for item in source:
+                queues[0].put(item)
+            queues[0].put(_DONE)
+            # Close each stage only after everything upstream has drained into it
+            for i, threads in enumerate(stage_threads):
+                for t in threads:
+                    t.join()
+                if i + 1 < len(queues):
+                    queues[i + 1].put(_DONE)
+        finally:
+            stop.set()
+
+        elapsed = time.time() - self.started
+        return {
+            stage.name: {
+                'in': stage.items_in,
+                'out': stage.items_out,
+                'errors': stage.errors,
+                'perSecond': round(stage.items_in / elapsed, 2) if elapsed else 0.0,
+                'busySeconds': round(stage.busy, 1),
+            }
+            for stage in self.stages
+        }
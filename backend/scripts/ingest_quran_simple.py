@@ -1,16 +1,32 @@
 #!/usr/bin/env python3
 """
-Simple & Fast Quran Ingestion - Sequential fetch, batch upload
+Simple & Fast Quran Ingestion
+Surahs are fetched concurrently (Arabic and English in one multi-edition request),
+ayahs are embedded in batches, packed into upsert requests by serialized size
+and uploaded by parallel upsert workers. With --incremental only new or changed
+ayahs are embedded, and ayahs that vanished upstream are deleted.
 """
 
 import requests
 import os
+import sys
 import time
+import argparse
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
-from pinecone import Pinecone
 import google.generativeai as genai
-from tqdm import tqdm
+
+from ingest_pipeline import Pipeline, Stage, peak_rss_mb
+from rate_limiter import call_with_retry, get_limiter, limiter_summary, request
+from ingest_checkpoint import CACHE_DIR, Checkpoint, content_hash
+from embedding_cache import cached_embed, get_embedding_cache
+from corpus_snapshot import SnapshotError, iter_records, iter_units, read_manifest
+from vector_store import NAMESPACE_LAYOUTS, VectorStoreError, add_store_args, namespace_for, open_vector_store
+from vector_upsert import DEFAULT_BATCH_BYTES, MAX_REQUEST_VECTORS, Upserter, vector_bytes
+from document_store import DocumentStore, hydrate
+from chunker import CHUNK_OVERLAP, CHUNK_TOKENS, ChunkStats, ChunkTracker, chunk_metadata, chunk_record
+from vector_delta import Delta, delete_obsolete, hash_metadata
 
 # Load environment
 script_dir = Path(__file__).resolve().parent
@@ -18,187 +34,454 @@ backend_dir = script_dir.parent
 env_path = backend_dir / '.env'
 load_dotenv(dotenv_path=env_path, override=True)
 
-PINECONE_API_KEY = os.getenv('PINECONE_API_KEY')
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+EMBED_MODEL = "models/text-embedding-004"
+BASE_URL = "http://api.alquran.cloud/v1"
+EDITIONS = ("quran-uthmani", "en.sahih")
 
-print("=" * 70)
-print("🕌 QURAN INGESTION (Simple & Reliable)")
-print("=" * 70)
-print()
-
-# Initialize
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index("hikma-fatwas")
-genai.configure(api_key=GEMINI_API_KEY)
+# Performance settings
+FETCH_WORKERS = 8  # Parallel surah fetches
+EMBED_WORKERS = 4  # Concurrent embedding batches
+UPSERT_WORKERS = 4  # Concurrent Pinecone uploads
+BATCH_SIZE = 100  # Ayahs per embedding call
+QUEUE_SIZE = 16  # Items buffered between stages
 
-print("✅ Connected to Pinecone")
-print("✅ Gemini configured")
-print()
+index = None
+upserter = None
+documents = None  # DocumentStore in --lean-metadata mode
+checkpoint = None
+delta = None  # Delta in --incremental mode
+chunking = (0, CHUNK_OVERLAP)  # (max tokens, overlap) per chunk; 0 max tokens = no chunking
+namespace = ''  # 'quran' with --namespace-layout corpus/book
+chunk_stats = ChunkStats()
+chunk_tracker = ChunkTracker()
 
+# Thread-safe counters
+lock = threading.Lock()
 total_uploaded = 0
 failed = 0
+skipped = 0
+failed_surahs = 0
+
+def count(name, n):
+    global total_uploaded, failed, skipped, failed_surahs
+    with lock:
+        if name == 'uploaded':
+            total_uploaded += n
+        elif name == 'failed':
+            failed += n
+        elif name == 'failed_surahs':
+            failed_surahs += n
+        else:
+            skipped += n
 
-def generate_embedding(text):
-    """Generate embedding for text"""
+def embed_uncached(texts):
+    result = call_with_retry(get_limiter('gemini-embed'),
+                             lambda: genai.embed_content(model=EMBED_MODEL, content=texts))
+    return result['embedding']
+
+def generate_embeddings_batch(texts):
+    """Generate embeddings for multiple texts in one call, reusing cached vectors"""
     try:
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=text
-        )
-        return result['embedding']
+        return cached_embed(get_embedding_cache(), embed_uncached, EMBED_MODEL, None, texts)
     except Exception as e:
-        print(f"   ⚠️ Embedding error: {e}")
+        print(f"   ⚠️ Batch embedding error: {e}")
         return None
 
-def fetch_and_upload_surah(surah_num):
-    """Fetch and upload one surah"""
-    global total_uploaded, failed
-    
+def fetch_surah(surah_num):
+    """Fetch the Arabic and English editions of a surah in one request; returns per-ayah records or None"""
     try:
-        # Fetch Arabic
-        url_ar = f"http://api.alquran.cloud/v1/surah/{surah_num}/quran-uthmani"
-        response_ar = requests.get(url_ar, timeout=15)
-        
-        # Fetch English
-        url_en = f"http://api.alquran.cloud/v1/surah/{surah_num}/en.sahih"
-        response_en = requests.get(url_en, timeout=15)
-        
-        if response_ar.status_code != 200 or response_en.status_code != 200:
+        url = f"{BASE_URL}/surah/{surah_num}/editions/{','.join(EDITIONS)}"
+        response = request(requests, 'alquran', 'GET', url, timeout=15)
+
+        if response.status_code != 200:
             print(f"   ❌ API error for surah {surah_num}")
-            return 0
-        
-        data_ar = response_ar.json()
-        data_en = response_en.json()
-        
-        if data_ar.get('code') != 200 or data_en.get('code') != 200:
+            return None
+
+        data = response.json()
+
+        if data.get('code') != 200 or len(data.get('data') or []) != len(EDITIONS):
             print(f"   ❌ Invalid response for surah {surah_num}")
-            return 0
-        
-        ayahs_ar = data_ar['data']['ayahs']
-        ayahs_en = data_en['data']['ayahs']
-        
-        # Get surah metadata from parent
-        surah_info_ar = data_ar['data']
-        surah_info_en = data_en['data']
-        
+            return None
+
+        surah_info_ar, surah_info_en = data['data']
+        ayahs_ar = surah_info_ar['ayahs']
+        ayahs_en = surah_info_en['ayahs']
+
         surah_name = surah_info_en.get('englishName', f'Surah {surah_num}')
         surah_arabic = surah_info_ar.get('name', '')
         revelation = surah_info_en.get('revelationType', 'makkah')
-        
+
         if len(ayahs_ar) != len(ayahs_en):
             print(f"   ❌ Mismatch for surah {surah_num}")
-            return 0
-        
-        uploaded = 0
-        
-        # Process in batches of 20
-        batch_size = 20
-        for i in range(0, len(ayahs_ar), batch_size):
-            batch_ar = ayahs_ar[i:i+batch_size]
-            batch_en = ayahs_en[i:i+batch_size]
-            
-            vectors = []
-            
-            for j in range(len(batch_ar)):
-                ar = batch_ar[j]
-                en = batch_en[j]
-                
-                text_arabic = ar['text']
-                text_english = en['text']
-                ayah_number = ar['numberInSurah']
-                
-                if not text_arabic or not text_english:
-                    failed += 1
-                    continue
-                
-                # Generate embedding
-                combined_text = f"{text_arabic}\n{text_english}"
-                embedding = generate_embedding(combined_text)
-                
-                if not embedding:
-                    failed += 1
-                    continue
-                
-                # Prepare vector
-                vector_id = f"quran_{surah_num}_{ayah_number}"
-                
-                metadata = {
-                    'type': 'quran',
-                    'surah_number': surah_num,
-                    'surah_name': surah_name,
-                    'surah_arabic': surah_arabic,
-                    'ayah_number': ayah_number,
-                    'ayah_key': f"{surah_num}:{ayah_number}",
-                    'revelation_place': revelation,
-                    'text_arabic': text_arabic[:1000],
-                    'text_english': text_english[:1000],
-                    'source': 'AlQuran Cloud API',
-                    'text': combined_text[:2000]
-                }
-                
-                vectors.append({
-                    'id': vector_id,
-                    'values': embedding,
-                    'metadata': metadata
-                })
-                
-                time.sleep(0.1)  # Rate limit
-            
-            # Upload batch
-            if vectors:
-                try:
-                    index.upsert(vectors=vectors)
-                    uploaded += len(vectors)
-                    total_uploaded += len(vectors)
-                except Exception as e:
-                    print(f"   ⚠️ Upload error: {e}")
-                    failed += len(vectors)
-        
-        return uploaded
-        
+            return None
+
+        records = []
+        for ar, en in zip(ayahs_ar, ayahs_en):
+            records.append({
+                'surah_number': surah_num,
+                'surah_name': surah_name,
+                'surah_arabic': surah_arabic,
+                'revelation_place': revelation,
+                'ayah_number': ar['numberInSurah'],
+                'text_arabic': ar['text'],
+                'text_english': en['text'],
+            })
+        return records
+
+    except Exception as e:
+        print(f"   ❌ Error fetching surah {surah_num}: {e}")
+        return None
+
+def ayah_vector_id(ayah):
+    return f"quran_{ayah['surah_number']}_{ayah['ayah_number']}"
+
+def ayah_text(ayah):
+    """The exact text that is embedded for an ayah"""
+    return f"{ayah['text_arabic']}\n{ayah['text_english']}"
+
+def fetch_surah_task(surah_num):
+    """Fetch stage: a surah's ayahs, minus those already upserted with the same text"""
+    ayahs = fetch_surah(surah_num)
+    if ayahs is None:
+        count('failed_surahs', 1)
+        return []
+    return checkpointed_ayahs(surah_num, ayahs)
+
+def snapshot_surah_task(item):
+    """Snapshot stage: one surah's ayahs as read from the snapshot"""
+    surah_num, ayahs = item
+    return checkpointed_ayahs(surah_num, ayahs)
+
+def checkpointed_ayahs(surah_num, ayahs):
+    """Yield a surah's ayahs that are not already upserted with the same text (long ayahs once per chunk)"""
+    if delta is not None:
+        # Still upstream, even if a text came back empty this time: keep what is stored
+        delta.see([ayah_vector_id(a) for a in ayahs])
+    # Ayahs missing a text can't be embedded; leaving them out of the surah's vectors
+    # lets the surah complete once the rest are upserted
+    empty = [a for a in ayahs if not a['text_arabic'] or not a['text_english']]
+    if empty:
+        count('failed', len(empty))
+    ayahs = [a for a in ayahs if a['text_arabic'] and a['text_english']]
+    # Checkpoint: remember this surah's ayahs, skip those already upserted unchanged
+    ids = [ayah_vector_id(a) for a in ayahs]
+    checkpoint.mark_fetched('surah', str(surah_num), ids)
+    done = checkpoint.upserted_hashes(ids)
+
+    for ayah in ayahs:
+        ayah['content_hash'] = content_hash(ayah_text(ayah))
+        if done.get(ayah_vector_id(ayah)) == ayah['content_hash']:
+            count('skipped', 1)
+            continue
+        chunks = list(chunk_record(ayah, ayah_vector_id(ayah), ayah_text(ayah), *chunking))
+        # Incremental: stored with the same text and model, nothing to embed
+        if delta is not None and not delta.needs_embedding(chunks, EMBED_MODEL):
+            continue
+        chunk_stats.add([c['embed_text'] for c in chunks])
+        yield from chunks
+
+def lean_metadata(ayah):
+    """Filterable fields only; the texts live in the document store"""
+    return {
+        'type': 'quran',
+        'surah_number': ayah['surah_number'],
+        'ayah_number': ayah['ayah_number'],
+        'ayah_key': f"{ayah['surah_number']}:{ayah['ayah_number']}",
+        'revelation_place': ayah['revelation_place'],
+    }
+
+def ayah_document(ayah):
+    return {
+        'surah_name': ayah['surah_name'],
+        'surah_arabic': ayah['surah_arabic'],
+        'text_arabic': ayah['text_arabic'],
+        'text_english': ayah['text_english'],
+        'source': 'AlQuran Cloud API',
+    }
+
+def build_vector(ayah, embedding):
+    if documents is not None:
+        metadata = {**lean_metadata(ayah), **chunk_metadata(ayah), **hash_metadata(ayah['embed_text'], EMBED_MODEL)}
+        return {'id': ayah['vector_id'], 'values': embedding, 'metadata': metadata}
+    metadata = {
+        'type': 'quran',
+        'surah_number': ayah['surah_number'],
+        'surah_name': ayah['surah_name'],
+        'surah_arabic': ayah['surah_arabic'],
+        'ayah_number': ayah['ayah_number'],
+        'ayah_key': f"{ayah['surah_number']}:{ayah['ayah_number']}",
+        'revelation_place': ayah['revelation_place'],
+        'text_arabic': ayah['text_arabic'][:1000],
+        'text_english': ayah['text_english'][:1000],
+        'source': 'AlQuran Cloud API',
+        'text': ayah['embed_text'][:2000],
+        **chunk_metadata(ayah),
+        **hash_metadata(ayah['embed_text'], EMBED_MODEL)
+    }
+    if 'parent_id' in ayah:
+        # A chunk carries its own passage (in 'text'), not the start of the whole ayah
+        del metadata['text_arabic'], metadata['text_english']
+    return {
+        'id': ayah['vector_id'],
+        'values': embedding,
+        'metadata': metadata
+    }
+
+def embed_ayahs_batch(ayahs):
+    """Embedding stage: one batched embedding call per list of ayahs"""
+    embeddings = generate_embeddings_batch([a['embed_text'] for a in ayahs])
+    if embeddings is None:
+        count('failed', len(ayahs))
+        return []
+    vectors = [build_vector(a, e) for a, e in zip(ayahs, embeddings)]
+    if documents is not None:
+        # Written before the vectors are upserted, so every indexed id can be hydrated
+        documents.put_many({ayah_vector_id(a): ayah_document(a) for a in ayahs})
+    # One item per vector, so the pack stage can fill requests by size
+    return [(v, a['content_hash'], vector_bytes(v)) for v, a in zip(vectors, ayahs)]
+
+def delete_superseded(parents):
+    """Drop the whole-record vectors of ayahs that are now fully stored as chunks"""
+    if not parents:
+        return
+    try:
+        call_with_retry(get_limiter('pinecone-delete'), lambda: index.delete(ids=sorted(parents), namespace=namespace))
+    except Exception as e:
+        print(f"   ⚠️  Could not delete {len(parents)} superseded ayah vector(s): {e}")
+
+def upload_vectors(batch):
+    """Upsert stage: send one size-packed batch of (vector, hash, size) items"""
+    vectors = [v for v, _, _ in batch]
+    hashes = {v['id']: h for v, h, _ in batch}
+    done, failed = upserter.upsert(vectors, [size for _, _, size in batch], namespace=namespace)
+    # A chunked ayah counts (and is checkpointed) once all of its chunks have landed
+    completed = set(chunk_tracker.done(done))
+    lost = chunk_tracker.fail(failed)
+    delete_superseded(completed - {v['id'] for v in done})
+    if done:
+        pairs = {v['id']: hashes[v['id']] for v in done}
+        for v in done:
+            parent = v['metadata'].get('parent_id')
+            if parent in completed:
+                pairs[parent] = hashes[v['id']]
+        checkpoint.mark_upserted(list(pairs.items()))
+    count('uploaded', len(completed))
+    count('failed', len(lost))
+
+def build_pipeline(args):
+    """Surah fetch (or snapshot read) -> embed -> pack -> upsert, each stage with its own workers"""
+    if args.snapshot:
+        source = Stage('snapshot', snapshot_surah_task, workers=2)
+    else:
+        source = Stage('fetch', fetch_surah_task, workers=args.fetch_workers)
+    return Pipeline([
+        source,
+        Stage('embed', embed_ayahs_batch, workers=args.embed_workers, batch_size=args.batch_size),
+        # A single packer fills requests up to --upsert-bytes; the upsert workers keep several in flight
+        Stage('pack', lambda batch: [batch], batch_size=args.upsert_max_vectors,
+              max_batch_bytes=args.upsert_bytes, item_size=lambda item: item[2]),
+        Stage('upsert', upload_vectors, workers=args.upsert_workers),
+    ], queue_size=args.queue_size, report_every=args.report_every, status=upserter.status)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Ingest the Quran (Arabic + English) into Pinecone')
+    parser.add_argument('--fetch-workers', type=int, default=FETCH_WORKERS)
+    parser.add_argument('--embed-workers', type=int, default=EMBED_WORKERS)
+    parser.add_argument('--upsert-workers', type=int, default=UPSERT_WORKERS, help='upsert requests in flight')
+    parser.add_argument('--upsert-bytes', type=int, default=DEFAULT_BATCH_BYTES,
+                        help='serialized bytes per upsert request (default: 90%% of the 2 MB limit)')
+    parser.add_argument('--upsert-max-vectors', type=int, default=MAX_REQUEST_VECTORS, help='vectors per upsert request')
+    parser.add_argument('--snapshot', metavar='DIR',
+                        help='read ayahs from a corpus_snapshot.py snapshot instead of the API')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='ayahs per embedding call')
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE, help='items buffered between stages')
+    parser.add_argument('--report-every', type=float, default=5.0, help='seconds between progress lines (0 = off)')
+    parser.add_argument('--resume', action='store_true',
+                        help='skip surahs and ayahs already upserted by an earlier (interrupted) run')
+    parser.add_argument('--checkpoint', default=str(CACHE_DIR / 'ingest_quran.sqlite3'),
+                        help='checkpoint file (default: scripts/.cache/ingest_quran.sqlite3)')
+    parser.add_argument('--lean-metadata', action='store_true',
+                        help='keep only filterable fields in vector metadata; full texts go to the document store')
+    parser.add_argument('--documents', default=None,
+                        help='document store for --lean-metadata (default: DOCUMENT_STORE_PATH or scripts/.cache/documents.sqlite3)')
+    parser.add_argument('--chunk-tokens', type=int, default=0,
+                        help=f'split ayahs longer than this many (estimated) tokens, e.g. {CHUNK_TOKENS} '
+                             '(default: 0, no chunking)')
+    parser.add_argument('--chunk-overlap', type=int, default=CHUNK_OVERLAP, help='tokens repeated between chunks')
+    parser.add_argument('--namespace-layout', choices=NAMESPACE_LAYOUTS, default='default',
+                        help="default: one shared namespace; corpus/book: namespace 'quran' "
+                             "(use a separate --checkpoint per layout)")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="drop the 'quran' namespace before ingesting (needs --namespace-layout corpus or book)")
+    parser.add_argument('--incremental', action='store_true',
+                        help='embed only ayahs whose text or embedding model changed since they were stored, '
+                             'and delete ayahs that vanished upstream')
+    add_store_args(parser)
+    return parser.parse_args()
+
+def main():
+    global index, upserter, documents, checkpoint, delta, chunking, namespace
+    args = parse_args()
+    chunking = (args.chunk_tokens, args.chunk_overlap)
+    namespace = namespace_for(args.namespace_layout, 'quran')
+    if args.rebuild and not namespace:
+        print("❌ Error: --rebuild would drop the shared default namespace; use --namespace-layout corpus")
+        sys.exit(1)
+    if args.rebuild and args.incremental:
+        print("❌ Error: --rebuild and --incremental exclude each other")
+        sys.exit(1)
+
+    print("=" * 70)
+    print("🕌 QURAN INGESTION (Simple & Reliable)")
+    print("=" * 70)
+    print()
+
+    # Initialize
+    try:
+        index = open_vector_store(args.store, args.index, args.store_dir)
+    except VectorStoreError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    genai.configure(api_key=GEMINI_API_KEY)
+
+    print(f"✅ Connected to {index.label}")
+    if namespace:
+        print(f"🗂️  Namespace: {namespace}")
+    if args.rebuild:
+        index.delete(delete_all=True, namespace=namespace)
+        print(f"🗑️  Dropped namespace '{namespace}' for rebuild")
+    upserter = Upserter(index)
+    if args.lean_metadata:
+        documents = DocumentStore(args.documents)
+        print(f"📚 Lean metadata: full texts go to {documents.path}")
+        print("   The RAG server reads them through agents-python/document_lookup.py: it must see this file "
+              "(DOCUMENT_STORE_PATH)")
+    print("✅ Gemini configured")
+    print()
+
+    # Checkpoint: start over unless resuming
+    checkpoint = Checkpoint(args.checkpoint, reset=not args.resume)
+    resume_done = checkpoint.completed_units('surah') if args.resume else {}
+    if args.resume:
+        print(f"♻️  Resuming: {len(resume_done)} surahs already complete")
+        print()
+
+    # Incremental: what the index already holds for the Quran
+    if args.incremental:
+        delta = Delta()
+        print("🔎 Incremental: fetching stored content hashes...")
+        try:
+            stored = delta.load(index, [(namespace, 'quran_')])
+        except Exception as e:
+            print(f"❌ Error: could not list stored vectors: {e}")
+            sys.exit(1)
+        if args.resume:
+            # Surahs finished before the interruption are not read again
+            delta.see(checkpoint.vector_ids())
+        print(f"   {stored:,} ayah vectors stored")
+        print()
+
+    print("📖 Processing all 114 surahs...")
+    if args.snapshot:
+        try:
+            manifest = read_manifest(args.snapshot)
+        except SnapshotError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"   📦 Reading from snapshot: {args.snapshot} ({manifest['total_records']:,} records, {manifest['created_at']})")
+    print(f"   🚀 Workers: fetch={args.fetch_workers} embed={args.embed_workers} upsert={args.upsert_workers}")
+    print()
+
+    start_time = time.time()
+
+    for surah_num in resume_done:
+        count('skipped', resume_done[surah_num])
+    pipeline = build_pipeline(args)
+    if args.snapshot:
+        surahs = iter_units(iter_records(args.snapshot, corpus='quran'), lambda a: a['surah_number'])
+        source = ((n, ayahs) for n, ayahs in surahs if str(n) not in resume_done)
+    else:
+        source = (n for n in range(1, 115) if str(n) not in resume_done)
+    stage_stats = pipeline.run(source)
+
+    # Incremental: drop vanished ayahs, but only when every surah was read
+    deleted = 0
+    if delta is not None:
+        if failed_surahs or any(s['errors'] for s in stage_stats.values()):
+            print("⚠️  Not deleting vanished ayahs: some surahs could not be fetched")
+        else:
+            deleted = delete_obsolete(index, delta.obsolete())
+            if documents is not None:
+                documents.delete_many(delta.vanished())
+
+    elapsed = time.time() - start_time
+
+    # Summary
+    print()
+    print("=" * 70)
+    print("✅ QURAN INGESTION COMPLETE!")
+    print("=" * 70)
+    print(f"⏱️  Total time: {elapsed/60:.1f} minutes")
+    print(f"✅ Uploaded: {total_uploaded:,} verses")
+    print(f"❌ Failed: {failed:,}")
+    print(f"⏭️  Skipped: {skipped:,}")
+    if failed_surahs:
+        print(f"⚠️  Surahs that could not be fetched: {failed_surahs:,}")
+    if delta is not None:
+        d = delta.summary()
+        print(f"🔁 Incremental: {d['unchanged']:,} unchanged, {d['changed']:,} changed, {d['new']:,} new; "
+              f"{deleted:,} obsolete vectors deleted")
+    cache = get_embedding_cache()
+    if cache:
+        print(f"💾 Embedding cache: {cache.hits:,} hits, {cache.misses:,} misses")
+    print(f"🧠 Peak memory (RSS): {peak_rss_mb():,.0f} MB")
+    c = chunk_stats.summary()
+    if c['chunks']:
+        t = c['tokens']
+        print(f"✂️  Chunks: {c['records']:,} ayahs -> {c['chunks']:,} vectors ({c['chunkedRecords']:,} split); "
+              f"tokens p50={t['p50']} p90={t['p90']} p99={t['p99']} max={t['max']}")
+    u = upserter.summary()
+    print(f"📤 Upserts: {u['vectors']:,} vectors in {u['requests']:,} requests "
+          f"({u['bytes'] / 1e6:,.1f} MB, {u['splits']} splits) at {u['vectorsPerSecond']:,.1f} vectors/s, "
+          f"{u['bytesPerSecond'] / 1e6:.2f} MB/s")
+    for name, s in limiter_summary().items():
+        print(f"🚦 {name}: settled at {s['rate']}/s, throttled {s['throttled']}x")
+    for name, s in stage_stats.items():
+        print(f"   {name:<9} in={s['in']:,} out={s['out']:,} {s['perSecond']:,.1f}/s busy={s['busySeconds']}s errors={s['errors']}")
+    print("=" * 70)
+
+    # Verify
+    stats = index.describe_index_stats()
+    print(f"\n📊 Total in {index.label}: {stats.get('total_vector_count', 0):,}")
+    if namespace:
+        ns_count = (stats.get('namespaces') or {}).get(namespace, {}).get('vector_count', 0)
+        print(f"   🗂️  {namespace}: {ns_count:,}")
+
+    # Sample check
+    print("\n🔍 Verifying sample (Al-Fatihah 1:1)...")
+    try:
+        result = index.fetch(ids=['quran_1_1', 'quran_1_1#0'], namespace=namespace)
+        if result['vectors']:
+            # The ayah itself, or its first chunk when it was split
+            vector = result['vectors'].get('quran_1_1') or result['vectors']['quran_1_1#0']
+            if documents is not None:
+                hydrate([vector], documents)
+            meta = vector['metadata']
+            if 'parent_id' in meta and 'text_arabic' not in meta:
+                # A chunk in full-metadata mode holds only its own passage
+                has_ar = has_en = bool(meta.get('text'))
+                print(f"   ✅ Chunk {meta['chunk'] + 1}/{meta['chunks']}: {meta.get('text', '')[:60] if has_ar else 'MISSING'}")
+            else:
+                has_ar = bool(meta.get('text_arabic'))
+                has_en = bool(meta.get('text_english'))
+                print(f"   ✅ Arabic: {meta.get('text_arabic', '')[:60] if has_ar else 'MISSING'}")
+                print(f"   ✅ English: {meta.get('text_english', '')[:60] if has_en else 'MISSING'}")
+            print(f"   ✅ Status: {'COMPLETE ✅' if has_ar and has_en else 'INCOMPLETE ❌'}")
     except Exception as e:
-        print(f"   ❌ Error processing surah {surah_num}: {e}")
-        return 0
-
-# Main execution
-print("📖 Processing all 114 surahs...")
-print()
-
-with tqdm(total=114, desc="Surahs", unit="surah") as pbar:
-    for surah_num in range(1, 115):
-        uploaded = fetch_and_upload_surah(surah_num)
-        pbar.set_postfix({
-            'uploaded': total_uploaded,
-            'failed': failed
-        })
-        pbar.update(1)
-        time.sleep(0.5)  # Rate limit between surahs
-
-# Summary
-print()
-print("=" * 70)
-print("✅ QURAN INGESTION COMPLETE!")
-print("=" * 70)
-print(f"✅ Uploaded: {total_uploaded:,} verses")
-print(f"❌ Failed: {failed:,}")
-print("=" * 70)
-
-# Verify
-stats = index.describe_index_stats()
-print(f"\n📊 Total in Pinecone: {stats.get('total_vector_count', 0):,}")
-
-# Sample check
-print("\n🔍 Verifying sample (Al-Fatihah 1:1)...")
-try:
-    result = index.fetch(ids=['quran_1_1'])
-    if 'quran_1_1' in result.vectors:
-        meta = result.vectors['quran_1_1'].metadata
-        has_ar = bool(meta.get('text_arabic'))
-        has_en = bool(meta.get('text_english'))
-        print(f"   ✅ Arabic: {meta.get('text_arabic', '')[:60] if has_ar else 'MISSING'}")
-        print(f"   ✅ English: {meta.get('text_english', '')[:60] if has_en else 'MISSING'}")
-        print(f"   ✅ Status: {'COMPLETE ✅' if has_ar and has_en else 'INCOMPLETE ❌'}")
-except Exception as e:
-    print(f"   ⚠️ Error: {e}")
-
-print("\n" + "=" * 70)
+        print(f"   ⚠️ Error: {e}")
+
+    print("\n" + "=" * 70)
+
+if __name__ == '__main__':
+    main()
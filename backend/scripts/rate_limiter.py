@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Adaptive rate limiting and retries shared by the ingestion scripts.
+
+One token bucket per upstream endpoint (hadithapi, alquran, gemini-embed,
+pinecone-upsert, pinecone-fetch, pinecone-delete) replaces the fixed
+time.sleep() calls: every thread calls acquire() before a request and is held
+back only as long as the endpoint's current rate requires.
+
+The rate adapts to what the provider accepts (additive increase, multiplicative
+decrease): each success nudges it up towards max_rate, each 429 halves it and
+pauses the bucket for Retry-After when the provider sends one. call_with_retry()
+and request() retry 429/5xx responses and transient network errors with
+exponential backoff and full jitter, so records are only given up on after the
+retries are exhausted, and then loudly.
+
+Environment (per endpoint, name upper-cased with '-' -> '_'):
+    RATE_LIMIT_<NAME>       starting requests per second, e.g. RATE_LIMIT_ALQURAN=20
+    RATE_LIMIT_<NAME>_MAX   ceiling the rate may ramp up to (default 4x the start)
+    INGEST_MAX_RETRIES      attempts after the first one (default 6)
+"""
+
+import os
+import time
+import random
+import threading
+
+DEFAULT_RATES = {
+    'hadithapi': 10.0,
+    'alquran': 10.0,
+    'gemini-embed': 25.0,
+    'pinecone-upsert': 50.0,
+    'pinecone-fetch': 50.0,
+    'pinecone-delete': 50.0,
+}
+
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class RetryableError(Exception):
+    """A throttled or 5xx HTTP response; reaches the caller once the retries are used up"""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    def __init__(self, rate, burst=None, min_rate=None, max_rate=None, increase=None):
+        self.rate = float(rate)
+        self.min_rate = float(min_rate or max(0.1, rate / 20))
+        self.max_rate = float(max_rate or rate * 4)
+        self.increase = float(increase or max(0.05, rate * 0.02))  # added per success
+        self.burst = float(burst or max(1.0, rate))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+        self.throttled = 0
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1.0):
+        """Block until tokens are available, then take them"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self._refill(now)
+                    if self.tokens >= tokens:
+                        self.tokens -= tokens
+                        return
+                    wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after=None):
+        """The provider pushed back (429): halve the rate and honor Retry-After"""
+        with self.lock:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+
+def _parse_retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def error_status(exc):
+    """Best-effort HTTP status of an exception raised by requests, Gemini or Pinecone"""
+    for attr in ('status', 'status_code', 'code'):
+        value = getattr(exc, attr, None)
+        if callable(value):
+            try:
+                value = value()
+            except Exception:
+                value = None
+        value = getattr(value, 'value', value)  # grpc / enum codes
+        if isinstance(value, int) and 100 <= value < 600:
+            return value
+    response = getattr(exc, 'response', None)
+    if response is not None and isinstance(getattr(response, 'status_code', None), int):
+        return response.status_code
+    name = type(exc).__name__
+    if 'ResourceExhausted' in name or 'TooManyRequests' in name:
+        return 429
+    if 'ServiceUnavailable' in name or 'InternalServerError' in name or 'DeadlineExceeded' in name:
+        return 503
+    if name in ('ConnectionError', 'Timeout', 'ReadTimeout', 'ConnectTimeout', 'ChunkedEncodingError'):
+        return 503  # transient network failure
+    return None
+
+
+def _error_retry_after(exc):
+    if getattr(exc, 'retry_after', None) is not None:
+        return exc.retry_after
+    headers = getattr(exc, 'headers', None) or getattr(getattr(exc, 'response', None), 'headers', None) or {}
+    try:
+        return _parse_retry_after(headers.get('Retry-After') or headers.get('retry-after'))
+    except AttributeError:
+        return None
+
+
+def backoff_delay(attempt, base=0.5, cap=60.0):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def call_with_retry(limiter, fn, retries=None, base=0.5, cap=60.0):
+    """Run fn() under the limiter, retrying throttling, 5xx and network errors with backoff.
+
+    Non-retryable errors are raised at once; retryable ones after the last attempt.
+    """
+    if retries is None:
+        retries = int(os.getenv('INGEST_MAX_RETRIES') or 6)
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            result = fn()
+        except Exception as e:
+            status = error_status(e)
+            if status not in RETRY_STATUSES or attempt >= retries:
+                raise
+            retry_after = _error_retry_after(e)
+            if status == 429:
+                limiter.on_throttle(retry_after)
+            time.sleep(retry_after if retry_after is not None else backoff_delay(attempt, base, cap))
+            attempt += 1
+            continue
+        limiter.on_success()
+        return result
+
+
+def request(session, limiter_name, method, url, retries=None, **kwargs):
+    """HTTP request through the endpoint's limiter; 429/5xx are retried, other responses returned as-is"""
+    limiter = get_limiter(limiter_name)
+
+    def send():
+        response = session.request(method, url, **kwargs)
+        if response.status_code in RETRY_STATUSES:
+            raise RetryableError(f"{method} {url} -> HTTP {response.status_code}", response.status_code,
+                                 _parse_retry_after(response.headers.get('Retry-After')))
+        return response
+
+    return call_with_retry(limiter, send, retries=retries)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name):
+    """Process-wide limiter for an endpoint name"""
+    with _limiters_lock:
+        if name not in _limiters:
+            env_name = f"RATE_LIMIT_{name.upper().replace('-', '_')}"
+            rate = float(os.getenv(env_name) or DEFAULT_RATES.get(name, 10.0))
+            max_rate = os.getenv(f"{env_name}_MAX")
+            _limiters[name] = RateLimiter(rate, max_rate=float(max_rate) if max_rate else None)
+        return _limiters[name]
+
+
+def limiter_summary():
+    """{name: {"rate", "throttled"}} for the end-of-run report"""
+    with _limiters_lock:
+        return {name: {'rate': round(l.rate, 1), 'throttled': l.throttled} for name, l in _limiters.items()}
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Delta ingestion (--incremental) for the ingestion scripts.
+
+Every vector carries content_hash (sha256 of the exact text it was embedded
+from) and embed_model in its metadata. Before an incremental run the scripts
+list the ids already in the index under their prefixes (hadith_<book>_, quran_)
+and fetch those two fields in parallel batches. Each fresh record is then
+chunked as usual and compared with what is stored:
+
+    every chunk id present with the same hash and model  -> skipped, nothing embedded
+    anything else                                        -> re-embedded and upserted
+
+Once the source has been read completely, the vectors of records that vanished
+upstream, and leftover chunks of records that now split differently, are
+deleted. A run therefore costs about as much as the changes, not the corpus.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ingest_checkpoint import content_hash
+from rate_limiter import call_with_retry, get_limiter
+
+FETCH_BATCH = 100  # ids per fetch request (one list page)
+FETCH_WORKERS = 8  # Fetch requests in flight
+DELETE_BATCH = 1000  # Pinecone's limit of ids per delete request
+
+
+def hash_metadata(text, model):
+    """content_hash/embed_model metadata fields for a vector embedded from text"""
+    return {'content_hash': content_hash(text), 'embed_model': model}
+
+
+def _parent(vid, metadata):
+    return metadata.get('parent_id') or vid.split('#', 1)[0]
+
+
+class Delta:
+    """What the index holds under some id prefixes, and which of it the current run still needs"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.existing = {}  # vector id -> (content hash, embed model)
+        self.namespace_of = {}  # vector id -> namespace
+        self.children = {}  # parent id -> vector ids stored for it
+        self.seen = set()  # parent ids present upstream in this run
+        self.stale = set()  # vector ids of changed records that the new version no longer produces
+        self.unchanged = 0
+        self.changed = 0
+        self.new = 0
+
+    def load(self, store, scopes, workers=FETCH_WORKERS):
+        """Fetch content_hash/embed_model of every vector under [(namespace, id prefix)] in bulk"""
+        limiter = get_limiter('pinecone-fetch')
+
+        def fetch(namespace, ids):
+            result = call_with_retry(limiter, lambda: store.fetch(ids=ids, namespace=namespace))
+            return namespace, result['vectors']
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(fetch, namespace, page)
+                       for namespace, prefix in scopes
+                       for page in store.list_ids(prefix=prefix, namespace=namespace, page_size=FETCH_BATCH)]
+            for future in futures:
+                namespace, vectors = future.result()
+                for vid, v in vectors.items():
+                    meta = v.get('metadata') or {}
+                    self.existing[vid] = (meta.get('content_hash'), meta.get('embed_model'))
+                    self.namespace_of[vid] = namespace
+                    self.children.setdefault(_parent(vid, meta), set()).add(vid)
+        return len(self.existing)
+
+    def see(self, parent_ids):
+        """Mark records as present upstream, whether or not they are re-embedded"""
+        with self.lock:
+            self.seen.update(parent_ids)
+
+    def needs_embedding(self, chunks, model):
+        """True unless every chunk of a record is stored with the same text hash and model"""
+        parent = chunks[0].get('parent_id') or chunks[0]['vector_id']
+        ids = {c['vector_id'] for c in chunks}
+        with self.lock:
+            self.seen.add(parent)
+            stored = self.children.get(parent, set())
+            if not stored:
+                self.new += 1
+                return True
+            if stored == ids and all(self.existing[c['vector_id']] == (content_hash(c['embed_text']), model)
+                                     for c in chunks):
+                self.unchanged += 1
+                return False
+            self.changed += 1
+            self.stale.update(stored - ids)
+            return True
+
+    def obsolete(self):
+        """{namespace: [vector ids]} of vanished records and stale chunks, to delete after the run"""
+        result = {}
+        with self.lock:
+            for parent, ids in self.children.items():
+                gone = ids if parent not in self.seen else ids & self.stale
+                for vid in gone:
+                    result.setdefault(self.namespace_of[vid], []).append(vid)
+        return {namespace: sorted(ids) for namespace, ids in result.items()}
+
+    def vanished(self):
+        """Parent ids of stored records that are no longer upstream"""
+        with self.lock:
+            return sorted(set(self.children) - self.seen)
+
+    def summary(self):
+        with self.lock:
+            return {'stored': len(self.existing), 'unchanged': self.unchanged,
+                    'changed': self.changed, 'new': self.new}
+
+
+def delete_obsolete(store, obsolete):
+    """Delete {namespace: [vector ids]} in batches through the 'pinecone-delete' limiter; returns the count"""
+    limiter = get_limiter('pinecone-delete')
+    deleted = 0
+    for namespace, ids in obsolete.items():
+        for start in range(0, len(ids), DELETE_BATCH):
+            batch = ids[start:start + DELETE_BATCH]
+            call_with_retry(limiter, lambda: store.delete(ids=batch, namespace=namespace))
+            deleted += len(batch)
+    return deleted
@@ -0,0 +1,677 @@
+#!/usr/bin/env python3
+"""
+Vector store backends for the ingestion and maintenance scripts.
+
+Every script talks to a VectorStore instead of a hard-coded Pinecone index:
+
+    upsert(vectors, namespace)                  list of {'id', 'values', 'metadata'} dicts
+    query(vector, top_k, filter, namespace)     {'matches': [{'id', 'score', 'metadata'}]}
+    fetch(ids, namespace)                       {'vectors': {id: {'id', 'values', 'metadata'}}}
+    delete(ids | filter | delete_all, namespace)
+    list_ids(prefix, namespace)                 pages (lists) of ids, e.g. for selective deletes
+    describe_index_stats()                      {'dimension', 'total_vector_count', 'namespaces'}
+
+PineconeStore wraps a Pinecone index. LocalStore keeps one memory-mapped
+float32 (or float16) matrix per namespace plus a SQLite file with each row's id
+and metadata. Search is a vectorized brute-force cosine scan, or, once
+build_ivf() has clustered a namespace, an IVF scan of the nprobe nearest
+clusters only. Filters use Pinecone's syntax ($eq, $ne, $in, $nin, $gt, $gte,
+$lt, $lte, $exists, $and, $or); equality and $in on fields such as type and
+book_slug are answered from a per-field value index. One process should write
+a local store at a time.
+
+Namespaces shard one index: with --namespace-layout corpus the ingesters write
+the Quran and the hadiths into namespaces 'quran' and 'hadith', with book each
+hadith collection gets its own ('hadith-sahih-muslim', ...), so a shard can be
+rebuilt or dropped on its own. The Node retriever (utils/ragSystemPinecone.js)
+queries every namespace of the index, or the ones listed in PINECONE_NAMESPACES,
+and merges the matches by score.
+
+    python vector_store.py stats
+    python vector_store.py build-ivf --nlist 256
+
+Environment:
+    VECTOR_STORE         pinecone (default) or local
+    PINECONE_INDEX       index name (default hikma-fatwas)
+    VECTOR_STORE_DIR     local store directory (default scripts/.cache/vectors/<index>)
+    VECTOR_STORE_DTYPE   float32 (default) or float16, for new local stores
+    VECTOR_STORE_NPROBE  IVF clusters scanned per local query (default 8)
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_INDEX = 'hikma-fatwas'
+NAMESPACE_LAYOUTS = ('default', 'corpus', 'book')
+DEFAULT_DIR = Path(__file__).resolve().parent / '.cache' / 'vectors'
+BLOCK_ROWS = 65536  # rows scored per matrix block
+
+
+class VectorStoreError(Exception):
+    pass
+
+
+class VectorStore(ABC):
+    """Interface shared by the backends; results are plain dicts"""
+
+    label = 'vector store'
+
+    @abstractmethod
+    def upsert(self, vectors, namespace=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def query(self, vector, top_k=10, filter=None, include_values=False, include_metadata=True, namespace=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def fetch(self, ids, namespace=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, ids=None, filter=None, delete_all=False, namespace=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def describe_index_stats(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_ids(self, prefix=None, namespace=None, filter=None, page_size=100):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _field(obj, name, default=None):
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+class PineconeStore(VectorStore):
+    def __init__(self, api_key, index_name=DEFAULT_INDEX):
+        from pinecone import Pinecone
+
+        self.index_name = index_name
+        self.index = Pinecone(api_key=api_key).Index(index_name)
+        self.label = f"Pinecone index {index_name}"
+
+    @staticmethod
+    def _ns(namespace):
+        return {'namespace': namespace} if namespace else {}
+
+    def upsert(self, vectors, namespace=None):
+        self.index.upsert(vectors=vectors, **self._ns(namespace))
+        return len(vectors)
+
+    def query(self, vector, top_k=10, filter=None, include_values=False, include_metadata=True, namespace=None):
+        kwargs = self._ns(namespace)
+        if filter:
+            kwargs['filter'] = filter
+        result = self.index.query(vector=list(vector), top_k=top_k, include_values=include_values,
+                                  include_metadata=include_metadata, **kwargs)
+        matches = []
+        for m in _field(result, 'matches') or []:
+            match = {'id': _field(m, 'id'), 'score': _field(m, 'score')}
+            if include_metadata:
+                match['metadata'] = _field(m, 'metadata') or {}
+            if include_values:
+                match['values'] = list(_field(m, 'values') or [])
+            matches.append(match)
+        return {'matches': matches, 'namespace': namespace or ''}
+
+    def fetch(self, ids, namespace=None):
+        result = self.index.fetch(ids=list(ids), **self._ns(namespace))
+        vectors = {}
+        for vid, v in (_field(result, 'vectors') or {}).items():
+            vectors[vid] = {'id': vid, 'values': list(_field(v, 'values') or []),
+                            'metadata': _field(v, 'metadata') or {}}
+        return {'vectors': vectors, 'namespace': namespace or ''}
+
+    def delete(self, ids=None, filter=None, delete_all=False, namespace=None):
+        kwargs = self._ns(namespace)
+        if delete_all:
+            self.index.delete(delete_all=True, **kwargs)
+        elif filter:
+            self.index.delete(filter=filter, **kwargs)
+        elif ids:
+            self.index.delete(ids=list(ids), **kwargs)
+
+    def list_ids(self, prefix=None, namespace=None, filter=None, page_size=100):
+        if filter:
+            raise VectorStoreError('Pinecone cannot list ids by metadata filter')
+        token = None
+        while True:
+            kwargs = self._ns(namespace)
+            if prefix:
+                kwargs['prefix'] = prefix
+            if token:
+                kwargs['pagination_token'] = token
+            page = self.index.list_paginated(limit=page_size, **kwargs)
+            ids = [_field(v, 'id') for v in _field(page, 'vectors') or []]
+            if ids:
+                yield ids
+            token = _field(_field(page, 'pagination'), 'next')
+            if not token:
+                return
+
+    def describe_index_stats(self):
+        stats = self.index.describe_index_stats()
+        namespaces = {name: {'vector_count': _field(ns, 'vector_count', 0)}
+                      for name, ns in (_field(stats, 'namespaces') or {}).items()}
+        return {'dimension': _field(stats, 'dimension'),
+                'total_vector_count': _field(stats, 'total_vector_count', 0),
+                'namespaces': namespaces}
+
+
+def _as_list(value):
+    return value if isinstance(value, list) else [value]
+
+
+def _compare(value, op, arg):
+    """Pinecone filter semantics for one metadata value; list values match element-wise"""
+    if op == '$exists':
+        return (value is not None) == bool(arg)
+    if value is None:
+        return op in ('$ne', '$nin')
+    values = _as_list(value)
+    if op == '$eq':
+        return arg in values
+    if op == '$ne':
+        return arg not in values
+    if op == '$in':
+        return any(v in arg for v in values)
+    if op == '$nin':
+        return not any(v in arg for v in values)
+    try:
+        if op == '$gt':
+            return value > arg
+        if op == '$gte':
+            return value >= arg
+        if op == '$lt':
+            return value < arg
+        if op == '$lte':
+            return value <= arg
+    except TypeError:
+        return False
+    raise VectorStoreError(f"unsupported filter operator {op}")
+
+
+class _Namespace:
+    """In-memory view of one namespace: matrix, row ids/metadata and lazily built indexes"""
+
+    def __init__(self, name, file, dim, dtype):
+        self.name = name
+        self.file = file
+        self.dim = dim
+        self.dtype = dtype
+        self.matrix = None
+        self.rows = 0  # allocated rows (live + free)
+        self.ids = []
+        self.meta = []
+        self.row_of = {}
+        self.free = []
+        self.alive = np.zeros(0, dtype=bool)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.clusters = np.zeros(0, dtype=np.int32)
+        self.centroids = None
+        self._values = {}  # field -> {value: row array}
+        self._columns = {}  # field -> list of values
+
+    def invalidate(self):
+        self._values.clear()
+        self._columns.clear()
+
+    def column(self, field):
+        if field not in self._columns:
+            self._columns[field] = [m.get(field) if m else None for m in self.meta]
+        return self._columns[field]
+
+    def value_rows(self, field):
+        """{value: rows} for a field; None when a row holds an unhashable (list) value"""
+        if field not in self._values:
+            index = {}
+            for row, value in enumerate(self.column(field)):
+                if value is None:
+                    continue
+                if isinstance(value, list):
+                    index = None
+                    break
+                index.setdefault(value, []).append(row)
+            self._values[field] = None if index is None else {
+                v: np.asarray(r, dtype=np.int64) for v, r in index.items()}
+        return self._values[field]
+
+
+class LocalStore(VectorStore):
+    def __init__(self, directory, dtype='float32', nprobe=None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.label = f"local store {self.directory}"
+        self.nprobe = int(nprobe or os.getenv('VECTOR_STORE_NPROBE') or 8)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.directory / 'store.sqlite3'), timeout=60, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS namespaces ('
+            ' name TEXT PRIMARY KEY, file TEXT NOT NULL, dim INTEGER NOT NULL, rows INTEGER NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS vectors ('
+            ' namespace TEXT NOT NULL, id TEXT NOT NULL, row INTEGER NOT NULL, metadata TEXT NOT NULL,'
+            ' cluster INTEGER NOT NULL DEFAULT -1, PRIMARY KEY (namespace, id))'
+        )
+        self._conn.execute('INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)', ('dtype', dtype))
+        self._conn.commit()
+        self.dtype = np.dtype(self._conn.execute("SELECT value FROM settings WHERE key = 'dtype'").fetchone()[0])
+        if self.dtype not in (np.float32, np.float16):
+            raise VectorStoreError(f"unsupported dtype {self.dtype}")
+        self._spaces = {}
+
+    # -- storage ---------------------------------------------------------
+
+    def _space(self, name, dim=None):
+        """Loaded namespace, created on first upsert when dim is given; None if absent"""
+        name = name or ''
+        ns = self._spaces.get(name)
+        if ns is not None:
+            return ns
+        row = self._conn.execute('SELECT file, dim, rows FROM namespaces WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            if dim is None:
+                return None
+            file = f"ns-{hashlib.sha1(name.encode('utf-8')).hexdigest()[:16]}"
+            self._conn.execute('INSERT INTO namespaces (name, file, dim, rows) VALUES (?, ?, ?, 0)', (name, file, dim))
+            self._conn.commit()
+            row = (file, dim, 0)
+        file, ns_dim, rows = row
+        ns = _Namespace(name, file, ns_dim, self.dtype)
+        ns.rows = rows
+        ns.ids = [None] * rows
+        ns.meta = [None] * rows
+        ns.clusters = np.full(rows, -1, dtype=np.int32)
+        for vid, r, metadata, cluster in self._conn.execute(
+                'SELECT id, row, metadata, cluster FROM vectors WHERE namespace = ?', (name,)):
+            ns.ids[r] = vid
+            ns.meta[r] = json.loads(metadata)
+            ns.row_of[vid] = r
+            ns.clusters[r] = cluster
+        ns.alive = np.fromiter((i is not None for i in ns.ids), dtype=bool, count=rows)
+        ns.free = np.flatnonzero(~ns.alive).tolist()
+        if rows:
+            self._ensure_rows(ns, rows)
+            ns.norms = np.empty(rows, dtype=np.float32)
+            for start in range(0, rows, BLOCK_ROWS):
+                block = np.asarray(ns.matrix[start:min(start + BLOCK_ROWS, ns.rows)], dtype=np.float32)
+                ns.norms[start:start + BLOCK_ROWS] = np.linalg.norm(block, axis=1)
+        ivf_path = self.directory / f"{file}.ivf.npy"
+        if ivf_path.exists():
+            ns.centroids = np.load(ivf_path)
+        self._spaces[name] = ns
+        return ns
+
+    def _ensure_rows(self, ns, min_rows):
+        if ns.matrix is not None and ns.matrix.shape[0] >= min_rows:
+            return
+        path = self.directory / f"{ns.file}.{'f16' if self.dtype == np.float16 else 'f32'}"
+        row_bytes = ns.dim * self.dtype.itemsize
+        size = path.stat().st_size if path.exists() else 0
+        if size < min_rows * row_bytes:
+            # Grow geometrically so appends don't remap on every batch
+            rows = max(min_rows, 2 * (size // row_bytes), 1024)
+            with open(path, 'ab') as f:
+                f.truncate(rows * row_bytes)
+            size = rows * row_bytes
+        if ns.matrix is not None:
+            ns.matrix.flush()
+        ns.matrix = np.memmap(path, dtype=self.dtype, mode='r+', shape=(size // row_bytes, ns.dim))
+
+    def _assign(self, ns, values):
+        """Nearest IVF cluster of each (float32) row, or -1 without an IVF index"""
+        if ns.centroids is None or not len(values):
+            return np.full(len(values), -1, dtype=np.int32)
+        norms = np.linalg.norm(values, axis=1, keepdims=True)
+        return np.argmax((values / np.maximum(norms, 1e-12)) @ ns.centroids.T, axis=1).astype(np.int32)
+
+    # -- VectorStore -----------------------------------------------------
+
+    def upsert(self, vectors, namespace=None):
+        if not vectors:
+            return 0
+        # Last write wins for ids repeated within one call
+        by_id = {v['id']: v for v in vectors}
+        dim = len(next(iter(by_id.values()))['values'])
+        with self._lock:
+            ns = self._space(namespace, dim)
+            if ns.dim != dim:
+                raise VectorStoreError(f"dimension {dim} does not match namespace dimension {ns.dim}")
+            rows = []
+            for vid in by_id:
+                row = ns.row_of.get(vid)
+                if row is None:
+                    row = ns.free.pop() if ns.free else ns.rows
+                    ns.rows = max(ns.rows, row + 1)
+                rows.append(row)
+            values = np.asarray([v['values'] for v in by_id.values()], dtype=np.float32)
+            clusters = self._assign(ns, values)
+
+            self._ensure_rows(ns, ns.rows)
+            grow = ns.rows - len(ns.ids)
+            if grow > 0:
+                ns.ids.extend([None] * grow)
+                ns.meta.extend([None] * grow)
+                ns.alive = np.concatenate([ns.alive, np.zeros(grow, dtype=bool)])
+                ns.norms = np.concatenate([ns.norms, np.zeros(grow, dtype=np.float32)])
+                ns.clusters = np.concatenate([ns.clusters, np.full(grow, -1, dtype=np.int32)])
+            index = np.asarray(rows, dtype=np.int64)
+            ns.matrix[index] = values.astype(self.dtype)
+            ns.matrix.flush()
+            ns.norms[index] = np.linalg.norm(ns.matrix[index].astype(np.float32), axis=1)
+            ns.clusters[index] = clusters
+            ns.alive[index] = True
+            for (vid, v), row in zip(by_id.items(), rows):
+                ns.ids[row] = vid
+                ns.meta[row] = v.get('metadata') or {}
+                ns.row_of[vid] = row
+            ns.invalidate()
+
+            with self._conn:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO vectors (namespace, id, row, metadata, cluster) VALUES (?, ?, ?, ?, ?)',
+                    [(ns.name, vid, row, json.dumps(v.get('metadata') or {}, ensure_ascii=False), int(c))
+                     for (vid, v), row, c in zip(by_id.items(), rows, clusters)])
+                self._conn.execute('UPDATE namespaces SET rows = ? WHERE name = ?', (ns.rows, ns.name))
+        return len(by_id)
+
+    def _filter_mask(self, ns, filter):
+        mask = np.ones(ns.rows, dtype=bool)
+        for key, cond in filter.items():
+            if key == '$and':
+                for sub in cond:
+                    mask &= self._filter_mask(ns, sub)
+                continue
+            if key == '$or':
+                any_mask = np.zeros(ns.rows, dtype=bool)
+                for sub in cond:
+                    any_mask |= self._filter_mask(ns, sub)
+                mask &= any_mask
+                continue
+            ops = cond if isinstance(cond, dict) else {'$eq': cond}
+            for op, arg in ops.items():
+                mask &= self._field_mask(ns, key, op, arg)
+        return mask
+
+    def _field_mask(self, ns, field, op, arg):
+        values = ns.value_rows(field) if op in ('$eq', '$in') else None
+        if values is not None:
+            # Fast path: equality and membership from the field's value index
+            mask = np.zeros(ns.rows, dtype=bool)
+            for value in ([arg] if op == '$eq' else arg):
+                rows = values.get(value)
+                if rows is not None:
+                    mask[rows] = True
+            return mask
+        return np.fromiter((_compare(v, op, arg) for v in ns.column(field)), dtype=bool, count=ns.rows)
+
+    def query(self, vector, top_k=10, filter=None, include_values=False, include_metadata=True,
+              namespace=None, nprobe=None, exact=False):
+        with self._lock:
+            ns = self._space(namespace)
+            if ns is None or not ns.rows:
+                return {'matches': [], 'namespace': namespace or ''}
+            q = np.asarray(vector, dtype=np.float32)
+            q = q / max(float(np.linalg.norm(q)), 1e-12)
+            mask = ns.alive.copy()
+            if filter:
+                mask &= self._filter_mask(ns, filter)
+            if ns.centroids is not None and not exact:
+                probe = np.argsort(-(ns.centroids @ q))[:nprobe or self.nprobe]
+                narrowed = mask & (np.isin(ns.clusters, probe) | (ns.clusters < 0))
+                # Too few candidates in the probed clusters: fall back to the exact scan
+                if narrowed.sum() >= top_k:
+                    mask = narrowed
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return {'matches': [], 'namespace': ns.name}
+
+            if len(candidates) > ns.rows // 2:
+                # Dense: score contiguous blocks, then drop the rows that don't qualify
+                scores = np.empty(ns.rows, dtype=np.float32)
+                for start in range(0, ns.rows, BLOCK_ROWS):
+                    block = np.asarray(ns.matrix[start:min(start + BLOCK_ROWS, ns.rows)], dtype=np.float32)
+                    scores[start:start + len(block)] = block @ q
+                scores = scores[candidates]
+            else:
+                scores = np.concatenate([
+                    np.asarray(ns.matrix[candidates[i:i + BLOCK_ROWS]], dtype=np.float32) @ q
+                    for i in range(0, len(candidates), BLOCK_ROWS)])
+            scores /= np.maximum(ns.norms[candidates], 1e-12)
+
+            k = min(top_k, len(candidates))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            matches = []
+            for i in top:
+                row = candidates[i]
+                match = {'id': ns.ids[row], 'score': float(scores[i])}
+                if include_metadata:
+                    match['metadata'] = dict(ns.meta[row])
+                if include_values:
+                    match['values'] = ns.matrix[row].astype(np.float32).tolist()
+                matches.append(match)
+            return {'matches': matches, 'namespace': ns.name}
+
+    def fetch(self, ids, namespace=None):
+        with self._lock:
+            ns = self._space(namespace)
+            vectors = {}
+            for vid in ids:
+                row = ns.row_of.get(vid) if ns else None
+                if row is not None:
+                    vectors[vid] = {'id': vid, 'values': ns.matrix[row].astype(np.float32).tolist(),
+                                    'metadata': dict(ns.meta[row])}
+            return {'vectors': vectors, 'namespace': namespace or ''}
+
+    def delete(self, ids=None, filter=None, delete_all=False, namespace=None):
+        with self._lock:
+            ns = self._space(namespace)
+            if ns is None:
+                return 0
+            if delete_all:
+                count = len(ns.row_of)
+                with self._conn:
+                    self._conn.execute('DELETE FROM vectors WHERE namespace = ?', (ns.name,))
+                    self._conn.execute('DELETE FROM namespaces WHERE name = ?', (ns.name,))
+                ns.matrix = None
+                for suffix in ('f32', 'f16', 'ivf.npy'):
+                    path = self.directory / f"{ns.file}.{suffix}"
+                    if path.exists():
+                        path.unlink()
+                del self._spaces[ns.name]
+                return count
+            if filter:
+                ids = [ns.ids[r] for r in np.flatnonzero(ns.alive & self._filter_mask(ns, filter))]
+            rows = [(vid, ns.row_of.pop(vid)) for vid in (ids or []) if vid in ns.row_of]
+            for _, row in rows:
+                ns.ids[row] = None
+                ns.meta[row] = None
+                ns.clusters[row] = -1
+                ns.alive[row] = False
+                ns.free.append(row)
+            ns.invalidate()
+            with self._conn:
+                self._conn.executemany('DELETE FROM vectors WHERE namespace = ? AND id = ?',
+                                       [(ns.name, vid) for vid, _ in rows])
+            return len(rows)
+
+    def describe_index_stats(self):
+        with self._lock:
+            namespaces, dimension = {}, None
+            for name, dim in self._conn.execute('SELECT name, dim FROM namespaces').fetchall():
+                count = self._conn.execute('SELECT COUNT(*) FROM vectors WHERE namespace = ?', (name,)).fetchone()[0]
+                namespaces[name] = {'vector_count': count}
+                dimension = dimension or dim
+            return {'dimension': dimension,
+                    'total_vector_count': sum(n['vector_count'] for n in namespaces.values()),
+                    'namespaces': namespaces}
+
+    def list_ids(self, prefix=None, namespace=None, filter=None, page_size=100):
+        if filter:
+            with self._lock:
+                ns = self._space(namespace)
+                ids = sorted(ns.ids[r] for r in np.flatnonzero(ns.alive & self._filter_mask(ns, filter))) if ns else []
+            ids = [i for i in ids if not prefix or i.startswith(prefix)]
+            for start in range(0, len(ids), page_size):
+                yield ids[start:start + page_size]
+            return
+        # Keyset pagination, so deleting listed ids between pages is safe
+        last = ''
+        while True:
+            sql = 'SELECT id FROM vectors WHERE namespace = ? AND id > ?'
+            params = [namespace or '', last]
+            if prefix:
+                sql += ' AND id >= ? AND id < ?'
+                params += [prefix, prefix + '\U0010ffff']
+            with self._lock:
+                ids = [r[0] for r in self._conn.execute(sql + ' ORDER BY id LIMIT ?', params + [page_size])]
+            if not ids:
+                return
+            yield ids
+            last = ids[-1]
+
+    # -- IVF -------------------------------------------------------------
+
+    def build_ivf(self, namespace=None, nlist=None, iterations=10, sample=50000, seed=0):
+        """Cluster a namespace with spherical k-means; later upserts join their nearest cluster"""
+        with self._lock:
+            ns = self._space(namespace)
+            if ns is None:
+                raise VectorStoreError(f"namespace '{namespace or ''}' does not exist")
+            live = np.flatnonzero(ns.alive)
+            if not len(live):
+                raise VectorStoreError('cannot build an IVF index over an empty namespace')
+            nlist = min(int(nlist or max(1, 4 * np.sqrt(len(live)))), len(live))
+            rng = np.random.default_rng(seed)
+            train_rows = np.sort(rng.choice(live, size=min(sample, len(live)), replace=False))
+            train = np.asarray(ns.matrix[train_rows], dtype=np.float32)
+            train /= np.maximum(np.linalg.norm(train, axis=1, keepdims=True), 1e-12)
+
+            centroids = train[rng.choice(len(train), size=nlist, replace=False)]
+            for _ in range(iterations):
+                labels = np.argmax(train @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, train)
+                counts = np.bincount(labels, minlength=nlist)
+                # Empty clusters keep their previous centroid
+                filled = counts > 0
+                centroids[filled] = sums[filled] / np.maximum(
+                    np.linalg.norm(sums[filled], axis=1, keepdims=True), 1e-12)
+
+            ns.centroids = centroids
+            for start in range(0, len(live), BLOCK_ROWS):
+                rows = live[start:start + BLOCK_ROWS]
+                ns.clusters[rows] = self._assign(ns, np.asarray(ns.matrix[rows], dtype=np.float32))
+            np.save(self.directory / f"{ns.file}.ivf.npy", centroids)
+            with self._conn:
+                self._conn.executemany('UPDATE vectors SET cluster = ? WHERE namespace = ? AND id = ?',
+                                       [(int(ns.clusters[r]), ns.name, ns.ids[r]) for r in live])
+            return {'nlist': nlist, 'vectors': len(live),
+                    'largest_cluster': int(np.bincount(ns.clusters[live], minlength=nlist).max())}
+
+    def drop_ivf(self, namespace=None):
+        with self._lock:
+            ns = self._space(namespace)
+            if ns is None or ns.centroids is None:
+                return
+            ns.centroids = None
+            ns.clusters[:] = -1
+            (self.directory / f"{ns.file}.ivf.npy").unlink()
+            with self._conn:
+                self._conn.execute('UPDATE vectors SET cluster = -1 WHERE namespace = ?', (ns.name,))
+
+    def close(self):
+        with self._lock:
+            for ns in self._spaces.values():
+                if ns.matrix is not None:
+                    ns.matrix.flush()
+            self._conn.close()
+
+
+def namespace_for(layout, corpus, book_slug=None):
+    """Namespace a record is written to under a layout ('' is the default namespace)"""
+    if layout == 'default':
+        return ''
+    if layout == 'book' and book_slug:
+        return f"{corpus}-{book_slug}"
+    return corpus
+
+
+def open_vector_store(backend=None, index_name=None, directory=None):
+    """The configured store: --store/VECTOR_STORE picks the backend, pinecone by default"""
+    backend = (backend or os.getenv('VECTOR_STORE') or 'pinecone').lower()
+    index_name = index_name or os.getenv('PINECONE_INDEX') or DEFAULT_INDEX
+    if backend == 'pinecone':
+        api_key = os.getenv('PINECONE_API_KEY')
+        if not api_key:
+            raise VectorStoreError('PINECONE_API_KEY not found')
+        return PineconeStore(api_key, index_name)
+    if backend == 'local':
+        directory = directory or os.getenv('VECTOR_STORE_DIR') or DEFAULT_DIR / index_name
+        return LocalStore(directory, dtype=os.getenv('VECTOR_STORE_DTYPE') or 'float32')
+    raise VectorStoreError(f"unknown vector store backend '{backend}' (expected pinecone or local)")
+
+
+def add_store_args(parser):
+    """--store / --store-dir / --index flags shared by the scripts"""
+    parser.add_argument('--store', choices=['pinecone', 'local'],
+                        help='vector store backend (default: VECTOR_STORE or pinecone)')
+    parser.add_argument('--store-dir', help='local store directory (default: VECTOR_STORE_DIR or scripts/.cache/vectors/<index>)')
+    parser.add_argument('--index', help=f'index name (default: PINECONE_INDEX or {DEFAULT_INDEX})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect a vector store or build a local IVF index')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('stats', help='vector counts per namespace')
+    ivf = sub.add_parser('build-ivf', help='cluster a local namespace for sub-linear queries')
+    ivf.add_argument('--namespace', default='')
+    ivf.add_argument('--nlist', type=int, help='number of clusters (default: 4 * sqrt(vectors))')
+    ivf.add_argument('--iterations', type=int, default=10)
+    for p in sub.choices.values():
+        add_store_args(p)
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'build-ivf':
+            store = LocalStore(args.store_dir or os.getenv('VECTOR_STORE_DIR') or DEFAULT_DIR / (args.index or DEFAULT_INDEX))
+            start = time.time()
+            result = store.build_ivf(args.namespace, nlist=args.nlist, iterations=args.iterations)
+            print(f"✅ IVF index built in {time.time() - start:.1f}s: {result['nlist']} clusters over "
+                  f"{result['vectors']:,} vectors (largest {result['largest_cluster']:,})")
+        else:
+            store = open_vector_store(args.store, args.index, args.store_dir)
+            stats = store.describe_index_stats()
+            print(f"📊 {store.label}: {stats['total_vector_count']:,} vectors, dimension {stats['dimension']}")
+            for name, ns in sorted(stats['namespaces'].items()):
+                print(f"   {name or '(default)'}: {ns['vector_count']:,}")
+        store.close()
+    except VectorStoreError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Size-aware upserts for the ingestion scripts.
+
+Pinecone caps one upsert request at 2 MB and 1,000 vectors, and a vector's
+payload varies with its metadata, so a fixed vector count either wastes most
+of each request or overshoots the cap. The scripts therefore pack vectors into
+batches by serialized size (see Stage max_batch_bytes in ingest_pipeline.py)
+and hand each batch to an Upserter from several upsert workers at once.
+
+Throttling and 5xx errors are retried through the 'pinecone-upsert' limiter.
+A request rejected outright (e.g. one oversized or malformed vector) is split
+in half and each half retried, so only the offending vectors are lost.
+"""
+
+import json
+import time
+import threading
+
+from rate_limiter import RETRY_STATUSES, call_with_retry, error_status, get_limiter
+
+MAX_REQUEST_BYTES = 2 * 1024 * 1024
+MAX_REQUEST_VECTORS = 1000
+DEFAULT_BATCH_BYTES = int(MAX_REQUEST_BYTES * 0.9)  # headroom for the request envelope
+
+
+def vector_bytes(vector):
+    """Serialized size of a vector as sent in an upsert request"""
+    return len(json.dumps(vector, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+
+
+class Upserter:
+    def __init__(self, store, limiter='pinecone-upsert'):
+        self.store = store
+        self.limiter = get_limiter(limiter)
+        self.lock = threading.Lock()
+        self.started = None
+        self.vectors = 0
+        self.bytes = 0
+        self.requests = 0
+        self.splits = 0
+        self.failed = 0
+
+    def upsert(self, vectors, sizes=None, namespace=None):
+        """Upsert a batch; returns (upserted, failed) lists of vectors"""
+        with self.lock:
+            self.started = self.started or time.time()
+        sizes = sizes or [vector_bytes(v) for v in vectors]
+        done, failed = [], []
+        self._send(list(vectors), list(sizes), namespace, done, failed)
+        return done, failed
+
+    def _send(self, vectors, sizes, namespace, done, failed):
+        try:
+            call_with_retry(self.limiter, lambda: self.store.upsert(vectors, namespace=namespace))
+        except Exception as e:
+            # Retries are already used up for throttling/5xx; only a rejected request is worth splitting
+            if len(vectors) == 1 or error_status(e) in RETRY_STATUSES:
+                print(f"   ⚠️  Upsert of {len(vectors)} vector(s) failed: {e}")
+                failed.extend(vectors)
+                with self.lock:
+                    self.failed += len(vectors)
+                return
+            with self.lock:
+                self.splits += 1
+            mid = len(vectors) // 2
+            self._send(vectors[:mid], sizes[:mid], namespace, done, failed)
+            self._send(vectors[mid:], sizes[mid:], namespace, done, failed)
+            return
+        done.extend(vectors)
+        with self.lock:
+            self.requests += 1
+            self.vectors += len(vectors)
+            self.bytes += sum(sizes)
+
+    def summary(self):
+        """{"vectors", "bytes", "requests", "splits", "failed", "vectorsPerSecond", "bytesPerSecond"}"""
+        with self.lock:
+            elapsed = time.time() - self.started if self.started else 0.0
+            return {
+                'vectors': self.vectors,
+                'bytes': self.bytes,
+                'requests': self.requests,
+                'splits': self.splits,
+                'failed': self.failed,
+                'vectorsPerSecond': round(self.vectors / elapsed, 1) if elapsed else 0.0,
+                'bytesPerSecond': round(self.bytes / elapsed) if elapsed else 0,
+            }
+
+    def status(self):
+        """Short progress readout for the pipeline's status line"""
+        s = self.summary()
+        return f"sent {s['vectorsPerSecond']:,.0f} vec/s {s['bytesPerSecond'] / 1e6:.2f} MB/s"
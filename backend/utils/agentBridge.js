@@ -1,7 +1,17 @@
 const { spawn } = require('child_process');
 const path = require('path');
 
-function runPythonAgent(scriptName, payload, { timeoutMs = 60000 } = {}) {
+// Set PYTHON_AGENT_PERSISTENT=true to keep one warm `--serve` worker per agent script
+// instead of spawning a fresh interpreter per request.
+const PERSISTENT = ['1', 'true', 'yes'].includes(String(process.env.PYTHON_AGENT_PERSISTENT || '').toLowerCase());
+const AGENT_CONCURRENCY = parseInt(process.env.AGENT_CONCURRENCY || '4', 10);
+
+function runPythonAgent(scriptName, payload, options = {}) {
+  if (PERSISTENT) return runPersistentAgent(scriptName, payload, options);
+  return runOneShotAgent(scriptName, payload, options);
+}
+
+function runOneShotAgent(scriptName, payload, { timeoutMs = 60000 } = {}) {
   return new Promise((resolve) => {
     const pythonBin = process.env.PYTHON_BIN || 'python';
     const scriptPath = path.join(__dirname, '..', 'agents-python', scriptName);
@@ -51,4 +61,89 @@ function runPythonAgent(scriptName, payload, { timeoutMs = 60000 } = {}) {
   });
 }
 
+// scriptName -> { child, pending: Map<id, handler>, buffer, nextId, retired }
+const workers = new Map();
+
+// A timed-out request can't be cancelled inside the Python worker (it may be blocked
+// in an LLM call), so the worker is retired: new requests go to a fresh process and
+// the old one is killed as soon as its other in-flight requests have settled.
+function retireWorker(scriptName, worker) {
+  if (workers.get(scriptName) === worker) workers.delete(scriptName);
+  worker.retired = true;
+  killIfIdle(worker);
+}
+
+function killIfIdle(worker) {
+  if (worker.retired && worker.pending.size === 0) worker.child.kill('SIGKILL');
+}
+
+function getWorker(scriptName) {
+  const existing = workers.get(scriptName);
+  if (existing) return existing;
+
+  const pythonBin = process.env.PYTHON_BIN || 'python';
+  const scriptPath = path.join(__dirname, '..', 'agents-python', scriptName);
+  const child = spawn(pythonBin, [scriptPath, '--serve', '--concurrency', String(AGENT_CONCURRENCY)], { stdio: ['pipe', 'pipe', 'pipe'] });
+  const worker = { child, pending: new Map(), buffer: '', nextId: 1, retired: false };
+  workers.set(scriptName, worker);
+
+  child.stdout.on('data', (d) => {
+    worker.buffer += d.toString();
+    let nl;
+    while ((nl = worker.buffer.indexOf('\n')) !== -1) {
+      const line = worker.buffer.slice(0, nl).trim();
+      worker.buffer = worker.buffer.slice(nl + 1);
+      if (!line) continue;
+      let msg;
+      try { msg = JSON.parse(line); } catch (e) { continue; }
+      const handler = msg.id != null ? worker.pending.get(String(msg.id)) : null;
+      if (handler) handler(msg);
+    }
+  });
+  child.stderr.on('data', (d) => { console.error(`[${scriptName}]`, d.toString().trim()); });
+
+  const failAll = (reason) => {
+    if (workers.get(scriptName) === worker) workers.delete(scriptName);
+    for (const handler of worker.pending.values()) handler({ error: reason });
+    worker.pending.clear();
+  };
+  child.on('error', (err) => failAll(err.message));
+  child.on('exit', (code) => failAll(`Agent worker exited with code ${code}`));
+
+  return worker;
+}
+
+function runPersistentAgent(scriptName, payload, { timeoutMs = 60000 } = {}) {
+  return new Promise((resolve) => {
+    const start = Date.now();
+    const worker = getWorker(scriptName);
+    const id = String(worker.nextId++);
+
+    const timer = setTimeout(() => {
+      if (!worker.pending.delete(id)) return;
+      retireWorker(scriptName, worker);
+      resolve({ ok: false, error: 'Agent timed out', data: null, latencyMs: Date.now() - start });
+    }, timeoutMs);
+
+    worker.pending.set(id, (msg) => {
+      worker.pending.delete(id);
+      clearTimeout(timer);
+      killIfIdle(worker);
+      if (msg.error) {
+        resolve({ ok: false, error: String(msg.error).slice(0, 4000), data: null, latencyMs: Date.now() - start });
+      } else {
+        resolve({ ok: true, data: msg.data || {}, error: null, latencyMs: Date.now() - start });
+      }
+    });
+
+    try {
+      worker.child.stdin.write(JSON.stringify({ id, payload }) + '\n');
+    } catch (e) {
+      worker.pending.delete(id);
+      clearTimeout(timer);
+      resolve({ ok: false, error: e.message, data: null, latencyMs: Date.now() - start });
+    }
+  });
+}
+
 module.exports = { runPythonAgent };
@@ -1,6 +1,7 @@
 require('dotenv').config();
 const { Pinecone } = require('@pinecone-database/pinecone');
 const { GoogleGenerativeAI } = require('@google/generative-ai');
+const { runPythonAgent } = require('./agentBridge');
 
 // Initialize clients
 const pinecone = new Pinecone({
@@ -9,6 +10,48 @@ const pinecone = new Pinecone({
 
 const genAI = new GoogleGenerativeAI(process.env.GEMINI_API_KEY);
 const INDEX_NAME = 'hikma-fatwas';
+const NAMESPACE_REFRESH_MS = 5 * 60 * 1000; // How long a discovered namespace list is reused
+const HYDRATE_TIMEOUT_MS = 10000;
+const TEXT_FIELDS = ['text', 'text_english', 'text_arabic', 'english_text', 'arabic_text'];
+
+let namespaceCache = { names: null, loadedAt: 0 };
+
+/**
+ * Namespaces to search: PINECONE_NAMESPACES (comma-separated, empty entry = default
+ * namespace) if set, otherwise every namespace the index currently holds. The
+ * ingestion scripts' --namespace-layout corpus/book shard the Quran and hadiths
+ * into their own namespaces, so querying only the default one would miss them.
+ */
+async function getNamespaces(index) {
+  if (process.env.PINECONE_NAMESPACES !== undefined) {
+    return [...new Set(process.env.PINECONE_NAMESPACES.split(',').map(ns => ns.trim()))];
+  }
+  if (namespaceCache.names && Date.now() - namespaceCache.loadedAt < NAMESPACE_REFRESH_MS) {
+    return namespaceCache.names;
+  }
+  try {
+    const stats = await index.describeIndexStats();
+    const names = Object.keys(stats.namespaces || {});
+    namespaceCache = { names: names.length > 0 ? names : [''], loadedAt: Date.now() };
+  } catch (error) {
+    console.warn('⚠️  Could not list index namespaces, using the default one:', error.message);
+    return namespaceCache.names || [''];
+  }
+  return namespaceCache.names;
+}
+
+/**
+ * Query each namespace in parallel and merge the matches by score
+ */
+async function queryNamespaces(index, namespaces, request) {
+  const responses = await Promise.all(
+    namespaces.map(ns => index.namespace(ns).query(request))
+  );
+  return responses
+    .flatMap(response => response.matches || [])
+    .sort((a, b) => (b.score || 0) - (a.score || 0))
+    .slice(0, request.topK);
+}
 
 /**
  * Detect language of user query
@@ -94,15 +137,16 @@ async function retrieveContext(query, options = {}) {
       };
     }
     
-    // 2. Query Pinecone index
+    // 2. Query every namespace of the Pinecone index
     const index = pinecone.index(INDEX_NAME);
-    const queryResponse = await index.query({
+    const namespaces = await getNamespaces(index);
+    const rawMatches = await queryNamespaces(index, namespaces, {
       vector: queryEmbedding,
       topK: limit * 2, // Get more for filtering
       includeMetadata: true
     });
     
-    const matches = queryResponse.matches || [];
+    const matches = collapseChunks(rawMatches);
     
     if (matches.length === 0) {
       console.log('ℹ️  No relevant fatwas found');
@@ -117,8 +161,10 @@ async function retrieveContext(query, options = {}) {
     
     console.log(`✅ RAG: Retrieved ${matches.length} fatwas`);
     
+    const topMatches = await hydrateLeanMatches(matches.slice(0, limit));
+    
     // 3. Format results based on detected language
-    const results = matches.slice(0, limit).map(match => {
+    const results = topMatches.map(match => {
       const metadata = match.metadata || {};
       const type = metadata.type || 'fatwa';
       
@@ -132,7 +178,8 @@ async function retrieveContext(query, options = {}) {
       } else if (type === 'hadith') {
         // Hadith uses different field names
         arabicText = metadata.arabic_text || metadata.text_arabic || '';
-        primaryText = metadata.english_text || metadata.text_english || '';
+        // Chunk vectors of long hadiths carry their own passage in `text`
+        primaryText = metadata.english_text || metadata.text_english || metadata.text || '';
       } else if (type === 'tafsir') {
         primaryText = getTranslationForLanguage(metadata, userLanguage);
       } else {
@@ -188,6 +235,46 @@ async function retrieveContext(query, options = {}) {
   }
 }
 
+/**
+ * Keep only the best-scoring match per record: long hadiths and ayahs are
+ * indexed as several chunk vectors (<id>#<n>) sharing metadata.parent_id
+ */
+function collapseChunks(matches) {
+  const seen = new Set();
+  return matches.filter(match => {
+    const parentId = (match.metadata && match.metadata.parent_id) || match.id;
+    if (seen.has(parentId)) return false;
+    seen.add(parentId);
+    return true;
+  });
+}
+
+/**
+ * Fill in the texts of Quran/hadith matches ingested with --lean-metadata, whose
+ * vectors keep only filterable fields: the full documents are looked up in the
+ * ingestion scripts' document store through agents-python/document_lookup.py
+ */
+async function hydrateLeanMatches(matches) {
+  const lean = matches.filter(match => {
+    const metadata = match.metadata || {};
+    return ['quran', 'hadith'].includes(metadata.type) && !TEXT_FIELDS.some(field => metadata[field]);
+  });
+  if (lean.length === 0) return matches;
+
+  const documentId = match => (match.metadata && match.metadata.parent_id) || match.id;
+  const result = await runPythonAgent('document_lookup.py', { ids: [...new Set(lean.map(documentId))] },
+    { timeoutMs: HYDRATE_TIMEOUT_MS });
+  const documents = (result.ok && result.data && result.data.documents) || {};
+  if (!result.ok || (result.data && result.data.error)) {
+    console.warn('⚠️  Could not hydrate lean-metadata matches:', result.error || result.data.error);
+  }
+  for (const match of lean) {
+    const doc = documents[documentId(match)];
+    if (doc) match.metadata = { ...match.metadata, ...doc };
+  }
+  return matches;
+}
+
 /**
  * Get translation for specific language from metadata
  */